@@ -13,7 +13,7 @@ import { CategoryReadInterface } from "@/lib/types/budgethink";
 import { ConfirmationModal } from "@/components/ui/ConfirmationModal";
 
 type TransactionType = "all" | "income" | "expense";
-type SortField = "date" | "amount" | "title" | "category";
+type SortField = "date" | "amount" | "title";
 type SortDirection = "asc" | "desc";
 
 export function TransactionsPage() {
@@ -96,8 +96,6 @@ export function TransactionsPage() {
         filters.order_by = sortDirection === "asc" ? "amount" : "-amount";
       } else if (sortField === "title") {
         filters.order_by = sortDirection === "asc" ? "title" : "-title";
-      } else if (sortField === "category") {
-        filters.order_by = sortDirection === "asc" ? "category__name" : "-category__name";
       }
       
       const response = await TransactionApi.filter(filters);
@@ -292,8 +290,6 @@ export function TransactionsPage() {
               <option value="amount-asc">Amount (Lowest First)</option>
               <option value="title-asc">Title (A-Z)</option>
               <option value="title-desc">Title (Z-A)</option>
-              <option value="category-asc">Category (A-Z)</option>
-              <option value="category-desc">Category (Z-A)</option>
             </select>
           </div>
         </div>
@@ -1,6 +1,7 @@
 import axios from "axios";
 import api, { GenericApi } from "@/lib/utils/api";
-import { BudgetReadInterface, BudgetWriteInterface, CategoryReadInterface, CategoryWriteInterface, TransactionReadInterface, TransactionWriteInterface, DashboardReadInterface, DashboardFilterInterface } from "@/lib/types/budgethink";
+import { parseCookies } from "nookies";
+import { BudgetReadInterface, BudgetWriteInterface, CategoryReadInterface, CategoryWriteInterface, TransactionReadInterface, TransactionWriteInterface, DashboardReadInterface, DashboardFilterInterface, TimeseriesReadInterface, TimeseriesFilterInterface, SyncReadInterface, DashboardDeltaInterface } from "@/lib/types/budgethink";
 
 export const CategoryApi = new GenericApi<CategoryReadInterface, CategoryWriteInterface>('/budgethink/categories');
 export const TransactionApi = new GenericApi<TransactionReadInterface, TransactionWriteInterface>('/budgethink/transactions');
@@ -27,3 +28,31 @@ export const fetchDashboard = async (filters: DashboardFilterInterface) => {
     }
 };
 
+
+
+export const fetchTimeseries = async (filters: TimeseriesFilterInterface) => {
+    const response = await api.get('/budgethink/transactions/timeseries/', { params: filters });
+    return response.data as TimeseriesReadInterface;
+};
+
+export const fetchSync = async (since?: string) => {
+    const response = await api.get('/budgethink/sync/', { params: since ? { since } : {} });
+    return response.data as SyncReadInterface;
+};
+
+// Live dashboard: a snapshot (same totals as fetchDashboard) then a delta per change; returns a close function
+export const subscribeDashboard = (
+    onSnapshot: (data: DashboardDeltaInterface) => void,
+    onDelta: (delta: DashboardDeltaInterface) => void,
+    filters: DashboardFilterInterface = {},
+) => {
+    // EventSource can't send headers, so the token goes in the query string
+    const params = new URLSearchParams({
+        ...Object.fromEntries(Object.entries(filters).map(([key, value]) => [key, String(value)])),
+        access_token: parseCookies().access_token || '',
+    });
+    const source = new EventSource(`${api.defaults.baseURL}/budgethink/transactions/dashboard/stream/?${params}`);
+    source.addEventListener('snapshot', (event) => onSnapshot(JSON.parse((event as MessageEvent).data)));
+    source.addEventListener('delta', (event) => onDelta(JSON.parse((event as MessageEvent).data)));
+    return () => source.close();
+};
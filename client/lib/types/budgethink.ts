@@ -82,11 +82,61 @@ export interface DashboardReadInterface {
     }>;
     income_vs_expenses: Array<{ // last 4 months by default
         month: string;
+        month_start: string; // YYYY-MM-01
         income: number;
         expense: number;
     }>;
 }
 
+// Pushed by transactions/dashboard/stream/: new totals plus only the categories and months that changed
+export type DashboardDeltaInterface = Omit<DashboardReadInterface, 'recent_transactions'>;
+
 export interface DashboardFilterInterface {
     months_span?: number; // 4 by default, used for income_vs_expenses
-}
\ No newline at end of file
+}
+
+export interface TimeseriesSeriesInterface {
+    key: string | number | null; // type, or category id (null when uncategorized)
+    name: string;
+    hex_color?: string | null;
+    values: string[]; // decimal strings, e.g. "-12.50"
+    rolling_average: string[]; // rounded to the cent
+}
+
+export interface TimeseriesReadInterface {
+    granularity: 'day' | 'week' | 'month' | 'year';
+    group_by: 'type' | 'category';
+    start: string;
+    end: string;
+    window: number;
+    buckets: string[]; // bucket start dates, one entry per value in every array below
+    series: TimeseriesSeriesInterface[];
+    // Amounts are decimal strings (e.g. "12.50") so no cent is lost to floats
+    income: string[];
+    expense: string[];
+    net: string[];
+    rolling_net: string[];
+    cumulative_balance: string[];
+}
+
+export interface TimeseriesFilterInterface {
+    granularity?: 'day' | 'week' | 'month' | 'year'; // month by default
+    start?: string; // YYYY-MM-DD, 12 buckets before end by default
+    end?: string; // YYYY-MM-DD, today by default
+    group_by?: 'type' | 'category';
+    window?: number; // rolling average window in buckets, 3 by default
+}
+
+export interface SyncReadInterface {
+    token: string; // pass as `since` on the next call
+    full: boolean; // true: replace the local store instead of merging
+    has_more: boolean; // call again with `token` right away
+    categories: CategoryReadInterface[]; // upsert by id
+    transactions: TransactionReadInterface[];
+    budgets: BudgetReadInterface[];
+    deleted: { // apply after the upserts
+        categories: number[];
+        transactions: number[];
+        budgets: number[];
+    };
+}
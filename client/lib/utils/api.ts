@@ -154,6 +154,19 @@ export class GenericApi<ReadType, WriteType> {
         }
     }
 
+    // Target { ids: [...] } or list filters, e.g. { category: 3, transaction_date__lt: '2024-01-01' }
+    async bulkUpdate(target: { ids?: number[] } & Record<string, any>, values: Partial<WriteType> | Record<string, any>) {
+        const { ids, ...filters } = target;
+        const response = await api.patch(`${this.endpoint}/bulk/`, { ids, set: values }, { params: filters });
+        return response.data as { updated: number };
+    }
+
+    async bulkDelete(target: { ids?: number[] } & Record<string, any>) {
+        const { ids, ...filters } = target;
+        const response = await api.delete(`${this.endpoint}/bulk/`, { data: { ids }, params: filters });
+        return response.data as { deleted: number };
+    }
+
     async delete(id: number) {
         try {
             const response = await api.delete(`${this.endpoint}/${id}/`);
@@ -165,4 +178,23 @@ export class GenericApi<ReadType, WriteType> {
     }
 }
 
+export interface BatchOperation {
+    method: 'GET' | 'POST' | 'PUT' | 'PATCH' | 'DELETE';
+    path: string; // relative to /api/v1/, e.g. 'budgethink/transactions/'
+    params?: Record<string, any>;
+    body?: any;
+}
+
+export interface BatchResponse {
+    atomic: boolean;
+    rolled_back: boolean;
+    results: Array<{ status: number; body: any }>; // 424 = skipped after an atomic failure
+}
+
+// Several API calls in one round trip; with atomic, all or nothing
+export const batch = async (operations: BatchOperation[], atomic = false) => {
+    const response = await api.post('/batch/', { atomic, operations });
+    return response.data as BatchResponse;
+};
+
 export default api;
@@ -1,10 +1,12 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+
+from main.admin import FastChangelistAdmin
 from .models import User
 
 
 @admin.register(User)
-class CustomUserAdmin(UserAdmin):
+class CustomUserAdmin(FastChangelistAdmin, UserAdmin):
     """
     Custom admin configuration for the User model.
     """
@@ -20,7 +22,7 @@ class CustomUserAdmin(UserAdmin):
     )
     list_filter = ("is_staff", "is_active", "date_joined")
     search_fields = ("username", "email", "first_name", "last_name", "phone_number")
-    ordering = ("-date_joined",)
+    ordering = ("-pk",)  # joining order, without an index on date_joined
 
     fieldsets = (
         (None, {"fields": ("username", "password")}),
@@ -1,5 +1,6 @@
 from django.utils.functional import SimpleLazyObject
 from django.contrib.auth.middleware import get_user
+from django.contrib.auth.models import AnonymousUser
 from rest_framework_simplejwt.authentication import JWTAuthentication
 
 
@@ -25,7 +26,8 @@ class JWTAuthMiddleware:
 
     def _get_user(self, request):
         if not hasattr(request, "_cached_user"):
-            request._cached_user = get_user(request)
+            # Without SessionMiddleware (API_ONLY) there is no session user to look up
+            request._cached_user = get_user(request) if hasattr(request, "session") else AnonymousUser()
             if request._cached_user.is_anonymous:
                 jwt_user = get_user_jwt(request)
                 if jwt_user is not None:
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-19 02:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("account", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="shard",
+            field=models.CharField(default="default", editable=False, max_length=64),
+        ),
+    ]
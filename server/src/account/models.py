@@ -1,9 +1,11 @@
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import DEFAULT_DB_ALIAS, models
 from django.contrib.auth.hashers import make_password
 from django.core.validators import RegexValidator, EmailValidator
 from django.utils.translation import gettext_lazy as _
 
+from main.sharding import new_user_shard
+
 
 class User(AbstractUser):
     """
@@ -52,6 +54,9 @@ class User(AbstractUser):
         help_text=_("International format preferred: +[country code][number]"),
     )
 
+    # Database alias holding the user's budgethink data (main.sharding)
+    shard = models.CharField(max_length=64, default=DEFAULT_DB_ALIAS, editable=False)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -84,6 +89,9 @@ class User(AbstractUser):
         if self.email:
             self.email = self.email.lower()
 
+        if self._state.adding and self.shard == DEFAULT_DB_ALIAS:
+            self.shard = new_user_shard(self.username)
+
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -1,5 +1,7 @@
 from django.urls import path
 from rest_framework_simplejwt.views import TokenRefreshView
+
+from main.middleware import compress_exempt
 from .views import (
     RegisterView,
     CustomTokenObtainPairView,
@@ -14,12 +16,16 @@ urlpatterns = [
     path("register/", RegisterView.as_view(), name="register"),
     path(
         "login/",
-        CustomTokenObtainPairView.as_view(
-            throttle_classes=[UserLoginRateThrottle, AnonRateThrottle]
+        compress_exempt(
+            CustomTokenObtainPairView.as_view(
+                throttle_classes=[UserLoginRateThrottle, AnonRateThrottle]
+            )
         ),
         name="login",
     ),
-    path("token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
+    path(
+        "token/refresh/", compress_exempt(TokenRefreshView.as_view()), name="token_refresh"
+    ),
     path("me/", UserProfileView.as_view(), name="user_profile"),
     path("logout/", LogoutView.as_view(), name="logout"),
     path(
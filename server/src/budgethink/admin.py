@@ -1,13 +1,23 @@
 from django.contrib import admin
-from .models import Category, Transaction, Budget
+
+from main.admin import FastChangelistAdmin, RelatedIdFilter
+from .models import (
+    Category,
+    Transaction,
+    TransactionArchive,
+    TransactionSummary,
+    Budget,
+    RecurringRule,
+)
 
 
 @admin.register(Category)
-class CategoryAdmin(admin.ModelAdmin):
+class CategoryAdmin(FastChangelistAdmin):
     list_display = ("name", "user", "hex_color", "created_at")
-    list_filter = ("user", "created_at")
+    list_filter = (("user", RelatedIdFilter), "created_at")
+    list_select_related = ("user",)
+    raw_id_fields = ("user",)
     search_fields = ("name", "description")
-    list_per_page = 20
     ordering = ("name",)
     readonly_fields = ("created_at", "updated_at")
     fieldsets = (
@@ -20,14 +30,22 @@ class CategoryAdmin(admin.ModelAdmin):
 
 
 @admin.register(Transaction)
-class TransactionAdmin(admin.ModelAdmin):
+class TransactionAdmin(FastChangelistAdmin):
     list_display = ("title", "user", "category", "type", "amount", "transaction_date")
-    list_filter = ("user", "type", "category", "transaction_date")
+    # No date_hierarchy: its year and month links are a DISTINCT over the whole table
+    list_filter = (
+        ("user", RelatedIdFilter),
+        ("category", RelatedIdFilter),
+        "type",
+        "transaction_date",
+    )
+    list_select_related = ("user", "category__user")  # Category.__str__ shows its user
+    raw_id_fields = ("user",)
+    autocomplete_fields = ("category",)
     search_fields = ("title", "description")
-    list_per_page = 20
-    ordering = ("-transaction_date", "-created_at")
+    # Newest first by the primary key: nothing indexes transaction_date on its own
+    ordering = ("-pk",)
     readonly_fields = ("created_at", "updated_at")
-    date_hierarchy = "transaction_date"
     fieldsets = (
         (
             None,
@@ -51,12 +69,14 @@ class TransactionAdmin(admin.ModelAdmin):
 
 
 @admin.register(Budget)
-class BudgetAdmin(admin.ModelAdmin):
+class BudgetAdmin(FastChangelistAdmin):
     list_display = ("name", "user", "category", "amount_limit", "created_at")
-    list_filter = ("user", "category", "created_at")
+    list_filter = (("user", RelatedIdFilter), ("category", RelatedIdFilter), "created_at")
+    list_select_related = ("user", "category__user")
+    raw_id_fields = ("user",)
+    autocomplete_fields = ("category",)
     search_fields = ("name",)
-    list_per_page = 20
-    ordering = ("-created_at",)
+    ordering = ("-pk",)
     readonly_fields = ("created_at", "updated_at")
     fieldsets = (
         (None, {"fields": ("name", "user", "category", "amount_limit")}),
@@ -65,3 +85,68 @@ class BudgetAdmin(admin.ModelAdmin):
             {"fields": ("created_at", "updated_at"), "classes": ("collapse",)},
         ),
     )
+
+
+@admin.register(RecurringRule)
+class RecurringRuleAdmin(FastChangelistAdmin):
+    list_display = ("title", "user", "category", "type", "amount", "rrule", "next_occurrence")
+    list_filter = (("user", RelatedIdFilter), ("category", RelatedIdFilter), "type")
+    list_select_related = ("user", "category__user")
+    raw_id_fields = ("user",)
+    autocomplete_fields = ("category",)
+    search_fields = ("title", "description")
+    ordering = ("title",)
+    readonly_fields = ("materialized_through", "next_occurrence", "created_at", "updated_at")
+    fieldsets = (
+        (
+            None,
+            {
+                "fields": (
+                    "title",
+                    "user",
+                    "category",
+                    "type",
+                    "amount",
+                    "description",
+                )
+            },
+        ),
+        ("Schedule", {"fields": ("rrule", "start_date", "end_date")}),
+        (
+            "Materialization",
+            {"fields": ("materialized_through", "next_occurrence"), "classes": ("collapse",)},
+        ),
+        (
+            "Timestamps",
+            {"fields": ("created_at", "updated_at"), "classes": ("collapse",)},
+        ),
+    )
+
+
+@admin.register(TransactionArchive)
+class TransactionArchiveAdmin(FastChangelistAdmin):
+    list_display = ("title", "user", "category", "type", "amount", "transaction_date")
+    list_filter = (("user", RelatedIdFilter), "type", "transaction_date")
+    list_select_related = ("user", "category__user")
+    search_fields = ("title", "description")
+    ordering = ("-pk",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(TransactionSummary)
+class TransactionSummaryAdmin(FastChangelistAdmin):
+    list_display = ("month", "user", "category", "type", "count", "total")
+    list_filter = (("user", RelatedIdFilter), "type", "month")
+    list_select_related = ("user", "category__user")
+    ordering = ("-month",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class BudgethinkConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "budgethink"
+
+    def ready(self):
+        from budgethink import signals  # noqa
@@ -0,0 +1,157 @@
+"""
+Cold archive for old transactions.
+
+`manage.py archive_transactions` moves the transactions dated before a cutoff
+(ARCHIVE_AFTER_YEARS ago by default) from Transaction to TransactionArchive,
+with their ids, and adds them to the per-month TransactionSummary rows. The
+transactions table and its (user, transaction_date) index keep only recent
+rows, and full-history totals (the dashboard, Category totals) add the
+summaries instead of summing the archived rows again.
+
+Reads of a date range (list, search, retrieve, export) read the archive too,
+as a UNION ALL, only when the range reaches it: when it starts on or before
+the user's last archived date, which is cached in their cache scope. Archived
+transactions are read-only, and /sync/ only sends live ones.
+"""
+
+from collections import Counter, defaultdict
+from datetime import date
+
+from dateutil.relativedelta import relativedelta
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from budgethink.live import publish_reset
+from budgethink.models import Transaction, TransactionArchive, TransactionSummary
+from main.cache import get_two_tier_cache, invalidate_scope, user_cache_scope
+from main.sharding import shard_aliases
+
+ARCHIVE_AFTER_YEARS = 2
+BATCH_SIZE = 1000
+ARCHIVED_THROUGH_CACHE_DURATION = 60 * 60 * 24  # archiving resets it
+
+
+def default_cutoff(today=None):
+    return (today or date.today()) - relativedelta(years=ARCHIVE_AFTER_YEARS)
+
+
+def add_to_summaries(database, rows):
+    """Add the transactions `rows` to their month's summaries."""
+    totals = defaultdict(lambda: [0, 0])
+    for row in rows:
+        key = (
+            row.user_id,
+            row.category_id,
+            row.type,
+            row.transaction_date.replace(day=1),
+        )
+        totals[key][0] += 1
+        totals[key][1] += row.amount
+
+    summaries = (
+        TransactionSummary.objects.using(database)
+        .select_for_update()
+        .filter(
+            user_id__in={key[0] for key in totals}, month__in={key[3] for key in totals}
+        )
+    )
+    existing = {
+        (summary.user_id, summary.category_id, summary.type, summary.month): summary
+        for summary in summaries
+    }
+    now = timezone.now()
+    new, changed = [], []
+    for key, (count, total) in totals.items():
+        summary = existing.get(key)
+        if summary is None:
+            user_id, category_id, type, month = key
+            new.append(
+                TransactionSummary(
+                    user_id=user_id,
+                    category_id=category_id,
+                    type=type,
+                    month=month,
+                    count=count,
+                    total=total,
+                )
+            )
+        else:
+            summary.count += count
+            summary.total += total
+            summary.updated_at = now
+            changed.append(summary)
+    TransactionSummary.objects.using(database).bulk_create(new)
+    TransactionSummary.objects.using(database).bulk_update(
+        changed, ["count", "total", "updated_at"]
+    )
+
+
+def archive_shard(database, cutoff, batch_size=BATCH_SIZE):
+    """
+    Archive the transactions on `database` dated before `cutoff`, one
+    transaction per batch; returns {user_id: transactions archived}.
+    """
+    fields = [field.attname for field in Transaction._meta.concrete_fields]
+    archived = Counter()
+    while True:
+        with transaction.atomic(using=database):
+            rows = list(
+                Transaction.objects.using(database)
+                .select_for_update()
+                .filter(transaction_date__lt=cutoff)
+                .order_by("pk")[:batch_size]
+            )
+            if not rows:
+                break
+            TransactionArchive.objects.using(database).bulk_create(
+                TransactionArchive(**{field: getattr(row, field) for field in fields})
+                for row in rows
+            )
+            add_to_summaries(database, rows)
+            # No signals: the rows still exist, so no tombstones or live changes
+            pks = [row.pk for row in rows]
+            Transaction.objects.using(database).filter(pk__in=pks)._raw_delete(database)
+        archived.update(row.user_id for row in rows)
+    return archived
+
+
+def archive_transactions(cutoff=None, batch_size=BATCH_SIZE):
+    """Archive the transactions dated before `cutoff`, on every shard; returns how many."""
+    cutoff = cutoff or default_cutoff()
+    archived = Counter()
+    for database in shard_aliases():
+        archived.update(archive_shard(database, cutoff, batch_size))
+    for user_id in archived:
+        invalidate_scope(user_cache_scope(user_id))
+        publish_reset(user_id)
+    return sum(archived.values())
+
+
+def archived_through(user_id):
+    """The date of the user's last archived transaction, None without any."""
+    scope = user_cache_scope(user_id)
+    return get_two_tier_cache().get_or_compute(
+        f"archive_{scope}_through",
+        scope,
+        lambda: TransactionArchive.objects.filter(user_id=user_id).aggregate(
+            through=Max("transaction_date")
+        )["through"],
+        ARCHIVED_THROUGH_CACHE_DURATION,
+    )
+
+
+def reaches_archive(user_id, start):
+    """Whether transactions from `start` on (all of them for None) include archived ones."""
+    through = archived_through(user_id)
+    return through is not None and (start is None or start <= through)
+
+
+def range_start(filters):
+    """The first transaction_date list `filters` allow, None if unbounded."""
+    if "transaction_date__range" in filters:
+        return filters["transaction_date__range"][0]
+    for key in ("transaction_date", "transaction_date__gte", "transaction_date__gt"):
+        if key in filters:
+            return filters[key]
+    return None
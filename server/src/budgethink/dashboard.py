@@ -0,0 +1,107 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.db.models import Q, Sum
+from django.db.models.functions import TruncMonth
+
+
+def dashboard_totals(queryset, months_span=4, summaries=None):
+    """
+    Income, expense and balance totals, expenses per category and income vs
+    expenses per month over the last `months_span` months.
+    `summaries` are the user's TransactionSummary rows, which stand in for
+    their archived transactions (budgethink.archive).
+    Shared by dashboard_endpoint and the live dashboard stream's snapshots.
+    """
+    income = queryset.filter(type="income").aggregate(total=Sum("amount"))["total"] or 0
+    expense = (
+        queryset.filter(type="expense").aggregate(total=Sum("amount"))["total"] or 0
+    )
+
+    categories = list(
+        queryset.filter(type="expense")
+        .values("category__name")
+        .annotate(total=Sum("amount"))
+    )
+
+    end_date = datetime.now()
+    start_date = end_date - timedelta(days=months_span * 30)
+
+    monthly_data = list(
+        queryset.filter(
+            Q(type="income") | Q(type="expense"),
+            transaction_date__gte=start_date,
+            transaction_date__lte=end_date,
+        )
+        .annotate(month=TruncMonth("transaction_date"))
+        .values("month", "type")
+        .annotate(total=Sum("amount"))
+        .order_by("-month")
+    )
+
+    if summaries is not None:
+        for entry in summaries.values("type").annotate(total=Sum("total")):
+            if entry["type"] == "income":
+                income += entry["total"]
+            else:
+                expense += entry["total"]
+
+        archived = (
+            summaries.filter(type="expense")
+            .values("category__name")
+            .annotate(total=Sum("total"))
+        )
+        expenses = {entry["category__name"]: entry for entry in categories}
+        for entry in archived:
+            if entry["category__name"] in expenses:
+                expenses[entry["category__name"]]["total"] += entry["total"]
+            else:
+                categories.append(entry)
+
+        # Archived months count whole when the window starts within them
+        months = defaultdict(int)
+        archived = (
+            summaries.filter(month__gte=start_date.date().replace(day=1))
+            .values("month", "type")
+            .annotate(total=Sum("total"))
+        )
+        for entry in [*monthly_data, *archived]:
+            months[entry["month"], entry["type"]] += entry["total"]
+        monthly_data = [
+            {"month": month, "type": type, "total": total}
+            for (month, type), total in sorted(months.items(), reverse=True)
+        ]
+    balance = income - expense
+
+    income_vs_expenses = []
+    current_month = None
+    month_data = {}
+
+    for entry in monthly_data:
+        month = entry["month"].strftime("%B")
+        if month != current_month:
+            if current_month is not None:
+                income_vs_expenses.append(month_data)
+            current_month = month
+            month_data = {
+                "month": month,
+                "month_start": entry["month"].isoformat(),
+                "income": 0,
+                "expense": 0,
+            }
+
+        if entry["type"] == "income":
+            month_data["income"] = entry["total"]
+        else:
+            month_data["expense"] = entry["total"]
+
+    if current_month is not None:
+        income_vs_expenses.append(month_data)
+
+    return {
+        "income": income,
+        "expense": expense,
+        "balance": balance,
+        "categories": categories,
+        "income_vs_expenses": income_vs_expenses,
+    }
@@ -0,0 +1,249 @@
+"""
+Live dashboard over Server-Sent Events.
+
+Saving or deleting a transaction publishes its effect on the dashboard (a
+signed amount per type, category and month) to the owner's channel once the
+database transaction commits. Each open stream loads one dashboard snapshot
+and then applies those changes to its own running totals, so a push costs a
+few additions instead of a new aggregation. Category renames and deletes
+publish a reset, which makes streams reload their snapshot.
+
+Streams hold their connection open, so they need the ASGI server:
+    uvicorn main.asgi:application
+"""
+
+import asyncio
+import json
+from datetime import date, timedelta
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.db import connections, transaction
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+from budgethink.dashboard import dashboard_totals
+from budgethink.models import Category, Transaction, TransactionSummary
+from main.pubsub import RESET, get_pubsub
+from main.sharding import shard_for_user, user_shard
+
+KEEPALIVE_SECONDS = 15
+RETRY_MS = 3000  # EventSource reconnect delay
+
+# Transaction fields that move dashboard numbers
+DASHBOARD_FIELDS = ["type", "amount", "category_id", "transaction_date"]
+
+
+def dashboard_channel(user_id):
+    return f"dashboard:{user_id}"
+
+
+def dashboard_values(instance):
+    """The instance's DASHBOARD_FIELDS, normalized (amounts may still be strings)."""
+    return {
+        "type": instance.type,
+        "amount": Transaction._meta.get_field("amount").to_python(instance.amount),
+        "category_id": instance.category_id,
+        "transaction_date": Transaction._meta.get_field("transaction_date").to_python(
+            instance.transaction_date
+        ),
+    }
+
+
+def on_user_commit(user_id, function):
+    """Call `function` once the open transaction on the user's shard commits."""
+    transaction.on_commit(function, using=shard_for_user(user_id))
+
+
+def stored_dashboard_values(instance, using):
+    """
+    The saved row's DASHBOARD_FIELDS, read before a save overwrites them, or
+    None when no dashboard stream listens to the user (nothing to publish).
+    """
+    if not get_pubsub().has_subscribers(dashboard_channel(instance.user_id)):
+        return None
+    rows = Transaction.objects.using(using).filter(pk=instance.pk)
+    return rows.values(*DASHBOARD_FIELDS).first()
+
+
+def publish_transaction_change(user_id, old, new):
+    """
+    Publish the dashboard effect of a transaction going from `old` to `new`
+    values (None for created / deleted) after the current commit.
+    """
+    if old == new:
+        return
+    pubsub = get_pubsub()
+    channel = dashboard_channel(user_id)
+    if not pubsub.has_subscribers(channel):
+        return
+
+    category_ids = {values["category_id"] for values in (old, new) if values}
+    names = dict(
+        Category.objects.filter(pk__in=category_ids - {None}).values_list("pk", "name")
+    )
+    changes = [
+        {
+            "type": values["type"],
+            "amount": str(sign * values["amount"]),
+            "category": names.get(values["category_id"]),
+            "date": values["transaction_date"].isoformat(),
+        }
+        for sign, values in ((-1, old), (1, new))
+        if values
+    ]
+    on_user_commit(user_id, lambda: pubsub.publish(channel, {"changes": changes}))
+
+
+def publish_reset(user_id):
+    pubsub = get_pubsub()
+    channel = dashboard_channel(user_id)
+    if pubsub.has_subscribers(channel):
+        on_user_commit(user_id, lambda: pubsub.publish(channel, RESET))
+
+
+class DashboardState:
+    """One stream's running dashboard totals."""
+
+    def __init__(self, snapshot, months_span):
+        self.snapshot = snapshot
+        self.income = Decimal(snapshot["income"])
+        self.expense = Decimal(snapshot["expense"])
+        self.categories = {
+            entry["category__name"]: entry["total"] for entry in snapshot["categories"]
+        }
+        self.months = {
+            entry["month_start"]: entry for entry in snapshot["income_vs_expenses"]
+        }
+        # Same window as dashboard_totals
+        self.end_date = date.today()
+        self.start_date = self.end_date - timedelta(days=months_span * 30)
+
+    @classmethod
+    def load(cls, user, months_span):
+        from budgethink.recurring import (
+            materialize_if_due,
+        )  # it publishes through this module
+
+        try:
+            with user_shard(user.pk, user.shard):
+                materialize_if_due(user.pk)
+                transactions = Transaction.objects.filter(user=user)
+                summaries = TransactionSummary.objects.filter(user=user)
+                return cls(
+                    dashboard_totals(transactions, months_span, summaries), months_span
+                )
+        finally:
+            # Don't hold a database connection for the life of the stream
+            connections.close_all()
+
+    def apply(self, changes):
+        """Apply published changes; returns the totals, categories and months they touched."""
+        categories, months = {}, {}
+        for change in changes:
+            amount = Decimal(change["amount"])
+            day = date.fromisoformat(change["date"])
+            if change["type"] == "income":
+                self.income += amount
+            else:
+                self.expense += amount
+                name = change["category"]
+                self.categories[name] = self.categories.get(name, 0) + amount
+                categories[name] = {
+                    "category__name": name,
+                    "total": self.categories[name],
+                }
+
+            if self.start_date <= day <= self.end_date:
+                month_start = day.replace(day=1).isoformat()
+                month = self.months.setdefault(
+                    month_start,
+                    {
+                        "month": day.strftime("%B"),
+                        "month_start": month_start,
+                        "income": 0,
+                        "expense": 0,
+                    },
+                )
+                month[change["type"]] += amount
+                months[month_start] = month
+
+        return {
+            "income": self.income,
+            "expense": self.expense,
+            "balance": self.income - self.expense,
+            "categories": list(categories.values()),
+            "income_vs_expenses": list(months.values()),
+        }
+
+
+def sse(event, data):
+    payload = json.dumps(data, cls=JSONEncoder, separators=(",", ":"))
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+async def dashboard_events(user, months_span):
+    subscription = await get_pubsub().subscribe(dashboard_channel(user.pk))
+    try:
+        # Subscribed first: changes committed while the snapshot loads are not lost
+        state = await sync_to_async(DashboardState.load)(user, months_span)
+        yield f"retry: {RETRY_MS}\n" + sse("snapshot", state.snapshot)
+        while True:
+            try:
+                message = await asyncio.wait_for(subscription.get(), KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if message.get("reset"):
+                state = await sync_to_async(DashboardState.load)(user, months_span)
+                yield sse("snapshot", state.snapshot)
+            else:
+                yield sse("delta", state.apply(message["changes"]))
+    finally:
+        await subscription.close()
+
+
+def authenticate_stream(request):
+    """JWT from the Authorization header or, for EventSource, `?access_token=`."""
+    if request.user.is_authenticated:
+        return request.user
+    raw_token = request.GET.get("access_token")
+    if not raw_token:
+        return None
+    authentication = JWTAuthentication()
+    try:
+        return authentication.get_user(authentication.get_validated_token(raw_token))
+    except (InvalidToken, AuthenticationFailed):
+        return None
+
+
+async def dashboard_stream(request):
+    """
+    GET /transactions/dashboard/stream/?months_span=4: a `snapshot` event with
+    the dashboard_endpoint totals, then a `delta` event per change with the
+    new totals and the categories and months it touched.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {"error": "The dashboard stream needs the ASGI server (main.asgi)"},
+            status=501,
+        )
+    user = await sync_to_async(authenticate_stream)(request)
+    if user is None:
+        return JsonResponse(
+            {"detail": "Authentication credentials were not provided."}, status=401
+        )
+    try:
+        months_span = int(request.GET.get("months_span", 4))
+    except ValueError:
+        return JsonResponse({"error": "months_span must be an integer"}, status=400)
+
+    response = StreamingHttpResponse(
+        dashboard_events(user, months_span), content_type="text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # keep proxies from buffering events
+    return response
@@ -0,0 +1,35 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from budgethink.archive import (
+    ARCHIVE_AFTER_YEARS,
+    BATCH_SIZE,
+    archive_transactions,
+    default_cutoff,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves the transactions dated before --before (default: "
+        f"{ARCHIVE_AFTER_YEARS} years ago) to the archive, leaving monthly summaries"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--before", help="YYYY-MM-DD")
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            cutoff = (
+                date.fromisoformat(options["before"])
+                if options["before"]
+                else default_cutoff()
+            )
+        except ValueError:
+            raise CommandError("--before must be a YYYY-MM-DD date")
+        archived = archive_transactions(cutoff, options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Archived {archived} transactions before {cutoff}")
+        )
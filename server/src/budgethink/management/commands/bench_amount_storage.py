@@ -0,0 +1,174 @@
+import statistics
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.apps import apps
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth
+from django.test.runner import DiscoverRunner
+from django.test.utils import (
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+
+
+def dashboard_aggregates(apps, user_id):
+    """The aggregates dashboard_endpoint runs, without the HTTP layer."""
+    transactions = apps.get_model("budgethink", "Transaction").objects.filter(
+        user_id=user_id
+    )
+    since = date.today() - timedelta(days=4 * 30)
+    return (
+        transactions.filter(type="income").aggregate(total=Sum("amount"))["total"],
+        transactions.filter(type="expense").aggregate(total=Sum("amount"))["total"],
+        sorted(
+            transactions.filter(type="expense")
+            .values_list("category__name")
+            .annotate(total=Sum("amount"))
+        ),
+        list(
+            transactions.filter(transaction_date__gte=since)
+            .annotate(month=TruncMonth("transaction_date"))
+            .values_list("month", "type")
+            .annotate(total=Sum("amount"))
+            .order_by("-month", "type")
+        ),
+    )
+
+
+def category_totals(apps, user_id):
+    """Category.total_income / total_expense for every category of the user."""
+    Category = apps.get_model("budgethink", "Category")
+    return [
+        (
+            category.name,
+            category.transactions.filter(type="income").aggregate(total=Sum("amount"))[
+                "total"
+            ],
+            category.transactions.filter(type="expense").aggregate(total=Sum("amount"))[
+                "total"
+            ],
+        )
+        for category in Category.objects.filter(user_id=user_id).order_by("name")
+    ]
+
+
+def amount_scan(apps, user_id):
+    """Every amount of the user, one Python value per row."""
+    Transaction = apps.get_model("budgethink", "Transaction")
+    return sum(
+        Transaction.objects.filter(user_id=user_id).values_list("amount", flat=True)
+    )
+
+
+# Each workload takes the app registry and a user id
+WORKLOADS = [
+    ("dashboard aggregates", dashboard_aggregates),
+    ("category totals", category_totals),
+    ("amount column scan", amount_scan),
+]
+
+
+def round_to_cents(value):
+    """`value` with every Decimal rounded to cents, for comparing results."""
+    if isinstance(value, Decimal):
+        return value.quantize(Decimal("0.01"))
+    if isinstance(value, dict):
+        return {key: round_to_cents(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [round_to_cents(item) for item in value]
+    return value
+
+
+def timed(function, repeat):
+    """(median seconds, last result) of `repeat` calls."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), result
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks dashboard and category aggregates with amounts stored as "
+        "integer cents vs decimals (AMOUNT_STORAGE), converting a seeded test database"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows",
+            type=int,
+            default=1_000_000,
+            help="Approximate transactions to seed",
+        )
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=1)
+
+    def convert(self, storage):
+        started = time.perf_counter()
+        call_command("convert_amount_storage", to=storage, stdout=StringIO())
+        return time.perf_counter() - started
+
+    def measure(self, storage, repeat):
+        timings, results = {}, {}
+        with override_settings(AMOUNT_STORAGE=storage):
+            for name, workload in WORKLOADS:
+                workload(apps, 1)  # warm the page cache
+                timings[name], results[name] = timed(lambda: workload(apps, 1), repeat)
+        return timings, results
+
+    def handle(self, *args, **options):
+        # Never touch the real database: seed a throwaway test database
+        setup_test_environment()
+        runner = DiscoverRunner(verbosity=0, interactive=False)
+        old_config = runner.setup_databases()
+        try:
+            days = 3650
+            tx_per_day = max(1, round(options["rows"] / days))
+            self.stdout.write(f"Seeding ~{days * tx_per_day:,} transactions...")
+            call_command(
+                "create_mock_data",
+                users=1,
+                days=days,
+                tx_per_day=tx_per_day,
+                seed=options["seed"],
+                stdout=StringIO(),
+            )
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT COUNT(*) FROM budgethink_transaction")
+                rows = cursor.fetchone()[0]
+            self.stdout.write(f"{rows:,} transactions on {connection.vendor}")
+
+            # Both layouts are measured on tables freshly rebuilt by the conversion
+            self.convert("cents")
+            to_decimal = self.convert("decimal")
+            decimal, decimal_results = self.measure("decimal", options["repeat"])
+            to_cents = self.convert("cents")
+            cents, cents_results = self.measure("cents", options["repeat"])
+        finally:
+            runner.teardown_databases(old_config)
+            teardown_test_environment()
+
+        self.stdout.write(f"{'':<22} {'decimal':>11} {'cents':>11} {'speedup':>8}")
+        for name, _ in WORKLOADS:
+            self.stdout.write(
+                f"{name:<22} {decimal[name] * 1000:>8.1f} ms {cents[name] * 1000:>8.1f} ms "
+                f"{decimal[name] / cents[name]:>7.2f}x"
+            )
+        self.stdout.write(
+            f"Converting {rows:,} rows: to cents {to_cents:.1f} s, to decimal {to_decimal:.1f} s"
+        )
+        if round_to_cents(cents_results) != round_to_cents(decimal_results):
+            self.stdout.write(self.style.ERROR("Results differ between storage modes"))
+            return
+        self.stdout.write(
+            self.style.SUCCESS("Both storage modes return the same totals")
+        )
@@ -1,241 +1,425 @@
 from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connections, router, transaction
+from django.utils import timezone
 from budgethink.models import Category, Transaction, Budget
-from datetime import datetime, timedelta
-import random
+from main.sharding import group_by_shard, new_user_shard, user_shard
+from datetime import date, timedelta
 from decimal import Decimal
-from django.contrib.auth import get_user_model
+from itertools import islice
+import calendar
+import math
+import multiprocessing
+import random
+import time
 User = get_user_model()
 
+CATEGORIES = [
+    {'name': 'Food & Dining', 'description': 'Groceries, restaurants, and food delivery', 'hex_color': '#FF5733'},
+    {'name': 'Transportation', 'description': 'Public transport, fuel, and car maintenance', 'hex_color': '#33A8FF'},
+    {'name': 'Housing', 'description': 'Rent, utilities, and home maintenance', 'hex_color': '#3356FF'},
+    {'name': 'Entertainment', 'description': 'Movies, games, and leisure activities', 'hex_color': '#B033FF'},
+    {'name': 'Shopping', 'description': 'Clothing, electronics, and other purchases', 'hex_color': '#FF33E6'},
+    {'name': 'Healthcare', 'description': 'Medical expenses and insurance', 'hex_color': '#33FFA8'},
+    {'name': 'Education', 'description': 'Books, courses, and educational materials', 'hex_color': '#FFD633'},
+    {'name': 'Salary', 'description': 'Monthly salary and bonuses', 'hex_color': '#4CAF50'},
+    {'name': 'Freelance', 'description': 'Income from freelance work', 'hex_color': '#2196F3'},
+    {'name': 'Investments', 'description': 'Investment returns and dividends', 'hex_color': '#9C27B0'},
+]
+
+EXPENSE_DESCRIPTIONS = {
+    'Food & Dining': [
+        'Grocery shopping at SM Supermarket',
+        'Dinner at Jollibee',
+        'Coffee at Starbucks',
+        'Lunch at McDonald\'s',
+        'Food delivery via GrabFood',
+        'Weekend groceries',
+        'Snacks at 7-Eleven',
+        'Breakfast at Cafe',
+        'Takeout from Chowking',
+        'Grocery at Puregold',
+    ],
+    'Transportation': [
+        'Grab ride to work',
+        'Monthly MRT pass',
+        'Gas refill',
+        'Car maintenance',
+        'Jeepney fare',
+        'Taxi ride',
+        'Bus fare',
+        'Parking fee',
+        'Car wash',
+        'Bike maintenance',
+    ],
+    'Housing': [
+        'Monthly rent',
+        'Electricity bill',
+        'Water bill',
+        'Internet bill',
+        'Home maintenance',
+        'Condo dues',
+        'Property tax',
+        'Home insurance',
+        'Repair services',
+        'Cleaning services',
+    ],
+    'Entertainment': [
+        'Netflix subscription',
+        'Movie tickets',
+        'Concert tickets',
+        'Video games',
+        'Streaming subscription',
+        'Spotify Premium',
+        'Gym membership',
+        'Sports event',
+        'Theme park tickets',
+        'Hobby supplies',
+    ],
+    'Shopping': [
+        'New clothes',
+        'Electronics purchase',
+        'Home appliances',
+        'Furniture',
+        'Gadgets',
+        'Shoes',
+        'Accessories',
+        'Home decor',
+        'Kitchenware',
+        'Office supplies',
+    ],
+    'Healthcare': [
+        'Doctor consultation',
+        'Medicine purchase',
+        'Dental checkup',
+        'Health insurance',
+        'Vitamins',
+        'Eye checkup',
+        'Lab tests',
+        'Physical therapy',
+        'Medical supplies',
+        'Health supplements',
+    ],
+    'Education': [
+        'Online course',
+        'Textbooks',
+        'Workshop registration',
+        'Educational materials',
+        'School supplies',
+        'Tutorial services',
+        'Language class',
+        'Certification exam',
+        'Research materials',
+        'Educational app subscription',
+    ],
+}
+
+INCOME_DESCRIPTIONS = {
+    'Salary': [
+        'Monthly salary',
+        'Performance bonus',
+        'Year-end bonus',
+        'Overtime pay',
+        'Commission',
+        '13th month pay',
+        'Holiday bonus',
+        'Project completion bonus',
+    ],
+    'Freelance': [
+        'Web development project',
+        'Graphic design work',
+        'Consulting services',
+        'Content writing',
+        'Video editing',
+        'Social media management',
+        'Photography gig',
+        'Tutoring services',
+    ],
+    'Investments': [
+        'Stock dividends',
+        'Investment returns',
+        'Interest income',
+        'Mutual fund returns',
+        'Bond interest',
+        'Real estate rental',
+        'Business dividends',
+        'Crypto returns',
+    ],
+}
+
+TRANSACTION_NAMES = [
+    "Monthly Expense", "Regular Payment", "Routine Purchase",
+    "Standard Transaction", "Weekly Spending", "Everyday Expense",
+    "Recurring Payment", "Usual Purchase", "Regular Expense",
+    "Common Transaction", "Typical Payment", "Standard Expense",
+    "Ordinary Purchase", "Normal Payment", "Basic Transaction"
+]
+
+INCOME_CATEGORIES = ['Salary', 'Freelance', 'Investments']
+
+# Day-to-day spending: (share of transactions, median amount, log-normal sigma)
+EXPENSE_PROFILE = {
+    'Food & Dining': (0.42, 350, 0.7),
+    'Transportation': (0.25, 180, 0.8),
+    'Shopping': (0.12, 1500, 1.0),
+    'Entertainment': (0.08, 600, 0.8),
+    'Healthcare': (0.05, 900, 0.9),
+    'Education': (0.05, 1200, 0.8),
+    'Housing': (0.03, 1500, 0.6),
+}
+EXPENSE_NAMES = list(EXPENSE_PROFILE)
+EXPENSE_WEIGHTS = [profile[0] for profile in EXPENSE_PROFILE.values()]
+
+# Fixed monthly bills: (category, description, day of month, median amount)
+MONTHLY_BILLS = [
+    ('Housing', 'Monthly rent', 1, 15000),
+    ('Entertainment', 'Netflix subscription', 5, 549),
+    ('Entertainment', 'Spotify Premium', 8, 194),
+    ('Housing', 'Electricity bill', 10, 3500),
+    ('Housing', 'Water bill', 12, 600),
+    ('Housing', 'Internet bill', 15, 1700),
+]
+
+WEEKEND_FACTOR = 1.35  # people spend more often on weekends
+FREELANCE_DAILY_PROBABILITY = 0.1
+
+
+def poisson(rng, lam):
+    """Draw a Poisson variate; Knuth's method for small rates, normal approximation above."""
+    if lam > 30:
+        return max(0, round(rng.gauss(lam, math.sqrt(lam))))
+    limit = math.exp(-lam)
+    count = 0
+    product = rng.random()
+    while product > limit:
+        count += 1
+        product *= rng.random()
+    return count
+
+
+def money(rng, median, sigma):
+    """Log-normally distributed amount in centavos, at least 1."""
+    return max(1, int(rng.lognormvariate(math.log(median), sigma) * 100))
+
+
+def generate_transactions(category_ids, start_date, end_date, tx_per_day, rng):
+    """
+    Yield one user's transactions between the two dates as
+    (category_id, type, amount in centavos, title, description, date) tuples,
+    one day at a time, so callers can stream them into the database in bounded batches.
+    """
+    salary = money(rng, 30000, 0.4)
+    bills = [
+        (category_ids[name], description, day, money(rng, median, 0.15))
+        for name, description, day, median in MONTHLY_BILLS
+    ]
+    current_date = start_date
+    while current_date <= end_date:
+        day = current_date.day
+        last_day = calendar.monthrange(current_date.year, current_date.month)[1]
+
+        # Semi-monthly salary on the 15th and the last day of the month
+        if day == 15 or day == last_day:
+            yield (category_ids['Salary'], 'income', salary, 'Recurring Payment', 'Monthly salary', current_date)
+        if day == 20 and rng.random() < 0.5:
+            yield (
+                category_ids['Investments'], 'income', money(rng, 2500, 0.9), rng.choice(TRANSACTION_NAMES),
+                rng.choice(INCOME_DESCRIPTIONS['Investments']), current_date,
+            )
+        if rng.random() < FREELANCE_DAILY_PROBABILITY:
+            yield (
+                category_ids['Freelance'], 'income', money(rng, 6000, 0.7), rng.choice(TRANSACTION_NAMES),
+                rng.choice(INCOME_DESCRIPTIONS['Freelance']), current_date,
+            )
+
+        for category_id, description, bill_day, amount in bills:
+            if day == min(bill_day, last_day):
+                yield (category_id, 'expense', amount, 'Recurring Payment', description, current_date)
+
+        rate = tx_per_day * (WEEKEND_FACTOR if current_date.weekday() >= 5 else 1)
+        for name in rng.choices(EXPENSE_NAMES, EXPENSE_WEIGHTS, k=poisson(rng, rate)):
+            _, median, sigma = EXPENSE_PROFILE[name]
+            yield (
+                category_ids[name], 'expense', money(rng, median, sigma), rng.choice(TRANSACTION_NAMES),
+                rng.choice(EXPENSE_DESCRIPTIONS[name]), current_date,
+            )
+
+        current_date += timedelta(days=1)
+
+
+def insert_transactions(user_id, rows, batch_size):
+    """
+    Insert generated rows with one executemany per batch. Skipping model
+    instances and per-field ORM preparation is what keeps 10M rows in minutes.
+    """
+    using = router.db_for_write(Transaction)
+    db = connections[using]
+    fields = [Transaction._meta.get_field(name) for name in (
+        'user', 'category', 'title', 'description', 'type', 'amount',
+        'transaction_date', 'created_at', 'updated_at',
+    )]
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        db.ops.quote_name(Transaction._meta.db_table),
+        ', '.join(db.ops.quote_name(field.column) for field in fields),
+        ', '.join(['%s'] * len(fields)),
+    )
+    prep_amount = Transaction._meta.get_field('amount').get_db_prep_save
+    dates = {}
+
+    created = 0
+    while batch := list(islice(rows, batch_size)):
+        now = db.ops.adapt_datetimefield_value(timezone.now())
+        values = []
+        for category_id, type, cents, title, description, day in batch:
+            if day not in dates:
+                dates[day] = db.ops.adapt_datefield_value(day)
+            values.append((
+                user_id, category_id, title, description, type,
+                prep_amount(Decimal(cents).scaleb(-2), db), dates[day], now, now,
+            ))
+        with transaction.atomic(using=using), db.cursor() as cursor:
+            cursor.executemany(sql, values)
+        created += len(batch)
+    return created
+
+
+def generate_budgets(user_id, category_ids, start_date, end_date, tx_per_day, rng):
+    """One total budget and one budget per expense category for every month in range."""
+    months = []
+    year, month = start_date.year, start_date.month
+    while (year, month) <= (end_date.year, end_date.month):
+        months.append((year, month))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    existing_totals = set(
+        Budget.objects.filter(user_id=user_id, category=None).values_list('year', 'month')
+    )
+    budgets = []
+    for year, month in months:
+        total = Decimal(0)
+        for name in EXPENSE_NAMES:
+            share, median, _ = EXPENSE_PROFILE[name]
+            expected = share * tx_per_day * 30 * median + sum(
+                bill_median for bill_name, _, _, bill_median in MONTHLY_BILLS if bill_name == name
+            )
+            amount_limit = Decimal(int(expected * rng.uniform(0.9, 1.3) * 100)).scaleb(-2)
+            total += amount_limit
+            budgets.append(Budget(
+                user_id=user_id, category_id=category_ids[name], name=f"{name} Budget",
+                amount_limit=amount_limit, month=month, year=year,
+            ))
+        if (year, month) not in existing_totals:
+            budgets.append(Budget(
+                user_id=user_id, name=f"Budget for {month}/{year}",
+                amount_limit=total, month=month, year=year,
+            ))
+    return budgets
+
+
+def populate_user(job):
+    """Generate one user's transactions and budgets. Runs in worker processes too."""
+    user_id, user_index, options = job
+    # The user's data lives on their shard (main.sharding)
+    with user_shard(user_id):
+        rng = random.Random(f"{options['seed']}-{user_index}")
+        category_ids = dict(Category.objects.filter(user_id=user_id).values_list('name', 'id'))
+        end_date = date.today()
+        start_date = end_date - timedelta(days=options['days'])
+
+        db = connections[router.db_for_write(Transaction)]
+        if db.vendor == 'sqlite':
+            # Parallel workers queue up for SQLite's single write lock
+            with db.cursor() as cursor:
+                cursor.execute('PRAGMA busy_timeout = 60000')
+
+        rows = generate_transactions(category_ids, start_date, end_date, options['tx_per_day'], rng)
+        created = insert_transactions(user_id, rows, options['batch_size'])
+
+        budgets = generate_budgets(
+            user_id, category_ids, start_date, end_date, options['tx_per_day'], rng
+        )
+        Budget.objects.bulk_create(budgets, ignore_conflicts=True)
+        return created
+
 
 class Command(BaseCommand):
     help = 'Creates mock data for testing the budgeting app'
 
-    def handle(self, *args, **kwargs):
-        # Get or create user with id=2
-        user, created = User.objects.get_or_create(id=1, defaults={
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1, help='Number of users (user id=1 is always the first)')
+        parser.add_argument('--days', type=int, default=120, help='Days of history per user')
+        parser.add_argument('--tx-per-day', type=float, default=7.0, help='Average day-to-day expenses per user per day')
+        parser.add_argument('--seed', type=int, default=None, help='Random seed for reproducible data')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk insert')
+        parser.add_argument('--workers', type=int, default=1, help='Processes generating users in parallel')
+
+    def get_users(self, count):
+        # Get or create user with id=1, then mock_user_1..N for the rest
+        first, created = User.objects.get_or_create(id=1, defaults={
             'username': 'test_user',
             'email': 'test@example.com',
             'password': 'testpass123'
         })
-
-        # Create categories with hex colors
-        categories = [
-            {'name': 'Food & Dining', 'description': 'Groceries, restaurants, and food delivery', 'hex_color': '#FF5733'},
-            {'name': 'Transportation', 'description': 'Public transport, fuel, and car maintenance', 'hex_color': '#33A8FF'},
-            {'name': 'Housing', 'description': 'Rent, utilities, and home maintenance', 'hex_color': '#3356FF'},
-            {'name': 'Entertainment', 'description': 'Movies, games, and leisure activities', 'hex_color': '#B033FF'},
-            {'name': 'Shopping', 'description': 'Clothing, electronics, and other purchases', 'hex_color': '#FF33E6'},
-            {'name': 'Healthcare', 'description': 'Medical expenses and insurance', 'hex_color': '#33FFA8'},
-            {'name': 'Education', 'description': 'Books, courses, and educational materials', 'hex_color': '#FFD633'},
-            {'name': 'Salary', 'description': 'Monthly salary and bonuses', 'hex_color': '#4CAF50'},
-            {'name': 'Freelance', 'description': 'Income from freelance work', 'hex_color': '#2196F3'},
-            {'name': 'Investments', 'description': 'Investment returns and dividends', 'hex_color': '#9C27B0'},
-        ]
-
-        category_objects = []
-        for category in categories:
-            cat, created = Category.objects.get_or_create(
-                user=user,
-                name=category['name'],
-                defaults={
-                    'description': category['description'],
-                    'hex_color': category['hex_color']
-                }
+        usernames = [f'mock_user_{index}' for index in range(1, count)]
+        existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+        password = make_password('testpass123')  # hash once, not once per user
+        User.objects.bulk_create([
+            User(
+                username=username, email=f'{username}@example.com', password=password,
+                shard=new_user_shard(username),  # what save() would pick
             )
-            category_objects.append(cat)
-
-        # Create transactions for the last 4 months
-        today = datetime.now()
-        start_date = today - timedelta(days=120)  # 4 months ago
-
-        # Common transaction descriptions
-        expense_descriptions = {
-            'Food & Dining': [
-                'Grocery shopping at SM Supermarket',
-                'Dinner at Jollibee',
-                'Coffee at Starbucks',
-                'Lunch at McDonald\'s',
-                'Food delivery via GrabFood',
-                'Weekend groceries',
-                'Snacks at 7-Eleven',
-                'Breakfast at Cafe',
-                'Takeout from Chowking',
-                'Grocery at Puregold',
-            ],
-            'Transportation': [
-                'Grab ride to work',
-                'Monthly MRT pass',
-                'Gas refill',
-                'Car maintenance',
-                'Jeepney fare',
-                'Taxi ride',
-                'Bus fare',
-                'Parking fee',
-                'Car wash',
-                'Bike maintenance',
-            ],
-            'Housing': [
-                'Monthly rent',
-                'Electricity bill',
-                'Water bill',
-                'Internet bill',
-                'Home maintenance',
-                'Condo dues',
-                'Property tax',
-                'Home insurance',
-                'Repair services',
-                'Cleaning services',
-            ],
-            'Entertainment': [
-                'Netflix subscription',
-                'Movie tickets',
-                'Concert tickets',
-                'Video games',
-                'Streaming subscription',
-                'Spotify Premium',
-                'Gym membership',
-                'Sports event',
-                'Theme park tickets',
-                'Hobby supplies',
-            ],
-            'Shopping': [
-                'New clothes',
-                'Electronics purchase',
-                'Home appliances',
-                'Furniture',
-                'Gadgets',
-                'Shoes',
-                'Accessories',
-                'Home decor',
-                'Kitchenware',
-                'Office supplies',
-            ],
-            'Healthcare': [
-                'Doctor consultation',
-                'Medicine purchase',
-                'Dental checkup',
-                'Health insurance',
-                'Vitamins',
-                'Eye checkup',
-                'Lab tests',
-                'Physical therapy',
-                'Medical supplies',
-                'Health supplements',
-            ],
-            'Education': [
-                'Online course',
-                'Textbooks',
-                'Workshop registration',
-                'Educational materials',
-                'School supplies',
-                'Tutorial services',
-                'Language class',
-                'Certification exam',
-                'Research materials',
-                'Educational app subscription',
-            ],
-        }
+            for username in usernames if username not in existing
+        ], batch_size=1000)
+        others = dict(User.objects.filter(username__in=usernames).values_list('username', 'id'))
+        return [first.id] + [others[username] for username in usernames]
+
+    def create_categories(self, user_ids):
+        for alias, shard_user_ids in group_by_shard(user_ids).items():
+            for index in range(0, len(shard_user_ids), 1000):
+                Category.objects.using(alias).bulk_create([
+                    Category(user_id=user_id, **category)
+                    for user_id in shard_user_ids[index:index + 1000]
+                    for category in CATEGORIES
+                ], ignore_conflicts=True)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        user_ids = self.get_users(options['users'])
+        self.create_categories(user_ids)
 
-        income_descriptions = {
-            'Salary': [
-                'Monthly salary',
-                'Performance bonus',
-                'Year-end bonus',
-                'Overtime pay',
-                'Commission',
-                '13th month pay',
-                'Holiday bonus',
-                'Project completion bonus',
-            ],
-            'Freelance': [
-                'Web development project',
-                'Graphic design work',
-                'Consulting services',
-                'Content writing',
-                'Video editing',
-                'Social media management',
-                'Photography gig',
-                'Tutoring services',
-            ],
-            'Investments': [
-                'Stock dividends',
-                'Investment returns',
-                'Interest income',
-                'Mutual fund returns',
-                'Bond interest',
-                'Real estate rental',
-                'Business dividends',
-                'Crypto returns',
-            ],
+        seed = options['seed'] if options['seed'] is not None else random.randrange(2 ** 32)
+        job_options = {
+            'seed': seed,
+            'days': options['days'],
+            'tx_per_day': options['tx_per_day'],
+            'batch_size': options['batch_size'],
         }
+        jobs = [(user_id, index, job_options) for index, user_id in enumerate(user_ids)]
+
+        if options['workers'] > 1:
+            # Each worker opens its own connection after the fork
+            connections.close_all()
+            pool = multiprocessing.get_context('fork').Pool(options['workers'])
+            results = pool.imap_unordered(populate_user, jobs)
+        else:
+            pool = None
+            results = map(populate_user, jobs)
+
+        total = 0
+        try:
+            for done, created in enumerate(results, start=1):
+                total += created
+                if done % 100 == 0 or done == len(jobs):
+                    elapsed = time.perf_counter() - started
+                    self.stdout.write(
+                        f'{done}/{len(jobs)} users, {total} transactions '
+                        f'({total / elapsed:.0f} rows/s)'
+                    )
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
 
-        # Generate transactions
-        transactions = []
-        current_date = start_date
-
-        # Add transaction names
-        transaction_names = [
-            "Monthly Expense", "Regular Payment", "Routine Purchase", 
-            "Standard Transaction", "Weekly Spending", "Everyday Expense",
-            "Recurring Payment", "Usual Purchase", "Regular Expense", 
-            "Common Transaction", "Typical Payment", "Standard Expense",
-            "Ordinary Purchase", "Normal Payment", "Basic Transaction"
-        ]
-
-        while current_date <= today:
-            # Generate 5-10 transactions per day
-            num_transactions = random.randint(5, 10)
-            
-            for _ in range(num_transactions):
-                # 70% chance of expense, 30% chance of income
-                is_expense = random.random() < 0.7
-                
-                if is_expense:
-                    category = random.choice([c for c in category_objects if c.name not in ['Salary', 'Freelance', 'Investments']])
-                    descriptions = expense_descriptions.get(category.name, ['Miscellaneous expense'])
-                    amount = Decimal(random.uniform(100, 5000)).quantize(Decimal('0.01'))
-                else:
-                    category = random.choice([c for c in category_objects if c.name in ['Salary', 'Freelance', 'Investments']])
-                    descriptions = income_descriptions.get(category.name, ['Miscellaneous income'])
-                    amount = Decimal(random.uniform(1000, 20000)).quantize(Decimal('0.01'))
-
-                # Add random hours and minutes to make transaction times more varied
-                random_hours = random.randint(0, 23)
-                random_minutes = random.randint(0, 59)
-                transaction_datetime = current_date.replace(
-                    hour=random_hours,
-                    minute=random_minutes
-                )
-
-                transaction = Transaction(
-                    user=user,
-                    category=category,
-                    amount=amount,
-                    type='expense' if is_expense else 'income',
-                    title=random.choice(transaction_names),
-                    description=random.choice(descriptions),
-                    transaction_date=transaction_datetime
-                )
-                transactions.append(transaction)
-
-            current_date += timedelta(days=1)
-
-        # Bulk create transactions
-        Transaction.objects.bulk_create(transactions)
-
-        # Create budgets
-        budgets = []
-        for category in category_objects:
-            if category.name not in ['Salary', 'Freelance', 'Investments']:
-                budget = Budget(
-                    user=user,
-                    category=category,
-                    name=f"{category.name} Budget",
-                    amount_limit=Decimal(random.uniform(1000, 10000)).quantize(Decimal('0.01'))
-                )
-                budgets.append(budget)
-
-        # Bulk create budgets
-        Budget.objects.bulk_create(budgets)
-
-        self.stdout.write(self.style.SUCCESS('Successfully created mock data')) 
\ No newline at end of file
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully created mock data (seed {seed}, {total} transactions)'
+        ))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from budgethink.recurring import due_users, materialize
+from jobs.queue import enqueue
+
+
+class Command(BaseCommand):
+    help = (
+        "Queues the job that creates the due transactions of recurring rules for "
+        "users who haven't read their data since (reads do it for the others); "
+        "--now runs it in this process"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--now", action="store_true")
+
+    def handle(self, *args, **options):
+        if not options["now"]:
+            job = enqueue("budgethink.materialize_recurring")
+            self.stdout.write(self.style.SUCCESS(f"Queued job {job.pk}"))
+            return
+        created = sum(materialize(user_id) for user_id in list(due_users()))
+        self.stdout.write(self.style.SUCCESS(f"Created {created} transactions"))
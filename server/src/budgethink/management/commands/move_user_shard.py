@@ -0,0 +1,54 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from budgethink.rebalance import move_user
+from main.sharding import shard_aliases
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves a user's budgethink data to another shard (main.sharding); "
+        "without --to, lists the users per shard"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", help="User id or username")
+        parser.add_argument("--to", help="Target shard alias, e.g. shard_1")
+        parser.add_argument(
+            "--grace",
+            type=float,
+            default=5.0,
+            help="Seconds to wait after the switch for requests still writing to the old shard",
+        )
+
+    def handle(self, *args, **options):
+        if not options["to"]:
+            for alias in shard_aliases():
+                self.stdout.write(
+                    f"{alias}: {User.objects.filter(shard=alias).count()} users"
+                )
+            return
+        if not options["user"]:
+            raise CommandError("--user is required with --to")
+
+        lookup = (
+            {"pk": options["user"]}
+            if options["user"].isdigit()
+            else {"username": options["user"]}
+        )
+        user = User.objects.filter(**lookup).first()
+        if user is None:
+            raise CommandError(f"User not found: {options['user']}")
+        source = user.shard
+        try:
+            moved = move_user(user, options["to"], grace=options["grace"])
+        except ValueError as e:
+            raise CommandError(str(e))
+        counts = ", ".join(f"{count} {name}" for name, count in moved.items())
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Moved {user.username} from {source} to {user.shard}: {counts}"
+            )
+        )
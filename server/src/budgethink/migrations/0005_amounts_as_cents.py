@@ -0,0 +1,82 @@
+from decimal import Decimal
+
+import django.core.validators
+from django.db import migrations, models
+from django.db.models import F, Value
+from django.db.models.functions import Cast, Round
+
+import main.fields
+
+# (model, decimal field) pairs moved to integer cents
+AMOUNT_FIELDS = [("transaction", "amount"), ("budget", "amount_limit")]
+
+
+def to_cents(apps, schema_editor):
+    # One UPDATE per table; rounding avoids 10.07 * 100 = 1006.999... on SQLite
+    for model_name, field in AMOUNT_FIELDS:
+        model = apps.get_model("budgethink", model_name)
+        if model._meta.get_field(f"{field}_cents").storage == "cents":
+            value = Cast(Round(F(field) * 100), models.BigIntegerField())
+        else:
+            value = F(field)  # AMOUNT_STORAGE = "decimal": a decimal column too
+        model.objects.using(schema_editor.connection.alias).update(**{f"{field}_cents": value})
+
+
+def to_decimal(apps, schema_editor):
+    for model_name, field in AMOUNT_FIELDS:
+        model = apps.get_model("budgethink", model_name)
+        if model._meta.get_field(f"{field}_cents").storage == "cents":
+            value = Cast(
+                F(f"{field}_cents") / Value(100.0),
+                models.DecimalField(max_digits=20, decimal_places=2),
+            )
+        else:
+            value = F(f"{field}_cents")
+        model.objects.using(schema_editor.connection.alias).update(**{field: value})
+
+
+def cents_field(null=False):
+    return main.fields.CentsField(
+        null=null,
+        validators=[django.core.validators.MinValueValidator(Decimal("0.01"))],
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("budgethink", "0004_alter_budget_unique_together_budget_month_and_more"),
+    ]
+
+    operations = [
+        *[
+            migrations.AddField(
+                model_name=model_name, name=f"{field}_cents", field=cents_field(null=True)
+            )
+            for model_name, field in AMOUNT_FIELDS
+        ],
+        # Nullable, so that unapplying can re-add the column before filling it
+        *[
+            migrations.AlterField(
+                model_name=model_name,
+                name=field,
+                field=models.DecimalField(max_digits=20, decimal_places=2, null=True),
+            )
+            for model_name, field in AMOUNT_FIELDS
+        ],
+        migrations.RunPython(to_cents, to_decimal),
+        *[
+            migrations.RemoveField(model_name=model_name, name=field)
+            for model_name, field in AMOUNT_FIELDS
+        ],
+        *[
+            migrations.RenameField(
+                model_name=model_name, old_name=f"{field}_cents", new_name=field
+            )
+            for model_name, field in AMOUNT_FIELDS
+        ],
+        *[
+            migrations.AlterField(model_name=model_name, name=field, field=cents_field())
+            for model_name, field in AMOUNT_FIELDS
+        ],
+    ]
@@ -0,0 +1,120 @@
+# Generated by Django 5.1.6 on 2026-10-19 02:12
+
+import django.core.validators
+import django.db.models.deletion
+import main.fields
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("budgethink", "0006_sync_indexes_and_tombstones"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RecurringRule",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("title", models.CharField(max_length=255)),
+                ("description", models.TextField(blank=True, null=True)),
+                (
+                    "type",
+                    models.CharField(
+                        choices=[("income", "Income"), ("expense", "Expense")],
+                        default="expense",
+                        max_length=10,
+                    ),
+                ),
+                (
+                    "amount",
+                    main.fields.CentsField(
+                        validators=[
+                            django.core.validators.MinValueValidator(Decimal("0.01"))
+                        ]
+                    ),
+                ),
+                ("rrule", models.CharField(max_length=255)),
+                ("start_date", models.DateField()),
+                ("end_date", models.DateField(blank=True, null=True)),
+                ("materialized_through", models.DateField(blank=True, null=True)),
+                ("next_occurrence", models.DateField(blank=True, null=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "category",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="recurring_rules",
+                        to="budgethink.category",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="recurring_rules",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Recurring rule",
+                "verbose_name_plural": "Recurring rules",
+                "ordering": ["title"],
+            },
+        ),
+        migrations.AddField(
+            model_name="transaction",
+            name="recurring_rule",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="transactions",
+                to="budgethink.recurringrule",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="transaction",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("recurring_rule__isnull", False)),
+                fields=("recurring_rule", "transaction_date"),
+                name="unique_recurring_occurrence",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recurringrule",
+            index=models.Index(
+                fields=["user", "next_occurrence"],
+                name="budgethink__user_id_307eb4_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recurringrule",
+            index=models.Index(
+                fields=["next_occurrence", "user"],
+                name="budgethink__next_oc_143f6e_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recurringrule",
+            index=models.Index(
+                fields=["user", "updated_at"], name="budgethink__user_id_6ad831_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,145 @@
+# Generated by Django 5.1.6 on 2026-10-19 02:28
+
+import django.db.models.deletion
+import main.fields
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("budgethink", "0008_user_fk_without_constraint"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TransactionArchive",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("title", models.CharField(max_length=255)),
+                ("description", models.TextField(blank=True, null=True)),
+                (
+                    "type",
+                    models.CharField(
+                        choices=[("income", "Income"), ("expense", "Expense")],
+                        max_length=10,
+                    ),
+                ),
+                ("amount", main.fields.CentsField()),
+                ("transaction_date", models.DateField()),
+                ("created_at", models.DateTimeField()),
+                ("updated_at", models.DateTimeField()),
+                (
+                    "category",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="archived_transactions",
+                        to="budgethink.category",
+                    ),
+                ),
+                (
+                    "recurring_rule",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="archived_transactions",
+                        to="budgethink.recurringrule",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="archived_transactions",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Archived transaction",
+                "verbose_name_plural": "Archived transactions",
+                "ordering": ["-transaction_date", "-created_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["user", "transaction_date"],
+                        name="budgethink__user_id_17f7da_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="TransactionSummary",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "type",
+                    models.CharField(
+                        choices=[("income", "Income"), ("expense", "Expense")],
+                        max_length=10,
+                    ),
+                ),
+                ("month", models.DateField()),
+                ("count", models.IntegerField(default=0)),
+                ("total", main.fields.CentsField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "category",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="transaction_summaries",
+                        to="budgethink.category",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="transaction_summaries",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Transaction summary",
+                "verbose_name_plural": "Transaction summaries",
+                "ordering": ["-month"],
+                "indexes": [
+                    models.Index(
+                        fields=["user", "month"], name="budgethink__user_id_09116e_idx"
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("user", "category", "type", "month"),
+                        name="unique_transaction_summary",
+                    )
+                ],
+            },
+        ),
+    ]
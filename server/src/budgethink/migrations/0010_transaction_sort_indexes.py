@@ -0,0 +1,27 @@
+# Generated by Django 5.1.6 on 2026-10-19 03:36
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("budgethink", "0009_transaction_archive"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                fields=["user", "amount"], name="budgethink__user_id_d08462_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                fields=["user", "title"], name="budgethink__user_id_c3ca66_idx"
+            ),
+        ),
+    ]
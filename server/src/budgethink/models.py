@@ -1,41 +1,83 @@
+from datetime import datetime, time
+
+from dateutil.rrule import rrulestr
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator
 from decimal import Decimal
+from django.core.exceptions import ValidationError
 from django.db.models import Sum
+from django.utils.functional import cached_property
+
+from main.fields import CentsField
 
 User = get_user_model()
 
+# Foreign keys to users have no database constraint: with sharding
+# (main.sharding) the users table is in another database
+
+
+def annotated_property(compute):
+    """
+    Property reading the `annotated_<name>` a queryset added, if any
+    (budgethink.sync.with_totals), instead of running compute()'s queries.
+    """
+    name = f"annotated_{compute.__name__}"
+
+    def getter(self):
+        if name in self.__dict__:
+            return self.__dict__[name]
+        return compute(self)
+
+    return property(getter)
+
 
 class Category(models.Model):
     name = models.CharField(max_length=255)
     description = models.TextField(blank=True, null=True)
     hex_color = models.CharField(max_length=7, null=True, blank=True)
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="categories")
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="categories", db_constraint=False
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
-    @property
+    @cached_property
+    def archived_totals(self):
+        """{type: (count, total)} of the archived transactions, from their monthly summaries."""
+        summaries = self.transaction_summaries.values("type").annotate(
+            count=Sum("count"), total=Sum("total")
+        )
+        return {entry["type"]: (entry["count"], entry["total"]) for entry in summaries}
+
+    @annotated_property
     def transactions_count(self):
-        return self.transactions.count()
+        archived = sum(count for count, _ in self.archived_totals.values())
+        return self.transactions.count() + archived
     
-    @property
+    @annotated_property
     def income_count(self):
-        return self.transactions.filter(type="income").count()
+        archived = self.archived_totals.get("income", (0, 0))[0]
+        return self.transactions.filter(type="income").count() + archived
     
-    @property
+    @annotated_property
     def expense_count(self):
-        return self.transactions.filter(type="expense").count()
+        archived = self.archived_totals.get("expense", (0, 0))[0]
+        return self.transactions.filter(type="expense").count() + archived
 
-    @property
+    @annotated_property
     def total_income(self):
-        return self.transactions.filter(type="income").aggregate(total=Sum("amount"))["total"] or 0
+        archived = self.archived_totals.get("income", (0, 0))[1]
+        live = self.transactions.filter(type="income").aggregate(total=Sum("amount"))["total"]
+        return (live or 0) + archived
 
-    @property
+    @annotated_property
     def total_expense(self):
-        return self.transactions.filter(type="expense").aggregate(total=Sum("amount"))["total"] or 0
+        archived = self.archived_totals.get("expense", (0, 0))[1]
+        live = self.transactions.filter(type="expense").aggregate(total=Sum("amount"))["total"]
+        return (live or 0) + archived
     
-    @property
+    @annotated_property
     def total_balance(self):
         return self.total_income - self.total_expense
 
@@ -44,6 +86,7 @@ class Category(models.Model):
         verbose_name_plural = "Categories"
         unique_together = ["name", "user"]
         ordering = ["name"]
+        indexes = [models.Index(fields=["user", "updated_at"])]
 
     def __str__(self):
         return f"{self.name} ({self.user.username})"
@@ -62,16 +105,20 @@ class Transaction(models.Model):
     category = models.ForeignKey(
         Category, on_delete=models.SET_NULL, null=True, blank=True, related_name="transactions"
     )
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="transactions")
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="transactions", db_constraint=False
+    )
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True, null=True)
     type = models.CharField(
         max_length=10, choices=TRANSACTION_TYPE_CHOICES, default="expense"
     )
-    amount = models.DecimalField(
-        max_digits=20, decimal_places=2, validators=[MinValueValidator(Decimal("0.01"))]
-    )
+    amount = CentsField(validators=[MinValueValidator(Decimal("0.01"))])
     transaction_date = models.DateField()
+    # Set on the transactions a RecurringRule created
+    recurring_rule = models.ForeignKey(
+        "RecurringRule", on_delete=models.SET_NULL, null=True, blank=True, related_name="transactions"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -82,6 +129,18 @@ class Transaction(models.Model):
         indexes = [
             models.Index(fields=["user", "transaction_date"]),
             models.Index(fields=["user", "type"]),
+            models.Index(fields=["user", "updated_at"]),
+            # Sort orders of the transactions list
+            models.Index(fields=["user", "amount"]),
+            models.Index(fields=["user", "title"]),
+        ]
+        constraints = [
+            # One transaction per occurrence, however many times it's materialized
+            models.UniqueConstraint(
+                fields=["recurring_rule", "transaction_date"],
+                condition=models.Q(recurring_rule__isnull=False),
+                name="unique_recurring_occurrence",
+            )
         ]
 
     def __str__(self):
@@ -97,14 +156,14 @@ class Transaction(models.Model):
 
 
 class Budget(models.Model):
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="budgets")
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="budgets", db_constraint=False
+    )
     category = models.ForeignKey(
         Category, on_delete=models.SET_NULL, null=True, blank=True, related_name="budgets"
     )
     name = models.CharField(max_length=255, null=True, blank=True)
-    amount_limit = models.DecimalField(
-        max_digits=20, decimal_places=2, validators=[MinValueValidator(Decimal("0.01"))]
-    )
+    amount_limit = CentsField(validators=[MinValueValidator(Decimal("0.01"))])
     month = models.IntegerField(default=1)  # 1-12 for January-December
     year = models.IntegerField(default=2024)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -115,6 +174,7 @@ class Budget(models.Model):
         verbose_name_plural = "Budgets"
         ordering = ["-created_at"]
         unique_together = ["user", "category", "month", "year"]
+        indexes = [models.Index(fields=["user", "updated_at"])]
 
     def __str__(self):
         category_name = self.category.name if self.category else "All Categories"
@@ -139,3 +199,199 @@ class Budget(models.Model):
     def clean(self):
         if self.category and self.category.user != self.user:
             raise ValueError("Category must belong to the same user as the budget")
+
+
+RRULE_FREQUENCIES = ["DAILY", "WEEKLY", "MONTHLY", "YEARLY"]
+
+
+def parse_rrule(value, start_date):
+    """
+    The dateutil rrule for an RFC 5545 RRULE such as "FREQ=MONTHLY;BYMONTHDAY=1"
+    starting at `start_date`. ValueError if it isn't one, or repeats more
+    often than daily.
+    """
+    rule = value.upper().removeprefix("RRULE:")
+    params = dict(part.partition("=")[::2] for part in rule.split(";"))
+    if params.get("FREQ") not in RRULE_FREQUENCIES:
+        raise ValueError(f"FREQ must be one of {', '.join(RRULE_FREQUENCIES)}")
+    if "DTSTART" in rule or "\n" in rule:
+        raise ValueError("Only a single RRULE is supported; the start is start_date")
+    try:
+        return rrulestr(rule, dtstart=datetime.combine(start_date, time.min))
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid RRULE: {e}")
+
+
+class RecurringRule(models.Model):
+    """
+    A transaction that repeats (rent, salary, subscriptions). Its occurrences
+    up to today become Transaction rows lazily, see budgethink.recurring.
+    """
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="recurring_rules", db_constraint=False
+    )
+    category = models.ForeignKey(
+        Category, on_delete=models.SET_NULL, null=True, blank=True, related_name="recurring_rules"
+    )
+    title = models.CharField(max_length=255)
+    description = models.TextField(blank=True, null=True)
+    type = models.CharField(
+        max_length=10, choices=Transaction.TRANSACTION_TYPE_CHOICES, default="expense"
+    )
+    amount = CentsField(validators=[MinValueValidator(Decimal("0.01"))])
+    rrule = models.CharField(max_length=255)  # e.g. "FREQ=MONTHLY;BYMONTHDAY=1"
+    start_date = models.DateField()
+    end_date = models.DateField(null=True, blank=True)
+    # Last occurrence turned into a transaction, and the one after it
+    # (None once the rule has no more)
+    materialized_through = models.DateField(null=True, blank=True)
+    next_occurrence = models.DateField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Recurring rule"
+        verbose_name_plural = "Recurring rules"
+        ordering = ["title"]
+        indexes = [
+            models.Index(fields=["user", "next_occurrence"]),
+            models.Index(fields=["next_occurrence", "user"]),
+            models.Index(fields=["user", "updated_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.title} - {self.amount} ({self.rrule})"
+
+    def occurrences_after(self, day):
+        """Occurrence dates after `day` (all of them for None), up to end_date."""
+        schedule = parse_rrule(self.rrule, self.start_date)
+        if day is not None:
+            schedule = schedule.xafter(datetime.combine(day, time.max))
+        for occurrence in schedule:
+            if self.end_date and occurrence.date() > self.end_date:
+                return
+            yield occurrence.date()
+
+    def save(self, *args, **kwargs):
+        # A schedule edit applies from the first occurrence not materialized yet
+        self.next_occurrence = next(self.occurrences_after(self.materialized_through), None)
+        super().save(*args, **kwargs)
+
+    def clean(self):
+        try:
+            parse_rrule(self.rrule, self.start_date)
+        except ValueError as e:
+            raise ValidationError({"rrule": str(e)})
+        if self.end_date and self.end_date < self.start_date:
+            raise ValidationError({"end_date": "end_date must not be before start_date"})
+        if self.category and self.category.user != self.user:
+            raise ValueError("Category must belong to the same user as the rule")
+
+
+class Tombstone(models.Model):
+    """Per-user log of deleted rows, so that /sync/ can report deletes."""
+
+    MODEL_CHOICES = [
+        ("category", "Category"),
+        ("transaction", "Transaction"),
+        ("budget", "Budget"),
+    ]
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="tombstones", db_constraint=False
+    )
+    model = models.CharField(max_length=20, choices=MODEL_CHOICES)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["user", "deleted_at"])]
+
+    def __str__(self):
+        return f"{self.model} {self.object_id} deleted at {self.deleted_at}"
+
+
+class TransactionArchive(models.Model):
+    """
+    Transactions moved out of Transaction by `manage.py archive_transactions`
+    (budgethink.archive), with their ids. Same columns in the same order, so
+    that the two tables can be read as one with a UNION. Read-only.
+    """
+
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="archived_transactions",
+    )
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="archived_transactions", db_constraint=False
+    )
+    title = models.CharField(max_length=255)
+    description = models.TextField(blank=True, null=True)
+    type = models.CharField(max_length=10, choices=Transaction.TRANSACTION_TYPE_CHOICES)
+    amount = CentsField()
+    transaction_date = models.DateField()
+    recurring_rule = models.ForeignKey(
+        RecurringRule,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="archived_transactions",
+    )
+    # The original's, not the archiving's
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = "Archived transaction"
+        verbose_name_plural = "Archived transactions"
+        ordering = ["-transaction_date", "-created_at"]
+        indexes = [models.Index(fields=["user", "transaction_date"])]
+
+    def __str__(self):
+        return f"{self.title} - {self.amount} ({self.get_type_display()})"
+
+    @property
+    def formatted_amount(self):
+        return f"{'+' if self.type == 'income' else '-'}{self.amount}"
+
+
+class TransactionSummary(models.Model):
+    """
+    Count and total of a user's archived transactions per month, category and
+    type: what full-history totals add to the live transactions' SUMs.
+    """
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="transaction_summaries", db_constraint=False
+    )
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="transaction_summaries",
+    )
+    type = models.CharField(max_length=10, choices=Transaction.TRANSACTION_TYPE_CHOICES)
+    month = models.DateField()  # first day of the month
+    count = models.IntegerField(default=0)
+    total = CentsField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Transaction summary"
+        verbose_name_plural = "Transaction summaries"
+        ordering = ["-month"]
+        indexes = [models.Index(fields=["user", "month"])]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "category", "type", "month"], name="unique_transaction_summary"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.month:%Y-%m} {self.type}: {self.count} for {self.total}"
@@ -0,0 +1,174 @@
+"""
+Moving a user's budgethink data to another shard (main.sharding).
+
+1. Copy the user's rows to the target, in one transaction there. Rows get
+   new ids, since every shard numbers its rows itself; archived
+   transactions from the target's Transaction sequence, like archiving.
+2. Switch the user over: new requests use the target.
+3. After a grace period for requests still writing to the source, copy again
+   what they changed, and delete the copies of what they deleted.
+4. Delete the user's rows from the source.
+
+Clients see the move as every row deleted and created again: /sync/ sends
+tombstones for the old ids and the copies, whose updated_at is the move's.
+"""
+
+import time
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from budgethink.live import publish_reset
+from budgethink.models import (
+    Budget,
+    Category,
+    RecurringRule,
+    Tombstone,
+    Transaction,
+    TransactionArchive,
+    TransactionSummary,
+)
+from main.cache import invalidate_scope, user_cache_scope
+from main.sharding import shard_aliases, user_shard
+
+# Rows referenced by other rows come first
+MODELS = [
+    Category,
+    RecurringRule,
+    Budget,
+    Transaction,
+    TransactionArchive,
+    TransactionSummary,
+]
+REFERENCES = {"category_id": Category, "recurring_rule_id": RecurringRule}
+BATCH_SIZE = 1000
+SYNCED_MODELS = dict(Tombstone.MODEL_CHOICES)
+
+
+def allocate_transaction_ids(database, rows):
+    """
+    Give archived `rows` ids from `database`'s Transaction sequence, as
+    archive_shard() keeps them: inserted as transactions, then deleted.
+    """
+    fields = [
+        field.attname
+        for field in Transaction._meta.concrete_fields
+        if not field.primary_key
+    ]
+    for start in range(0, len(rows), BATCH_SIZE):
+        batch = rows[start : start + BATCH_SIZE]
+        placeholders = Transaction.objects.using(database).bulk_create(
+            Transaction(**{field: getattr(row, field) for field in fields})
+            for row in batch
+        )
+        for row, placeholder in zip(batch, placeholders):
+            row.pk = placeholder.pk
+        # No signals: nobody ever saw these
+        Transaction.objects.using(database).filter(
+            pk__in=[row.pk for row in batch]
+        )._raw_delete(database)
+
+
+def copy_rows(user_id, source, target, ids, since=None):
+    """
+    Copy the user's rows from `source` (only those changed since `since`,
+    if given) to `target`, updating earlier copies. `ids` maps each model to
+    {source id: target id} and is filled in.
+    """
+    now = timezone.now()
+    for model in MODELS:
+        copied = ids.setdefault(model, {})
+        queryset = model.objects.using(source).filter(user_id=user_id).order_by("pk")
+        if since is not None:
+            queryset = queryset.filter(updated_at__gte=since)
+        new, changed = [], []
+        for row in queryset:
+            source_pk = row.pk
+            for field, referenced in REFERENCES.items():
+                if getattr(row, field, None) is not None:
+                    setattr(row, field, ids[referenced].get(getattr(row, field)))
+            row.updated_at = now
+            if source_pk in copied:
+                row.pk = copied[source_pk]
+                changed.append(row)
+            else:
+                row.pk = None
+                new.append((source_pk, row, row.created_at))
+
+        rows = [row for _, row, _ in new]
+        if model is TransactionArchive:
+            # Archived ids must never be taken by the target's transactions
+            allocate_transaction_ids(target, rows)
+        model.objects.using(target).bulk_create(rows, batch_size=BATCH_SIZE)
+        for source_pk, row, created_at in new:
+            copied[source_pk] = row.pk
+            row.created_at = created_at  # bulk_create stamped it with now
+        fields = [
+            field.name for field in model._meta.concrete_fields if not field.primary_key
+        ]
+        model.objects.using(target).bulk_update(
+            rows, ["created_at"], batch_size=BATCH_SIZE
+        )
+        model.objects.using(target).bulk_update(changed, fields, batch_size=BATCH_SIZE)
+
+
+def delete_removed(user_id, source, target, ids):
+    """Delete the copies of rows deleted from `source` since they were copied."""
+    for model in reversed(MODELS):
+        remaining = set(
+            model.objects.using(source)
+            .filter(user_id=user_id)
+            .values_list("pk", flat=True)
+        )
+        removed = [
+            target_pk for pk, target_pk in ids[model].items() if pk not in remaining
+        ]
+        # Through the ORM: the signals leave tombstones for clients that saw the copies
+        with user_shard(user_id, target):
+            model.objects.using(target).filter(pk__in=removed).delete()
+
+
+def move_user(user, target, grace=5.0):
+    """Move `user`'s budgethink data to the `target` shard; returns rows moved per model."""
+    source = user.shard
+    if target not in shard_aliases():
+        raise ValueError(f"Unknown shard: {target}")
+    if target == source:
+        raise ValueError(f"User {user.pk} is already on {target}")
+
+    ids = {}
+    started = timezone.now()
+    with transaction.atomic(using=target):
+        copy_rows(user.pk, source, target, ids)
+
+    get_user_model().objects.filter(pk=user.pk).update(shard=target)
+    user.shard = target
+    invalidate_scope(user_cache_scope(user.pk))  # cached responses and shard lookups
+
+    time.sleep(grace)
+    with transaction.atomic(using=target):
+        copy_rows(user.pk, source, target, ids, since=started)
+        delete_removed(user.pk, source, target, ids)
+        # Deletes clients may not have synced yet, and every old id
+        synced = [model for model in MODELS if model._meta.model_name in SYNCED_MODELS]
+        old_rows = [
+            (tombstone.model, tombstone.object_id)
+            for tombstone in Tombstone.objects.using(source).filter(user_id=user.pk)
+        ] + [(model._meta.model_name, pk) for model in synced for pk in ids[model]]
+        Tombstone.objects.using(target).bulk_create(
+            [
+                Tombstone(user_id=user.pk, model=model, object_id=pk)
+                for model, pk in old_rows
+            ],
+            batch_size=BATCH_SIZE,
+        )
+
+    with transaction.atomic(using=source):
+        for model in [Tombstone, *reversed(MODELS)]:
+            queryset = model.objects.using(source).filter(user_id=user.pk)
+            queryset._raw_delete(source)  # no signals: nothing to tell anyone about
+
+    invalidate_scope(user_cache_scope(user.pk))
+    publish_reset(user.pk)
+    return {model._meta.verbose_name_plural: len(ids[model]) for model in MODELS}
@@ -0,0 +1,117 @@
+"""
+Lazy materialization of RecurringRule occurrences as Transaction rows.
+
+Nothing runs per user on a schedule. Every read of a user's budgethink data
+calls materialize_if_due(), which checks the cached date of the user's next
+due occurrence (an L1 hit almost always) and, once it has passed, creates all
+the user's due transactions in one bulk_create. The
+`budgethink.materialize_recurring` job catches up the users nobody reads,
+finding them through the indexed `next_occurrence` of the rules that are due.
+"""
+
+from datetime import date
+
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from budgethink.live import publish_reset
+from budgethink.models import RecurringRule, Transaction
+from main.cache import get_two_tier_cache, invalidate_scope, user_cache_scope
+from main.routers import primary_reads
+from main.sharding import shard_aliases, shard_for_user
+
+NEXT_DUE_CACHE_DURATION = 60 * 60 * 24  # any write of the user's data resets it anyway
+
+
+def materialize(user_id, today=None):
+    """Create the transactions of the user's rules due by `today`; returns how many."""
+    today = today or date.today()
+    database = shard_for_user(user_id)
+    transactions, claimed = [], 0
+    with transaction.atomic(using=database):
+        rules = RecurringRule.objects.using(database).filter(
+            user_id=user_id, next_occurrence__lte=today
+        )
+        for rule in list(rules):
+            dates, next_occurrence = [], None
+            for day in rule.occurrences_after(rule.materialized_through):
+                if day > today:
+                    next_occurrence = day
+                    break
+                dates.append(day)
+            # Only matches while the rule is as read: a concurrent call that
+            # got there first has moved next_occurrence (or holds the row)
+            updated = (
+                RecurringRule.objects.using(database)
+                .filter(pk=rule.pk, next_occurrence=rule.next_occurrence)
+                .update(
+                    materialized_through=(
+                        dates[-1] if dates else rule.materialized_through
+                    ),
+                    next_occurrence=next_occurrence,
+                    updated_at=timezone.now(),
+                )
+            )
+            if not updated:
+                continue
+            claimed += 1
+            transactions.extend(
+                Transaction(
+                    user_id=user_id,
+                    category_id=rule.category_id,
+                    recurring_rule=rule,
+                    title=rule.title,
+                    description=rule.description,
+                    type=rule.type,
+                    amount=rule.amount,
+                    transaction_date=day,
+                )
+                for day in dates
+            )
+        Transaction.objects.using(database).bulk_create(transactions)
+
+    if claimed:
+        # bulk_create and update() send no signals
+        invalidate_scope(user_cache_scope(user_id))
+        if transactions:
+            publish_reset(user_id)
+    return len(transactions)
+
+
+def due_users(today=None):
+    """Ids of the users with occurrences due by `today`, on every shard."""
+    today = today or date.today()
+    return [
+        user_id
+        for alias in shard_aliases()
+        for user_id in RecurringRule.objects.using(alias)
+        .filter(next_occurrence__lte=today)
+        .order_by("user_id")
+        .values_list("user_id", flat=True)
+        .distinct()
+    ]
+
+
+def next_due(user_id):
+    """The user's earliest next_occurrence, from the primary."""
+    with primary_reads():
+        return RecurringRule.objects.filter(user_id=user_id).aggregate(
+            next_due=Min("next_occurrence")
+        )["next_due"]
+
+
+def materialize_if_due(user_id):
+    """Materialize the user's due occurrences, if any; cheap when there are none."""
+    scope = user_cache_scope(user_id)
+    due = get_two_tier_cache().get_or_compute(
+        f"recurring_{scope}_next_due",
+        scope,
+        lambda: next_due(user_id),
+        NEXT_DUE_CACHE_DURATION,
+    )
+    today = date.today()
+    if due is not None and due <= today:
+        # Called from read paths (use_replica): keep it all on the primary
+        with primary_reads():
+            materialize(user_id, today)
@@ -1,5 +1,7 @@
+from decimal import Decimal
+
 from rest_framework import serializers
-from budgethink.models import Category, Transaction, Budget
+from budgethink.models import Category, Transaction, Budget, RecurringRule, parse_rrule
 
 
 class BaseCategorySerializer(serializers.ModelSerializer):
@@ -13,16 +15,50 @@ class BaseCategorySerializer(serializers.ModelSerializer):
 class BaseTransactionSerializer(serializers.ModelSerializer):
     user_id = serializers.IntegerField()
     category_id = serializers.IntegerField()
+    # A CentsField (possibly integer cents), exposed as a decimal
+    amount = serializers.DecimalField(max_digits=20, decimal_places=2, min_value=Decimal("0.01"))
 
     class Meta:
         model = Transaction
         fields = "__all__"
+        read_only_fields = ["recurring_rule"]
+
+
+class BaseRecurringRuleSerializer(serializers.ModelSerializer):
+    # The requesting user's, set by RecurringRuleView
+    user_id = serializers.IntegerField(read_only=True)
+    category_id = serializers.IntegerField(required=False, allow_null=True)
+    amount = serializers.DecimalField(max_digits=20, decimal_places=2, min_value=Decimal("0.01"))
+
+    class Meta:
+        model = RecurringRule
+        fields = "__all__"
+        read_only_fields = ["materialized_through", "next_occurrence"]
+
+    def validate(self, data):
+        start_date = data.get("start_date", getattr(self.instance, "start_date", None))
+        end_date = data.get("end_date", getattr(self.instance, "end_date", None))
+        try:
+            parse_rrule(data.get("rrule", getattr(self.instance, "rrule", "")), start_date)
+        except ValueError as e:
+            raise serializers.ValidationError({"rrule": str(e)})
+        if end_date and end_date < start_date:
+            raise serializers.ValidationError({"end_date": "end_date must not be before start_date"})
+        category_id = data.get("category_id")
+        request = self.context.get("request")
+        user_id = request.user.pk if request else getattr(self.instance, "user_id", None)
+        if category_id and not Category.objects.filter(pk=category_id, user_id=user_id).exists():
+            raise serializers.ValidationError({"category_id": "Category not found"})
+        return data
 
 
 class BaseBudgetSerializer(serializers.ModelSerializer):
     user_id = serializers.IntegerField()
     category_id = serializers.IntegerField(required=False, allow_null=True)
     type = serializers.SerializerMethodField(read_only=True)
+    amount_limit = serializers.DecimalField(
+        max_digits=20, decimal_places=2, min_value=Decimal("0.01")
+    )
 
     class Meta:
         model = Budget
@@ -2,6 +2,7 @@ from budgethink.serializers.base_serializer import (
     BaseCategorySerializer,
     BaseTransactionSerializer,
     BaseBudgetSerializer,
+    BaseRecurringRuleSerializer,
 )
 from account.serializers import UserBaseSerializer
 from rest_framework import serializers
@@ -22,6 +23,11 @@ class TransactionSerializer(BaseTransactionSerializer):
     formatted_amount = serializers.CharField(read_only=True)
 
 
+class RecurringRuleSerializer(BaseRecurringRuleSerializer):
+    user = UserBaseSerializer(read_only=True)
+    category = BaseCategorySerializer(read_only=True)
+
+
 class BudgetSerializer(BaseBudgetSerializer):
     user = UserBaseSerializer(read_only=True)
     category = BaseCategorySerializer(read_only=True)
@@ -0,0 +1,143 @@
+from types import SimpleNamespace
+
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.db import DEFAULT_DB_ALIAS
+from django.dispatch import receiver
+from django.utils import timezone
+
+from budgethink.live import (
+    DASHBOARD_FIELDS,
+    dashboard_values,
+    publish_reset,
+    publish_transaction_change,
+    stored_dashboard_values,
+)
+from budgethink.models import (
+    Budget,
+    Category,
+    RecurringRule,
+    Tombstone,
+    Transaction,
+    TransactionArchive,
+    TransactionSummary,
+)
+from main.cache import invalidate_scope, user_cache_scope
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Transaction)
+@receiver(post_delete, sender=Budget)
+def record_tombstone(sender, instance, origin=None, **kwargs):
+    """Log every delete (cascades included) for /sync/."""
+    if isinstance(origin, get_user_model()):
+        return  # the whole account is going away, tombstones with it
+    Tombstone.objects.create(
+        user_id=instance.user_id, model=sender._meta.model_name, object_id=instance.pk
+    )
+
+
+@receiver(pre_delete, sender=Category)
+def touch_category_rows(sender, instance, origin=None, **kwargs):
+    """
+    SET_NULL runs a plain UPDATE that leaves updated_at alone; bump it so the
+    rows losing their category show up in /sync/.
+    """
+    if isinstance(origin, get_user_model()):
+        return
+    now = timezone.now()
+    instance.transactions.update(updated_at=now)
+    instance.budgets.update(updated_at=now)
+
+
+def saves_dashboard_fields(update_fields):
+    return update_fields is None or any(
+        Transaction._meta.get_field(name).attname in DASHBOARD_FIELDS
+        for name in update_fields
+    )
+
+
+@receiver(pre_save, sender=Transaction)
+def load_stored_transaction(sender, instance, using, update_fields=None, **kwargs):
+    """Read what the save will overwrite, only when the dashboard needs it."""
+    instance._stored_dashboard_values = None
+    if not instance._state.adding and saves_dashboard_fields(update_fields):
+        instance._stored_dashboard_values = stored_dashboard_values(instance, using)
+
+
+@receiver(post_save, sender=Transaction)
+def publish_transaction_save(sender, instance, created, update_fields=None, **kwargs):
+    new = dashboard_values(instance)
+    stored = getattr(instance, "_stored_dashboard_values", None)
+    if created:
+        publish_transaction_change(instance.user_id, None, new)
+    elif stored is not None:
+        publish_transaction_change(
+            instance.user_id, dashboard_values(SimpleNamespace(**stored)), new
+        )
+    elif saves_dashboard_fields(update_fields):
+        publish_reset(
+            instance.user_id
+        )  # the row wasn't there, or a stream just connected
+
+
+@receiver(post_delete, sender=Transaction)
+def publish_transaction_delete(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, get_user_model()):
+        return
+    publish_transaction_change(instance.user_id, dashboard_values(instance), None)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def publish_category_change(sender, instance, created=False, origin=None, **kwargs):
+    """Renames and deletes move expense totals between categories: reload."""
+    if created or isinstance(origin, get_user_model()):
+        return
+    publish_reset(instance.user_id)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Transaction)
+@receiver(post_delete, sender=Transaction)
+@receiver(post_save, sender=Budget)
+@receiver(post_delete, sender=Budget)
+@receiver(post_save, sender=RecurringRule)
+@receiver(post_delete, sender=RecurringRule)
+def invalidate_user_cache(sender, instance, **kwargs):
+    """
+    Category and budget responses embed transaction totals, so any change
+    makes all of the owner's cached responses stale, whoever made it (admin,
+    shell, another endpoint). Rule changes move the user's next due
+    occurrence (budgethink.recurring).
+    """
+    invalidate_scope(user_cache_scope(instance.user_id))
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_new_user_cache(sender, instance, **kwargs):
+    # Responses embed the user; also, ids can be reused after a delete
+    invalidate_scope(user_cache_scope(instance.pk))
+
+
+@receiver(pre_delete, sender=get_user_model())
+def delete_sharded_rows(sender, instance, **kwargs):
+    """
+    Deleting a user cascades on default only: delete their rows on another
+    shard (main.sharding) too, without signals, as the cascade would.
+    """
+    if instance.shard == DEFAULT_DB_ALIAS:
+        return
+    for model in [
+        Tombstone,
+        TransactionSummary,
+        TransactionArchive,
+        Transaction,
+        Budget,
+        RecurringRule,
+        Category,
+    ]:
+        model.objects.using(instance.shard).filter(user_id=instance.pk)._raw_delete(
+            instance.shard
+        )
@@ -0,0 +1,130 @@
+"""
+Background jobs (jobs.queue) for budgethink operations too slow for a request.
+"""
+
+import csv
+import io
+from datetime import date
+
+from django.core.exceptions import ValidationError
+from django.db import router, transaction
+
+from budgethink.archive import reaches_archive
+from budgethink.live import publish_reset
+from budgethink.models import Category, Transaction, TransactionArchive
+from budgethink.recurring import due_users, materialize
+from jobs.queue import task
+from main.cache import invalidate_scope, user_cache_scope
+
+CHUNK_SIZE = 1000
+EXPORT_FIELDS = [
+    "transaction_date",
+    "title",
+    "description",
+    "type",
+    "amount",
+    "category",
+]
+MAX_IMPORT_ROWS = 10000
+
+
+@task("budgethink.export_transactions")
+def export_transactions(job, start=None, end=None):
+    """
+    CSV of the user's transactions, oldest first, optionally within [start,
+    end]; archived ones included when the range reaches them.
+    """
+    start = date.fromisoformat(start) if start else None
+    end = date.fromisoformat(end) if end else None
+
+    def select(model):
+        queryset = model.objects.filter(user_id=job.user_id)
+        if start:
+            queryset = queryset.filter(transaction_date__gte=start)
+        if end:
+            queryset = queryset.filter(transaction_date__lte=end)
+        return queryset.order_by().values_list(
+            "transaction_date",
+            "title",
+            "description",
+            "type",
+            "amount",
+            "category__name",
+            "pk",
+        )
+
+    rows = select(Transaction)
+    if reaches_archive(job.user_id, start):
+        rows = rows.union(select(TransactionArchive), all=True)
+    rows = rows.order_by("transaction_date", "pk")
+    total = rows.count()
+
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(EXPORT_FIELDS)
+    for done, row in enumerate(rows.iterator(chunk_size=CHUNK_SIZE), 1):
+        writer.writerow(row[:-1])  # without the pk, there for the order
+        if done % CHUNK_SIZE == 0:
+            job.report_progress(done, total, f"{done} of {total} transactions")
+
+    job.set_output(
+        output.getvalue().encode(), f"transactions-{date.today()}.csv", "text/csv"
+    )
+    return {"rows": total}
+
+
+@task("budgethink.import_transactions")
+def import_transactions(job, rows):
+    """
+    Create transactions from `rows` (dicts with the EXPORT_FIELDS; category
+    by name). All or nothing, so a retry never imports a row twice; invalid
+    rows are skipped and reported by index.
+    """
+    categories = dict(
+        Category.objects.filter(user_id=job.user_id).values_list("name", "pk")
+    )
+    transactions, errors = [], {}
+    for index, row in enumerate(rows, 1):
+        instance = Transaction(
+            user_id=job.user_id,
+            category_id=categories.get(row.get("category")),
+            title=row.get("title", ""),
+            description=row.get("description") or None,
+            type=row.get("type") or "expense",
+            amount=row.get("amount"),
+            transaction_date=row.get("transaction_date"),
+        )
+        try:
+            # Not full_clean(): the categories are the user's already
+            instance.clean_fields(exclude=["user", "category"])
+        except ValidationError as e:
+            errors[index - 1] = e.message_dict
+        else:
+            transactions.append(instance)
+        if index % CHUNK_SIZE == 0:
+            job.report_progress(
+                index, len(rows), f"{index} of {len(rows)} rows checked"
+            )
+
+    # Progress inside the transaction wouldn't be visible until it commits
+    with transaction.atomic(using=router.db_for_write(Transaction)):
+        for offset in range(0, len(transactions), CHUNK_SIZE):
+            Transaction.objects.bulk_create(transactions[offset : offset + CHUNK_SIZE])
+
+    # bulk_create sends no signals
+    invalidate_scope(user_cache_scope(job.user_id))
+    publish_reset(job.user_id)
+    return {"imported": len(transactions), "errors": errors}
+
+
+@task("budgethink.materialize_recurring")
+def materialize_recurring(job):
+    """Recurring transactions of every user with some due (those nobody read today)."""
+    today = date.today()
+    user_ids = list(due_users(today))
+    created = 0
+    for done, user_id in enumerate(user_ids, 1):
+        created += materialize(user_id, today)
+        if done % 100 == 0:
+            job.report_progress(done, len(user_ids), f"{done} of {len(user_ids)} users")
+    return {"users": len(user_ids), "transactions": created}
@@ -1,12 +1,45 @@
-from django.test import TestCase, TransactionTestCase
-from django.contrib.auth import get_user_model
+import random
+import tempfile
+from datetime import date, datetime, timedelta
 from decimal import Decimal
-from django.utils import timezone
-from datetime import datetime, date
-from django.db.utils import IntegrityError
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
+from django.core.management import call_command
 from django.core.validators import MinValueValidator
-from .models import Category, Transaction, Budget
+from django.db import connection, connections, transaction as db_transaction
+from django.db.utils import IntegrityError
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from jobs.queue import enqueue
+from main import routers
+from main.cache import TwoTierCache, invalidate_scope, user_cache_scope
+from main.db import sqlite_config
+from .dashboard import dashboard_totals
+from .live import DashboardState, publish_reset
+from .management.commands.create_mock_data import generate_transactions
+from .models import (
+    Budget,
+    Category,
+    RecurringRule,
+    Tombstone,
+    Transaction,
+    TransactionArchive,
+    TransactionSummary,
+)
+from .recurring import materialize
+from .serializers.serializer import CategorySerializer
+from .sync import sync
+from .timeseries import bucket_range, rolling_average
 
 User = get_user_model()
 
@@ -530,3 +563,915 @@ class BudgetModelTest(TransactionTestCase):
         validator = MinValueValidator(Decimal('0.01'))
         with self.assertRaises(ValidationError):
             validator(budget.amount_limit)
+
+
+class CreateMockDataCommandTest(TestCase):
+    def test_generates_for_many_users(self):
+        """Test users, transactions and monthly budgets are generated in batches"""
+        call_command(
+            'create_mock_data', users=3, days=40, tx_per_day=3, seed=7,
+            batch_size=25, stdout=StringIO()
+        )
+        users = User.objects.filter(transactions__isnull=False).distinct()
+        self.assertEqual(users.count(), 3)
+        for user in users:
+            self.assertTrue(Transaction.objects.filter(user=user, type='income').exists())
+            self.assertTrue(Transaction.objects.filter(user=user, type='expense').exists())
+            self.assertEqual(user.categories.count(), 10)
+
+        today = date.today()
+        self.assertTrue(Budget.objects.filter(
+            user_id=1, category=None, month=today.month, year=today.year
+        ).exists())
+        self.assertFalse(Transaction.objects.filter(amount__lt=Decimal('0.01')).exists())
+
+    def test_seed_is_reproducible(self):
+        """Test the same seed yields the same rows"""
+        names = [
+            'Food & Dining', 'Transportation', 'Housing', 'Entertainment', 'Shopping',
+            'Healthcare', 'Education', 'Salary', 'Freelance', 'Investments',
+        ]
+        category_ids = {name: index for index, name in enumerate(names)}
+        start, end = date(2024, 1, 1), date(2024, 3, 31)
+        first = list(generate_transactions(category_ids, start, end, 5, random.Random('1-0')))
+        second = list(generate_transactions(category_ids, start, end, 5, random.Random('1-0')))
+        self.assertEqual(first, second)
+        self.assertTrue(all(start <= row[5] <= end for row in first))
+
+
+class TimeseriesEndpointTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        self.food = Category.objects.create(name="Food", user=self.user)
+        self.salary = Category.objects.create(name="Salary", user=self.user)
+        rows = [
+            (self.salary, "income", "100.00", date(2023, 12, 31)),
+            (self.salary, "income", "1000.00", date(2024, 1, 5)),
+            (self.food, "expense", "200.50", date(2024, 1, 20)),
+            (self.food, "expense", "300.00", date(2024, 3, 2)),
+            (None, "expense", "10.00", date(2024, 3, 3)),
+        ]
+        for category, type, amount, day in rows:
+            Transaction.objects.create(
+                user=self.user, category=category, title="Transaction",
+                type=type, amount=amount, transaction_date=day,
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse("transaction-timeseries")
+
+    def get(self, params):
+        return self.client.get(self.url, params)
+
+    def test_monthly_buckets_fill_gaps(self):
+        response = self.get({"start": "2024-01-01", "end": "2024-03-31", "window": 2})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["buckets"], ["2024-01-01", "2024-02-01", "2024-03-01"])
+        self.assertEqual(data["income"], ["1000.00", "0.00", "0.00"])
+        self.assertEqual(data["expense"], ["200.50", "0.00", "310.00"])
+        self.assertEqual(data["net"], ["799.50", "0.00", "-310.00"])
+        self.assertEqual(data["rolling_net"], ["799.50", "399.75", "-155.00"])
+        # December's income is the opening balance
+        self.assertEqual(data["cumulative_balance"], ["899.50", "899.50", "589.50"])
+        self.assertEqual([s["key"] for s in data["series"]], ["income", "expense"])
+
+    def test_group_by_category(self):
+        data = self.get(
+            {"start": "2024-01-01", "end": "2024-03-31", "group_by": "category"}
+        ).json()
+        series = {entry["name"]: entry["values"] for entry in data["series"]}
+        self.assertEqual(series["Food"], ["-200.50", "0.00", "-300.00"])
+        self.assertEqual(series["Salary"], ["1000.00", "0.00", "0.00"])
+        self.assertEqual(series["Uncategorized"], ["0.00", "0.00", "-10.00"])
+
+    def test_years_do_not_collide(self):
+        data = self.get({"start": "2023-01-01", "end": "2024-12-31", "granularity": "year"}).json()
+        self.assertEqual(data["buckets"], ["2023-01-01", "2024-01-01"])
+        self.assertEqual(data["income"], ["100.00", "1000.00"])
+
+    def test_invalid_params(self):
+        for params in [
+            {"granularity": "hour"},
+            {"group_by": "title"},
+            {"start": "2024-02-01", "end": "2024-01-01"},
+            {"start": "yesterday"},
+            {"start": "2000-01-01", "end": "2024-01-01", "granularity": "day"},
+            {"window": "0"},
+        ]:
+            with self.subTest(params=params):
+                self.assertEqual(self.get(params).status_code, 400)
+
+    def test_week_buckets_start_on_monday(self):
+        buckets = bucket_range(date(2024, 1, 3), date(2024, 1, 17), "week")
+        self.assertEqual(
+            [str(bucket) for bucket in buckets.tolist()],
+            ["2024-01-01", "2024-01-08", "2024-01-15"],
+        )
+
+    def test_rolling_average(self):
+        import numpy as np
+
+        # Cents, rounded half up: 4.5 -> 5, 6.67 -> 7
+        values = np.array([3, 6, 9, 12, 2])
+        self.assertEqual(rolling_average(values, 3).tolist(), [3, 5, 6, 9, 8])
+
+
+@mock.patch("budgethink.sync.OVERLAP", timedelta(0))
+class SyncEndpointTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        self.other = User.objects.create_user(
+            username="other", email="other@example.com", password="testpass123"
+        )
+        self.category = Category.objects.create(name="Food", user=self.user)
+        self.transactions = [
+            Transaction.objects.create(
+                user=self.user, category=self.category, title=f"Transaction {index}",
+                amount="10.00", transaction_date=date(2024, 1, 1),
+            )
+            for index in range(3)
+        ]
+        Category.objects.create(name="Other", user=self.other)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse("sync")
+
+    def get(self, since=None):
+        response = self.client.get(self.url, {"since": since} if since else {})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_full_then_empty_delta(self):
+        data = self.get()
+        self.assertTrue(data["full"])
+        self.assertEqual([c["name"] for c in data["categories"]], ["Food"])
+        self.assertEqual(len(data["transactions"]), 3)
+
+        data = self.get(data["token"])
+        self.assertFalse(data["full"])
+        self.assertEqual(
+            (data["categories"], data["transactions"], data["budgets"]), ([], [], [])
+        )
+
+    def test_changes_and_deletes(self):
+        token = self.get()["token"]
+        changed, deleted, _ = self.transactions
+        changed.title = "Changed"
+        changed.save()
+        deleted_pk = deleted.pk
+        deleted.delete()
+
+        data = self.get(token)
+        self.assertEqual([t["title"] for t in data["transactions"]], ["Changed"])
+        self.assertEqual(data["deleted"]["transactions"], [deleted_pk])
+        self.assertEqual(self.get(data["token"])["deleted"]["transactions"], [])
+
+    def test_category_delete_resends_its_transactions(self):
+        token = self.get()["token"]
+        category_pk = self.category.pk
+        self.category.delete()
+        data = self.get(token)
+        self.assertEqual(data["deleted"]["categories"], [category_pk])
+        self.assertEqual(len(data["transactions"]), 3)
+        self.assertTrue(all(t["category"] is None for t in data["transactions"]))
+
+    def test_pages_with_has_more(self):
+        first = sync(self.user, limit=2)
+        self.assertTrue(first["has_more"])
+        self.assertEqual(len(first["transactions"]), 2)
+        second = sync(self.user, first["token"], limit=2)
+        self.assertFalse(second["has_more"])
+        self.assertEqual(
+            [t["id"] for t in first["transactions"] + second["transactions"]],
+            [t.pk for t in self.transactions],
+        )
+
+    def test_overlap_resends_recent_rows(self):
+        with mock.patch("budgethink.sync.OVERLAP", timedelta(minutes=1)):
+            token = self.get()["token"]
+            self.assertEqual(len(self.get(token)["transactions"]), 3)
+
+    def test_category_totals_in_constant_queries(self):
+        """Test categories carry their counts and totals without queries per category"""
+        for index in range(5):
+            category = Category.objects.create(name=f"Category {index}", user=self.user)
+            Transaction.objects.create(
+                user=self.user, category=category, title="Income", type="income",
+                amount="25.50", transaction_date=date(2024, 1, 1),
+            )
+        TransactionSummary.objects.create(
+            user=self.user, category=self.category, type="expense",
+            month=date(2020, 1, 1), count=2, total="7.25",
+        )
+        with self.assertNumQueries(4):  # one per stream and the tombstones
+            data = sync(self.user)
+
+        fields = [
+            "transactions_count", "income_count", "expense_count",
+            "total_income", "total_expense", "total_balance",
+        ]
+        for row in data["categories"]:
+            expected = CategorySerializer(Category.objects.get(pk=row["id"])).data
+            self.assertEqual([row[field] for field in fields], [expected[field] for field in fields])
+        food = next(row for row in data["categories"] if row["name"] == "Food")
+        self.assertEqual((food["expense_count"], food["total_expense"]), (5, "37.25"))
+
+    def test_account_delete_leaves_no_tombstones(self):
+        self.user.delete()
+        self.assertFalse(Tombstone.objects.exists())
+
+    def test_invalid_token(self):
+        response = self.client.get(self.url, {"since": "not-a-token"})
+        self.assertEqual(response.status_code, 400)
+
+
+class RecordingPubSub:
+    def __init__(self):
+        self.messages = []
+
+    def has_subscribers(self, channel):
+        return True
+
+    def publish(self, channel, message):
+        self.messages.append((channel, message))
+
+
+class LiveDashboardTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        self.food = Category.objects.create(name="Food", user=self.user)
+        self.rent = Category.objects.create(name="Rent", user=self.user)
+        self.today = date.today()
+        Transaction.objects.create(
+            user=self.user, category=self.food, title="Lunch", type="expense",
+            amount="12.50", transaction_date=self.today,
+        )
+        Transaction.objects.create(
+            user=self.user, title="Salary", type="income",
+            amount="1000.00", transaction_date=self.today,
+        )
+        self.pubsub = RecordingPubSub()
+        patcher = mock.patch("budgethink.live.get_pubsub", return_value=self.pubsub)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def totals(self):
+        return dashboard_totals(Transaction.objects.filter(user=self.user))
+
+    def test_publishes_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            Transaction.objects.create(
+                user=self.user, category=self.food, title="Dinner", type="expense",
+                amount="20.00", transaction_date=self.today,
+            )
+            self.assertEqual(self.pubsub.messages, [])
+        for callback in callbacks:
+            callback()
+        channel, message = self.pubsub.messages[0]
+        self.assertEqual(channel, f"dashboard:{self.user.pk}")
+        self.assertEqual(
+            message["changes"],
+            [{"type": "expense", "amount": "20.00", "category": "Food", "date": self.today.isoformat()}],
+        )
+
+    def test_update_publishes_old_and_new(self):
+        lunch = Transaction.objects.get(title="Lunch")
+        lunch.category = self.rent
+        lunch.amount = "15.00"
+        with self.captureOnCommitCallbacks(execute=True):
+            lunch.save()
+            lunch.save()  # nothing changed the second time
+        self.assertEqual(len(self.pubsub.messages), 1)
+        changes = self.pubsub.messages[0][1]["changes"]
+        self.assertEqual(
+            [(c["amount"], c["category"]) for c in changes], [("-12.50", "Food"), ("15.00", "Rent")]
+        )
+
+    def test_unwatched_saves_skip_the_stored_row(self):
+        lunch = Transaction.objects.get(title="Lunch")
+        lunch.amount = "15.00"
+        with mock.patch.object(self.pubsub, "has_subscribers", return_value=False), \
+                CaptureQueriesContext(connection) as queries:
+            lunch.save()
+        self.assertFalse(
+            [q for q in queries.captured_queries if q["sql"].startswith('SELECT "budgethink_transaction"')]
+        )
+        self.assertEqual(self.pubsub.messages, [])
+
+    def test_deltas_match_recomputed_totals(self):
+        state = DashboardState(self.totals(), 4)
+        lunch = Transaction.objects.get(title="Lunch")
+        with self.captureOnCommitCallbacks(execute=True):
+            lunch.category = None
+            lunch.save()
+            Transaction.objects.get(title="Salary").delete()
+            Transaction.objects.create(
+                user=self.user, category=self.rent, title="Rent", type="expense",
+                amount="500.00", transaction_date=self.today,
+            )
+        for _, message in self.pubsub.messages:
+            delta = state.apply(message["changes"])
+
+        totals = self.totals()
+        self.assertEqual(
+            (delta["income"], delta["expense"], delta["balance"]),
+            (totals["income"] or 0, totals["expense"], totals["balance"]),
+        )
+        for entry in totals["categories"]:
+            self.assertEqual(state.categories[entry["category__name"]], entry["total"])
+        [month] = totals["income_vs_expenses"]
+        self.assertEqual(delta["income_vs_expenses"], [month])
+
+    def test_category_rename_resets(self):
+        self.food.name = "Groceries"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.food.save()
+        self.assertEqual(self.pubsub.messages, [(f"dashboard:{self.user.pk}", {"reset": True})])
+
+
+class DashboardStreamTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        self.url = reverse("transaction-dashboard-stream")
+        self.token = str(AccessToken.for_user(self.user))
+
+    def add_transaction(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Transaction.objects.create(
+                user=self.user, title="Lunch", type="expense",
+                amount="12.50", transaction_date=date.today(),
+            )
+
+    async def test_snapshot_then_delta(self):
+        response = await self.async_client.get(self.url, {"access_token": self.token})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        events = aiter(response.streaming_content)
+
+        snapshot = (await anext(events)).decode()
+        self.assertIn("event: snapshot", snapshot)
+        self.assertIn('"expense":0', snapshot)
+
+        await sync_to_async(self.add_transaction)()
+        delta = (await anext(events)).decode()
+        self.assertTrue(delta.startswith("event: delta"))
+        self.assertIn('"expense":12.5', delta)
+        await events.aclose()
+
+    async def test_requires_token(self):
+        response = await self.async_client.get(self.url, {"access_token": "bad"})
+        self.assertEqual(response.status_code, 401)
+
+    def test_wsgi_is_refused(self):
+        response = self.client.get(self.url, {"access_token": self.token})
+        self.assertEqual(response.status_code, 501)
+
+
+class TransactionBulkTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        self.other = User.objects.create_user(
+            username="other", email="other@example.com", password="testpass123"
+        )
+        self.food = Category.objects.create(name="Food", user=self.user)
+        self.rent = Category.objects.create(name="Rent", user=self.user)
+        self.foreign = Category.objects.create(name="Food", user=self.other)
+        Transaction.objects.bulk_create(
+            Transaction(
+                user=self.user, category=self.food, title=f"Transaction {index}",
+                amount="10.00", transaction_date=date(2024, 1, 1 + index % 2),
+            )
+            for index in range(10)
+        )
+        self.other_transaction = Transaction.objects.create(
+            user=self.other, category=self.foreign, title="Not mine",
+            amount="10.00", transaction_date=date(2024, 1, 1),
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse("transaction-bulk")
+
+    def request(self, method, data, params=None):
+        url = self.url + ("?" + "&".join(f"{k}={v}" for k, v in params.items()) if params else "")
+        return getattr(self.client, method)(url, data, format="json")
+
+    def test_recategorize_by_ids(self):
+        pks = list(Transaction.objects.filter(user=self.user).values_list("pk", flat=True)[:4])
+        before = Transaction.objects.get(pk=pks[0]).updated_at
+        response = self.request(
+            "patch", {"ids": pks + [self.other_transaction.pk], "set": {"category": self.rent.pk}}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"updated": 4})
+        self.assertEqual(Transaction.objects.filter(category=self.rent).count(), 4)
+        self.assertGreater(Transaction.objects.get(pk=pks[0]).updated_at, before)
+        self.assertEqual(Transaction.objects.get(pk=self.other_transaction.pk).category, self.foreign)
+
+    def test_retype_by_filters_is_one_update(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.request(
+                "patch", {"set": {"type": "income"}}, {"transaction_date": "2024-01-02"}
+            )
+        self.assertEqual(response.json(), {"updated": 5})
+        updates = [q for q in queries.captured_queries if q["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(Transaction.objects.filter(type="income").count(), 5)
+
+    def test_rejects_invalid_updates(self):
+        for data in (
+            {"ids": [1], "set": {"category": self.foreign.pk}},
+            {"ids": [1], "set": {"type": "refund"}},
+            {"ids": [1], "set": {"amount": "1.00"}},
+            {"ids": [1]},
+            {"set": {"type": "income"}},
+        ):
+            self.assertEqual(self.request("patch", data).status_code, 400, data)
+        self.assertFalse(Transaction.objects.filter(type="income").exists())
+
+    def test_purge_records_tombstones(self):
+        pks = set(
+            Transaction.objects.filter(user=self.user, transaction_date=date(2024, 1, 1))
+            .values_list("pk", flat=True)
+        )
+        with CaptureQueriesContext(connection) as queries:
+            response = self.request("delete", None, {"transaction_date__lte": "2024-01-01"})
+        self.assertEqual(response.json(), {"deleted": 5})
+        deletes = [q for q in queries.captured_queries if q["sql"].startswith("DELETE")]
+        self.assertEqual(len(deletes), 1)
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 5)
+        self.assertTrue(Transaction.objects.filter(pk=self.other_transaction.pk).exists())
+        self.assertEqual(
+            set(Tombstone.objects.filter(model="transaction").values_list("object_id", flat=True)),
+            pks,
+        )
+
+    def test_bulk_changes_reset_live_dashboard(self):
+        pubsub = RecordingPubSub()
+        with (
+            mock.patch("budgethink.live.get_pubsub", return_value=pubsub),
+            self.captureOnCommitCallbacks(execute=True),
+        ):
+            self.request("patch", {"ids": [self.other_transaction.pk], "set": {"type": "income"}})
+            self.request("delete", {"ids": list(Transaction.objects.values_list("pk", flat=True))})
+        self.assertEqual(pubsub.messages, [(f"dashboard:{self.user.pk}", {"reset": True})])
+
+
+class RecurringRuleTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        self.rent = Category.objects.create(name="Rent", user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_rule(self, user=None, **fields):
+        return RecurringRule.objects.create(**{
+            "user": user or self.user, "category": self.rent, "title": "Rent", "amount": "1500.00",
+            "rrule": "FREQ=MONTHLY;BYMONTHDAY=1", "start_date": date(2024, 1, 1), **fields,
+        })
+
+    def request(self, method, url, data=None):
+        return getattr(self.client, method)(url, data, format="json")
+
+    def test_materializes_occurrences_once(self):
+        rule = self.create_rule(end_date=date(2024, 5, 1))
+        self.assertEqual(rule.next_occurrence, date(2024, 1, 1))
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(materialize(self.user.pk, date(2024, 3, 15)), 3)
+        inserts = [q for q in queries.captured_queries if q["sql"].startswith("INSERT")]
+        self.assertEqual(len(inserts), 1)
+        rule.refresh_from_db()
+        self.assertEqual((rule.materialized_through, rule.next_occurrence), (date(2024, 3, 1), date(2024, 4, 1)))
+        self.assertEqual(materialize(self.user.pk, date(2024, 3, 31)), 0)
+
+        self.assertEqual(materialize(self.user.pk, date(2024, 12, 31)), 2)
+        rule.refresh_from_db()
+        self.assertIsNone(rule.next_occurrence)
+        self.assertEqual(
+            list(rule.transactions.order_by("transaction_date").values_list("transaction_date", flat=True)),
+            [date(2024, month, 1) for month in range(1, 6)],
+        )
+
+    def test_reads_materialize_due_occurrences(self):
+        today = date.today()
+        self.create_rule(rrule="FREQ=DAILY", start_date=today - timedelta(days=2))
+        response = self.request("get", reverse("transaction-list"))
+        self.assertEqual(response.data["total_count"], 3)
+        self.assertEqual(response.data["objects"][0]["title"], "Rent")
+
+        self.request("get", reverse("category-list"))  # looks up the next due date again
+        with CaptureQueriesContext(connection) as queries:
+            self.request("get", reverse("budget-list"))
+        self.assertFalse(any("recurringrule" in q["sql"] for q in queries.captured_queries))
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 3)
+
+    def test_batch_job_only_visits_due_rules(self):
+        other = User.objects.create_user(
+            username="other", email="other@example.com", password="testpass123"
+        )
+        self.create_rule()
+        self.create_rule(user=other, category=None, start_date=date.today() + timedelta(days=1))
+        with mock.patch("budgethink.tasks.materialize", wraps=materialize) as materialize_user:
+            call_command("materialize_recurring", stdout=StringIO())
+            call_command("run_workers", concurrency=0, burst=True, stdout=StringIO())
+        self.assertEqual([c.args[0] for c in materialize_user.call_args_list], [self.user.pk])
+        self.assertGreater(Transaction.objects.filter(user=self.user).count(), 0)
+        self.assertFalse(Transaction.objects.filter(user=other).exists())
+
+    def test_api_validates_rrule(self):
+        data = {
+            "user_id": self.user.pk, "category_id": self.rent.pk, "title": "Rent",
+            "amount": "1500.00", "start_date": "2024-01-01",
+        }
+        response = self.request("post", reverse("recurring-rule-list"), {**data, "rrule": "FREQ=SECONDLY"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("rrule", response.data)
+        response = self.request("post", reverse("recurring-rule-list"), {**data, "rrule": "FREQ=MONTHLY"})
+        self.assertEqual((response.status_code, response.data["next_occurrence"]), (201, "2024-01-01"))
+
+
+    def test_rules_belong_to_the_requester(self):
+        other = User.objects.create_user(
+            username="other", email="other@example.com", password="testpass123"
+        )
+        others_category = Category.objects.create(name="Rent", user=other)
+        data = {
+            "user_id": other.pk, "category_id": self.rent.pk, "title": "Rent",
+            "amount": "1500.00", "start_date": "2024-01-01", "rrule": "FREQ=MONTHLY",
+        }
+        response = self.request("post", reverse("recurring-rule-list"), data)
+        self.assertEqual((response.status_code, response.data["user_id"]), (201, self.user.pk))
+        url = reverse("recurring-rule-detail", args=[response.data["id"]])
+        response = self.request("put", url, {**data, "title": "Flat"})
+        self.assertEqual((response.status_code, response.data["user_id"]), (200, self.user.pk))
+        self.assertFalse(RecurringRule.objects.filter(user=other).exists())
+
+        response = self.request(
+            "post", reverse("recurring-rule-list"), {**data, "category_id": others_category.pk}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("category_id", response.data)
+
+    def test_reads_materialize_on_the_primary(self):
+        self.create_rule(rrule="FREQ=DAILY", start_date=date.today())
+
+        def materialize_on_primary(user_id, today):
+            self.assertTrue(routers._primary_reads.get())
+
+        with mock.patch("budgethink.recurring.materialize", side_effect=materialize_on_primary) as patched:
+            self.request("get", reverse("transaction-list"))
+        patched.assert_called_once()
+
+
+class ArchiveTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        self.food = Category.objects.create(name="Food", user=self.user)
+        self.today = date.today()
+        self.old = self.today - timedelta(days=3 * 365)
+        for day, type, amount, title in [
+            (self.old, "expense", "10.00", "Old lunch"),
+            (self.old + timedelta(days=1), "expense", "5.50", "Old coffee"),
+            (self.old, "income", "100.00", "Old salary"),
+            (self.today, "expense", "20.00", "Lunch"),
+        ]:
+            Transaction.objects.create(
+                user=self.user, category=self.food, title=title, type=type,
+                amount=Decimal(amount), transaction_date=day,
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def request(self, method, url, data=None):
+        return getattr(self.client, method)(url, data)
+
+    def archive(self):
+        call_command("archive_transactions", stdout=StringIO())
+
+    def test_category_list_queries(self):
+        self.archive()
+        url = reverse("category-list")
+        Category.objects.create(name="Rent", user=self.user)  # drops the cached list
+        with CaptureQueriesContext(connection) as two_categories:
+            self.request("get", url)
+        for name in ("Travel", "Gifts", "Health"):
+            Category.objects.create(name=name, user=self.user)
+        with self.assertNumQueries(len(two_categories)):
+            response = self.request("get", url)
+        self.assertEqual(response.data["total_count"], 5)
+        food = next(row for row in response.data["objects"] if row["name"] == "Food")
+        self.assertEqual(food["transactions_count"], 4)
+        self.assertEqual((food["total_income"], food["total_expense"]), ("100.00", "35.50"))
+
+    def test_archive_keeps_totals(self):
+        summaries = TransactionSummary.objects.filter(user=self.user)
+        before = dashboard_totals(Transaction.objects.filter(user=self.user), 48, summaries)
+        ids = set(Transaction.objects.values_list("pk", flat=True))
+        self.archive()
+
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(
+            set(TransactionArchive.objects.values_list("pk", flat=True)) | {Transaction.objects.get().pk}, ids
+        )
+        self.assertEqual(summaries.count(), 2)  # one month, both types
+        self.assertEqual(summaries.get(type="expense").count, 2)
+        self.assertEqual(summaries.get(type="expense").total, Decimal("15.50"))
+        self.assertFalse(Tombstone.objects.exists())
+        after = dashboard_totals(Transaction.objects.filter(user=self.user), 48, summaries)
+        self.assertEqual(after, before)
+
+        food = Category.objects.get(pk=self.food.pk)
+        self.assertEqual((food.transactions_count, food.expense_count), (4, 3))
+        self.assertEqual((food.total_income, food.total_expense), (Decimal("100.00"), Decimal("35.50")))
+
+        # Archiving again adds to the summaries
+        Transaction.objects.create(
+            user=self.user, category=self.food, title="Late entry", type="expense",
+            amount=Decimal("1.00"), transaction_date=self.old,
+        )
+        self.archive()
+        self.assertEqual(summaries.get(type="expense").total, Decimal("16.50"))
+
+    def test_reads_reach_archive_only_for_old_ranges(self):
+        self.archive()
+        url = reverse("transaction-list")
+        self.request("get", url)  # caches the last archived date
+
+        recent = {"transaction_date__gte": (self.today - timedelta(days=30)).isoformat()}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.request("get", url, recent)
+        self.assertEqual(response.data["total_count"], 1)
+        self.assertFalse(any("transactionarchive" in q["sql"] for q in queries.captured_queries))
+
+        response = self.request("get", url)
+        self.assertEqual(response.data["total_count"], 4)
+        self.assertEqual(
+            [row["title"] for row in response.data["objects"]],
+            ["Lunch", "Old coffee", "Old salary", "Old lunch"],
+        )
+        response = self.request("get", url, {"search": "coffee", "order_by": "-amount"})
+        self.assertEqual([row["title"] for row in response.data["objects"]], ["Old coffee"])
+
+        archived = TransactionArchive.objects.get(title="Old salary")
+        response = self.request("get", reverse("transaction-detail", args=[archived.pk]))
+        self.assertEqual(response.data["amount"], "100.00")
+        response = self.request("delete", reverse("transaction-detail", args=[archived.pk]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_timeseries_include_archive(self):
+        url = reverse("transaction-timeseries")
+        ranges = [
+            {"granularity": "year", "start": self.old.replace(month=1, day=1).isoformat()},
+            {"granularity": "month", "group_by": "category"},  # starts after the archive
+        ]
+        before = [self.request("get", url, params).data for params in ranges]
+        self.archive()
+        after = [self.request("get", url, params).data for params in ranges]
+        self.assertEqual(after, before)
+        self.assertEqual(before[0]["income"][0], "100.00")
+        self.assertEqual(before[1]["cumulative_balance"][0], "84.50")
+
+    def test_export_includes_archive(self):
+        self.archive()
+        job = enqueue("budgethink.export_transactions", user=self.user)
+        call_command("run_workers", concurrency=0, burst=True, stdout=StringIO())
+        job.refresh_from_db()
+        lines = bytes(job.output).decode().splitlines()
+        self.assertEqual(len(lines), 5)
+        self.assertTrue(lines[1].startswith(self.old.isoformat()))
+        self.assertTrue(lines[-1].startswith(f"{self.today},Lunch"))
+
+
+class AdminChangelistTest(TestCase):
+    changelists = [
+        "admin:budgethink_transaction_changelist",
+        "admin:budgethink_category_changelist",
+        "admin:budgethink_budget_changelist",
+        "admin:account_user_changelist",
+    ]
+
+    def setUp(self):
+        admin = User.objects.create_superuser(
+            username="admin", email="admin@example.com", password="testpass123"
+        )
+        self.client.force_login(admin)
+
+    def populate(self, users, per_user):
+        start = User.objects.count()
+        created = User.objects.bulk_create(
+            User(username=f"user{start + i}", email=f"user{start + i}@example.com")
+            for i in range(users)
+        )
+        categories = Category.objects.bulk_create(
+            Category(user=user, name=f"Category {i}") for user in created for i in range(3)
+        )
+        Budget.objects.bulk_create(
+            Budget(user=category.user, category=category, amount_limit=Decimal("100.00"))
+            for category in categories
+        )
+        Transaction.objects.bulk_create(
+            Transaction(
+                user=category.user, category=category, title="Groceries", type="expense",
+                amount=Decimal("12.34"), transaction_date=date(2024, 1, 1) + timedelta(days=i),
+            )
+            for category in categories
+            for i in range(per_user // 3)
+        )
+
+    def changelist_queries(self):
+        queries = {}
+        for name in self.changelists:
+            with CaptureQueriesContext(connection) as captured:
+                response = self.client.get(reverse(name))
+            self.assertEqual(response.status_code, 200)
+            queries[name] = [query["sql"] for query in captured.captured_queries]
+        return queries
+
+    def test_queries_per_page_are_bounded(self):
+        self.populate(users=5, per_user=30)
+        small = self.changelist_queries()
+        self.populate(users=200, per_user=30)
+        large = self.changelist_queries()
+        for name, queries in large.items():
+            self.assertEqual(len(queries), len(small[name]), name)
+            self.assertLessEqual(len(queries), 6, name)
+            # No sidebar or widget listing a whole table of users or categories
+            for sql in queries:
+                if 'FROM "account_user"' in sql or 'FROM "budgethink_category"' in sql:
+                    self.assertTrue("LIMIT" in sql or "WHERE" in sql, sql)
+
+        user = User.objects.get(username="user3")
+        response = self.client.get(
+            reverse("admin:budgethink_transaction_changelist"), {"user__id__exact": user.pk}
+        )
+        self.assertEqual(response.context["cl"].result_count, 30)
+
+
+@mock.patch("budgethink.sync.OVERLAP", timedelta(0))
+class ShardingTest(TransactionTestCase):
+    """Two SQLite files as shard_1 and shard_2, besides the test database."""
+
+    databases = "__all__"  # resolved once the shards exist, in setUpClass()
+    shards = ["shard_1", "shard_2"]
+
+    @classmethod
+    def setUpClass(cls):
+        cls.shard_dir = tempfile.TemporaryDirectory()
+        for alias in cls.shards:
+            config = sqlite_config(Path(cls.shard_dir.name) / f"{alias}.sqlite3", {})
+            configured = connections.configure_settings({"default": {}, alias: config})
+            connections.settings[alias] = configured[alias]
+            call_command("migrate", database=alias, verbosity=0)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        for alias in cls.shards:
+            connections[alias].close()
+            del connections[alias]
+            del connections.settings[alias]
+        cls.shard_dir.cleanup()
+
+    def setUp(self):
+        self.user = self.create_user("testuser", "shard_1")
+        self.other = self.create_user("other", "shard_2")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_user(self, username, shard):
+        user = User.objects.create_user(
+            username=username, email=f"{username}@example.com", password="testpass123"
+        )
+        User.objects.filter(pk=user.pk).update(shard=shard)
+        user.refresh_from_db()
+        return user
+
+    def request(self, method, url, data=None, user=None):
+        self.client.force_authenticate(user or self.user)
+        return getattr(self.client, method)(url, data, format="json")
+
+    def create_rows(self, user):
+        category = self.request(
+            "post", reverse("category-list"), {"name": "Food", "user_id": user.pk}, user
+        ).data
+        transaction = self.request("post", reverse("transaction-list"), {
+            "title": "Lunch", "amount": "12.50", "transaction_date": "2024-01-05",
+            "type": "expense", "user_id": user.pk, "category_id": category["id"],
+        }, user).data
+        return category, transaction
+
+    def test_atomic_batch_rolls_back_on_the_users_shard(self):
+        category, _ = self.create_rows(self.user)
+        response = self.request("post", reverse("batch"), {
+            "atomic": True,
+            "operations": [
+                {"method": "POST", "path": "budgethink/transactions/", "body": {
+                    "title": "Dinner", "amount": "20.00", "transaction_date": "2024-01-06",
+                    "type": "expense", "user_id": self.user.pk, "category_id": category["id"],
+                }},
+                {"method": "DELETE", "path": "budgethink/budgets/999/"},
+            ],
+        })
+        self.assertTrue(response.data["rolled_back"])
+        self.assertEqual(Transaction.objects.using("shard_1").count(), 1)
+
+    def test_invalidation_waits_for_the_shards_commit(self):
+        pubsub = mock.Mock(**{"has_subscribers.return_value": True})
+        with mock.patch("budgethink.live.get_pubsub", return_value=pubsub), \
+                mock.patch.object(TwoTierCache, "bump") as bump:
+            with db_transaction.atomic(using="shard_1"):
+                invalidate_scope(user_cache_scope(self.user.pk))
+                publish_reset(self.user.pk)
+                self.assertEqual(bump.call_count, 1)
+                pubsub.publish.assert_not_called()
+            # Bumped again and published once the shard's transaction committed
+            self.assertEqual(bump.call_count, 2)
+            pubsub.publish.assert_called_once()
+
+    def test_new_users_are_spread_over_shards(self):
+        shards = {
+            User.objects.create_user(
+                username=f"user{index}", email=f"user{index}@example.com", password="testpass123"
+            ).shard
+            for index in range(20)
+        }
+        self.assertEqual(shards, {"default", "shard_1", "shard_2"})
+
+    def test_requests_use_the_users_shard(self):
+        self.create_rows(self.user)
+        self.create_rows(self.other)
+        for alias, user in (("shard_1", self.user), ("shard_2", self.other)):
+            self.assertEqual(Transaction.objects.using(alias).get().user_id, user.pk)
+            self.assertEqual(Category.objects.using(alias).get().transactions.count(), 1)
+        self.assertFalse(Transaction.objects.using("default").exists())
+
+        response = self.request("get", reverse("transaction-list"))
+        self.assertEqual(response.data["total_count"], 1)
+        self.assertEqual(response.data["objects"][0]["user"]["id"], self.user.pk)
+        self.assertEqual(self.request("get", reverse("category-list")).data["objects"][0]["transactions_count"], 1)
+        self.assertEqual(len(self.request("get", reverse("sync")).data["transactions"]), 1)
+
+    def test_move_user(self):
+        category, transaction = self.create_rows(self.user)
+        token = self.request("get", reverse("sync")).data["token"]
+        created_at = Transaction.objects.using("shard_1").get().created_at
+
+        call_command("move_user_shard", user=str(self.user.pk), to="shard_2", grace=0, stdout=StringIO())
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.shard, "shard_2")
+        self.assertFalse(Transaction.objects.using("shard_1").exists())
+        self.assertFalse(Category.objects.using("shard_1").exists())
+        moved = Transaction.objects.using("shard_2").get(user=self.user)
+        self.assertEqual((moved.title, moved.created_at), ("Lunch", created_at))
+        self.assertEqual(moved.category, Category.objects.using("shard_2").get(user=self.user, name="Food"))
+
+        response = self.request("get", reverse("transaction-list"))
+        self.assertEqual([row["id"] for row in response.data["objects"]], [moved.pk])
+        delta = self.request("get", reverse("sync"), {"since": token}).data
+        self.assertIn(transaction["id"], delta["deleted"]["transactions"])
+        self.assertIn(category["id"], delta["deleted"]["categories"])
+        self.assertEqual([row["id"] for row in delta["transactions"]], [moved.pk])
+
+    def test_move_user_with_archived_rows(self):
+        self.create_rows(self.user)
+        call_command("archive_transactions", stdout=StringIO())
+        self.create_rows(self.other)  # a live transaction on shard_2, with the same id
+
+        call_command("move_user_shard", user=str(self.user.pk), to="shard_2", grace=0, stdout=StringIO())
+        self.user.refresh_from_db()
+        archived = TransactionArchive.objects.using("shard_2").get(user=self.user)
+        self.assertEqual(archived.title, "Lunch")
+        self.assertFalse(Transaction.objects.using("shard_2").filter(pk=archived.pk).exists())
+        self.assertEqual(archived.category.name, "Food")
+        self.assertEqual(TransactionSummary.objects.using("shard_2").get(user=self.user).count, 1)
+
+        # Ids from Transaction's sequence: new transactions don't take it either
+        transaction = self.request("post", reverse("transaction-list"), {
+            "title": "Dinner", "amount": "20.00", "transaction_date": date.today().isoformat(),
+            "type": "expense", "user_id": self.user.pk, "category_id": archived.category_id,
+        }).data
+        self.assertNotEqual(transaction["id"], archived.pk)
+        response = self.request("get", reverse("transaction-detail", args=[archived.pk]))
+        self.assertEqual(response.data["title"], "Lunch")
+
+    def test_deleting_a_user_deletes_their_rows(self):
+        self.create_rows(self.user)
+        self.user.delete()
+        self.assertFalse(Transaction.objects.using("shard_1").exists())
+        self.assertFalse(Category.objects.using("shard_1").exists())
@@ -1,8 +1,11 @@
 from django.urls import path
+from .live import dashboard_stream
 from .views import (
     CategoryView,
     TransactionView,
     BudgetView,
+    RecurringRuleView,
+    SyncView,
 )
 
 urlpatterns = [
@@ -26,6 +29,31 @@ urlpatterns = [
         TransactionView.as_view({"get": "dashboard_endpoint"}),
         name="transaction-dashboard",
     ),
+    path(
+        "transactions/dashboard/stream/",
+        dashboard_stream,
+        name="transaction-dashboard-stream",
+    ),
+    path(
+        "transactions/timeseries/",
+        TransactionView.as_view({"get": "timeseries_endpoint"}),
+        name="transaction-timeseries",
+    ),
+    path(
+        "transactions/export/",
+        TransactionView.as_view({"post": "export_endpoint"}),
+        name="transaction-export",
+    ),
+    path(
+        "transactions/import/",
+        TransactionView.as_view({"post": "import_endpoint"}),
+        name="transaction-import",
+    ),
+    path(
+        "transactions/bulk/",
+        TransactionView.as_view({"patch": "bulk_update", "delete": "bulk_destroy"}),
+        name="transaction-bulk",
+    ),
     path(
         "transactions/<int:pk>/",
         TransactionView.as_view(
@@ -43,4 +71,15 @@ urlpatterns = [
         BudgetView.as_view({"get": "retrieve", "put": "update", "delete": "destroy"}),
         name="budget-detail",
     ),
+    path(
+        "recurring-rules/",
+        RecurringRuleView.as_view({"get": "list", "post": "create"}),
+        name="recurring-rule-list",
+    ),
+    path(
+        "recurring-rules/<int:pk>/",
+        RecurringRuleView.as_view({"get": "retrieve", "put": "update", "delete": "destroy"}),
+        name="recurring-rule-detail",
+    ),
+    path("sync/", SyncView.as_view(), name="sync"),
 ]
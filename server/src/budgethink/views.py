@@ -1,13 +1,38 @@
 from main.utils import GenericView
+from main.instrumentation import time_serialization
 from main.permissions import IsAuthenticated
+from main.routers import use_replica
+from main.sharding import user_shard
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from django.db.models import Sum, Q
+from rest_framework.views import APIView
+from django.db.models import Q
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from datetime import date
 
-from budgethink.models import Category, Transaction, Budget
+from budgethink.models import (
+    Category,
+    Transaction,
+    TransactionArchive,
+    TransactionSummary,
+    Budget,
+    RecurringRule,
+    Tombstone,
+)
+from budgethink.archive import range_start, reaches_archive
+from budgethink.dashboard import dashboard_totals
+from budgethink.live import publish_reset
+from budgethink.recurring import materialize_if_due
+from budgethink.sync import sync, with_totals
+from budgethink.tasks import MAX_IMPORT_ROWS
+from jobs.queue import enqueue
+from jobs.serializers import JobSerializer
 from budgethink.serializers.serializer import (
     CategorySerializer,
     TransactionSerializer,
     BudgetSerializer,
+    RecurringRuleSerializer,
 )
 
 
@@ -15,10 +40,16 @@ class CategoryView(GenericView):
     serializer_class = CategorySerializer
     queryset = Category.objects.all()
     permission_classes = [IsAuthenticated]
+    cache_key_prefix = "categories"
+    filter_fields = {"name": ["exact", "in"]}
+    filter_scope = ["user"]
 
     def initialize_queryset(self, request):
-        self.queryset = self.queryset.filter(user=self.request.user)
-    
+        materialize_if_due(request.user.pk)
+        # Counts and totals in the list's query, not several queries per row;
+        # through the related manager, every row knows its user without one
+        self.queryset = with_totals(request.user.categories.all())
+
     def pre_create(self, request): # only allow 20 categories per user
         if self.queryset.count() >= 20:
             return Response({"error": "You can only have 20 categories"}, status=400)
@@ -28,106 +59,168 @@ class TransactionView(GenericView):
     serializer_class = TransactionSerializer
     queryset = Transaction.objects.all()
     permission_classes = [IsAuthenticated]
+    cache_key_prefix = "transactions"
+    filter_fields = {
+        "type": ["exact", "in"],
+        "category": ["exact", "in", "isnull"],
+        "transaction_date": ["exact", "gt", "gte", "lt", "lte", "range"],
+    }
+    ordering_fields = ["transaction_date", "amount", "title"]
+    filter_scope = ["user"]
+    extra_query_params = ["search"]
+    allowed_methods = GenericView.allowed_methods + ["bulk_update", "bulk_delete"]
+    bulk_update_fields = ["category", "type"]
 
     def filter_queryset(self, filters, excludes):
         search = filters.pop("search", None)
-        if search:
-            self.queryset = self.queryset.filter(
-                Q(title__icontains=search) | Q(description__icontains=search)
-            )
-        return super().filter_queryset(filters, excludes)
+        search_q = Q(title__icontains=search) | Q(description__icontains=search) if search else Q()
+        self.queryset = self.queryset.filter(search_q)
+        queryset = super().filter_queryset(filters, excludes)
+        # Reads reaching back to archived transactions read them too; writes
+        # (bulk updates and deletes) only ever see live ones
+        if self.request.method != "GET" or not reaches_archive(
+            self.request.user.pk, range_start(filters)
+        ):
+            return queryset
+        archived = (
+            TransactionArchive.objects.filter(user=self.request.user)
+            .filter(search_q)
+            .filter(Q(**filters))
+            .exclude(Q(**excludes))
+        )
+        return (
+            queryset.order_by()
+            .union(archived.order_by(), all=True)
+            .order_by(*Transaction._meta.ordering)
+        )
+
+    def get_serialized_object(self, pk):
+        try:
+            return super().get_serialized_object(pk)
+        except Http404:
+            # Archived transactions can be read, but not updated or deleted
+            archived = TransactionArchive.objects.filter(user=self.request.user)
+            with time_serialization():
+                return self.serializer_class(get_object_or_404(archived, pk=pk)).data
 
+    @use_replica
     def dashboard_endpoint(self, request):
         self.initialize_queryset(request)
         months_span = int(request.query_params.get("months_span", 4))
+        # The window ends today: a new day is a new entry
+        cache_key = (
+            f"{self.cache_key_prefix}_{self.get_cache_scope(request)}_dashboard_"
+            f"{months_span}_{date.today()}"
+        )
         try:
-            income = (
-                self.queryset.filter(type="income").aggregate(total=Sum("amount"))[
-                    "total"
-                ]
-                or 0
-            )
-            expense = (
-                self.queryset.filter(type="expense").aggregate(total=Sum("amount"))[
-                    "total"
-                ]
-                or 0
+            return self.get_cached_response(
+                cache_key, request, lambda: self.get_dashboard_data(months_span)
             )
-            balance = income - expense
+        except Exception as e:
+            return Response({"error": str(e)}, status=500)
 
-            categories = (
-                self.queryset.filter(type="expense")
-                .values("category__name")  # Assuming category has a name field
-                .annotate(total=Sum("amount"))
-            )
-            categories = list(categories)
-
-            from django.db.models.functions import TruncMonth
-            from django.db.models import Q
-            from datetime import datetime, timedelta
-
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=months_span * 30)
-
-            monthly_data = (
-                self.queryset.filter(
-                    Q(type="income") | Q(type="expense"),
-                    transaction_date__gte=start_date,
-                    transaction_date__lte=end_date,
-                )
-                .annotate(month=TruncMonth("transaction_date"))
-                .values("month", "type")
-                .annotate(total=Sum("amount"))
-                .order_by("-month")
-            )
+    def get_dashboard_data(self, months_span):
+        summaries = TransactionSummary.objects.filter(user=self.request.user)
+        data = dashboard_totals(self.queryset, months_span, summaries)
 
-            income_vs_expenses = []
-            current_month = None
-            month_data = {}
+        recent_transactions = self.queryset.order_by("-transaction_date")[:10]
+        with time_serialization():
+            serialized_recent_transactions = self.serializer_class(
+                recent_transactions, many=True
+            ).data
 
-            for entry in monthly_data:
-                month = entry["month"].strftime("%B")
-                if month != current_month:
-                    if current_month is not None:
-                        income_vs_expenses.append(month_data)
-                    current_month = month
-                    month_data = {"month": month, "income": 0, "expense": 0}
+        data["recent_transactions"] = serialized_recent_transactions
+        return data
 
-                if entry["type"] == "income":
-                    month_data["income"] = entry["total"]
-                else:
-                    month_data["expense"] = entry["total"]
+    @use_replica
+    def timeseries_endpoint(self, request):
+        # Deferred: numpy is a large share of a worker's cold start
+        from budgethink.timeseries import build_timeseries, parse_timeseries_params
 
-            if current_month is not None:
-                income_vs_expenses.append(month_data)
+        self.initialize_queryset(request)
+        try:
+            start, end, granularity, group_by, window = parse_timeseries_params(
+                request.query_params
+            )
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
+        archived = (
+            TransactionArchive.objects.filter(user=request.user)
+            if reaches_archive(request.user.pk, start)
+            else None
+        )
+        summaries = TransactionSummary.objects.filter(user=request.user)
+        return Response(
+            build_timeseries(
+                self.queryset, start, end, granularity, group_by, window, archived, summaries
+            )
+        )
 
-            recent_transactions = self.queryset.order_by("-transaction_date")[:10]
-            serialized_recent_transactions = self.serializer_class(
-                recent_transactions, many=True
-            ).data
+    def export_endpoint(self, request):
+        """POST /transactions/export/ {"start", "end"}: a job producing a CSV."""
+        payload = {}
+        for param in ("start", "end"):
+            value = request.data.get(param)
+            if value:
+                try:
+                    date.fromisoformat(value)
+                except (TypeError, ValueError):
+                    return Response({"error": f"{param} must be a YYYY-MM-DD date"}, status=400)
+                payload[param] = value
+        job = enqueue("budgethink.export_transactions", payload, user=request.user)
+        return Response(JobSerializer(job).data, status=202)
 
-            data = {
-                "income": income,
-                "expense": expense,
-                "balance": balance,
-                "categories": categories,
-                "income_vs_expenses": income_vs_expenses,
-                "recent_transactions": serialized_recent_transactions,
-            }
-            return Response(data)
-        except Exception as e:
-            return Response({"error": str(e)}, status=500)
+    def import_endpoint(self, request):
+        """POST /transactions/import/ {"rows": [{"title", "amount", ...}]}: an import job."""
+        rows = request.data.get("rows") if isinstance(request.data, dict) else None
+        if (
+            not isinstance(rows, list)
+            or not 0 < len(rows) <= MAX_IMPORT_ROWS
+            or not all(isinstance(row, dict) for row in rows)
+        ):
+            return Response(
+                {"error": f"rows must be a list of 1 to {MAX_IMPORT_ROWS} objects"}, status=400
+            )
+        job = enqueue("budgethink.import_transactions", {"rows": rows}, user=request.user)
+        return Response(JobSerializer(job).data, status=202)
 
     def initialize_queryset(self, request):
+        materialize_if_due(request.user.pk)
         self.queryset = self.queryset.filter(user=self.request.user)
 
+    def validate_bulk_update(self, request, values):
+        category_id = values.get("category_id")
+        if category_id and not Category.objects.filter(pk=category_id, user=request.user).exists():
+            raise ValidationError({"category": ["Category not found"]})
+
+    def perform_bulk_destroy(self, queryset, pks):
+        # What the per-row delete signals would do, in one INSERT
+        Tombstone.objects.bulk_create(
+            Tombstone(user=self.request.user, model="transaction", object_id=pk) for pk in pks
+        )
+        # No foreign keys point at transactions, so one DELETE without signals is safe
+        return Transaction.objects.filter(pk__in=pks)._raw_delete(queryset.db)
+
+    def post_bulk_update(self, request, values, updated):
+        if updated:
+            publish_reset(request.user.pk)  # queryset.update() sends no signals
+
+    def post_bulk_destroy(self, request, pks):
+        if pks:
+            publish_reset(request.user.pk)
+
 
 class BudgetView(GenericView):
     serializer_class = BudgetSerializer
     queryset = Budget.objects.all()
     permission_classes = [IsAuthenticated]
+    cache_key_prefix = "budgets"
+    filter_fields = {"category": ["exact", "in", "isnull"]}
+    filter_scope = ["user"]
+    extra_query_params = ["month", "year"]
 
     def initialize_queryset(self, request):
+        materialize_if_due(request.user.pk)
         self.queryset = self.queryset.filter(user=self.request.user)
 
     def filter_queryset(self, filters, excludes):
@@ -148,4 +241,48 @@ class BudgetView(GenericView):
             except (ValueError, TypeError):
                 pass
         
-        return super().filter_queryset(filters, excludes)
\ No newline at end of file
+        return super().filter_queryset(filters, excludes)
+
+
+class RecurringRuleView(GenericView):
+    """
+    Rules for transactions that repeat. Their occurrences become transactions
+    on the next read of the user's data (budgethink.recurring).
+    """
+
+    serializer_class = RecurringRuleSerializer
+    queryset = RecurringRule.objects.all()
+    permission_classes = [IsAuthenticated]
+    cache_key_prefix = "recurring_rules"
+    filter_fields = {"type": ["exact", "in"], "category": ["exact", "in", "isnull"]}
+    filter_scope = ["user"]
+
+    def initialize_queryset(self, request):
+        self.queryset = self.queryset.filter(user=self.request.user)
+
+    def pre_create(self, request):
+        self.save_kwargs["user_id"] = request.user.pk
+
+    def pre_update(self, request, instance):
+        self.save_kwargs["user_id"] = request.user.pk
+
+
+class SyncView(APIView):
+    """
+    GET /sync/?since=<token>: categories, transactions and budgets changed
+    since the token, ids deleted since it and the token for the next call.
+    Without a token (or with one older than the tombstone retention) it
+    returns everything with `full: true`. Keep calling while `has_more`.
+    Reads always go to the primary: a lagging replica would skip changes.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        with user_shard(request.user.pk, request.user.shard):
+            materialize_if_due(request.user.pk)
+            try:
+                data = sync(request.user, request.query_params.get("since"))
+            except ValueError as e:
+                return Response({"error": str(e)}, status=400)
+        return Response(data)
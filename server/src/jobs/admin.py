@@ -0,0 +1,28 @@
+from django.contrib import admin
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = (
+        "name",
+        "user",
+        "status",
+        "progress",
+        "attempts",
+        "created_at",
+        "finished_at",
+    )
+    list_filter = ("status", "name", "created_at")
+    search_fields = ("name",)
+    list_per_page = 20
+    ordering = ("-created_at",)
+    exclude = ("output",)
+    readonly_fields = (
+        "created_at",
+        "updated_at",
+        "finished_at",
+        "locked_by",
+        "locked_at",
+    )
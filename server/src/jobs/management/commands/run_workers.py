@@ -0,0 +1,89 @@
+import logging
+import multiprocessing
+import os
+import signal
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from jobs.pool import init_pool_process, run_job_in_pool
+from jobs.queue import claim_job, jobs_config, run_job, worker_id
+
+logger = logging.getLogger("jobs")
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs queued jobs (jobs.queue) in a pool of --concurrency processes until "
+        "SIGTERM/SIGINT, which lets running jobs finish"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Pool processes; 0 runs jobs in this process",
+        )
+        parser.add_argument(
+            "--burst", action="store_true", help="Exit once the queue is empty"
+        )
+        parser.add_argument("--poll-interval", type=float, default=None)
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        poll_interval = options["poll_interval"] or jobs_config()["POLL_INTERVAL"]
+        worker = worker_id()
+        concurrency = options["concurrency"]
+        self.stdout.write(f"Worker {worker}: {concurrency or 'no'} pool processes")
+
+        if concurrency == 0:
+            self.run_inline(worker, options["burst"], poll_interval)
+        else:
+            self.run_pool(worker, concurrency, options["burst"], poll_interval)
+
+    def stop(self, signum, frame):
+        self.stdout.write("Stopping: finishing running jobs")
+        self.stopping = True
+
+    def run_inline(self, worker, burst, poll_interval):
+        while not self.stopping:
+            job = claim_job(worker)
+            if job is None:
+                if burst:
+                    return
+                time.sleep(poll_interval)
+                continue
+            run_job(job.pk, worker)
+
+    def run_pool(self, worker, concurrency, burst, poll_interval):
+        # Spawned, not forked: a fork would share this process's connections
+        connections.close_all()
+        context = multiprocessing.get_context("spawn")
+        running = set()
+        with ProcessPoolExecutor(
+            concurrency, mp_context=context, initializer=init_pool_process
+        ) as pool:
+            while True:
+                while not self.stopping and len(running) < concurrency:
+                    job = claim_job(worker)
+                    if job is None:
+                        break
+                    running.add(pool.submit(run_job_in_pool, job.pk, worker))
+                if not running:
+                    if burst or self.stopping:
+                        return
+                    time.sleep(poll_interval)
+                    continue
+                done, running = wait(
+                    running, timeout=poll_interval, return_when=FIRST_COMPLETED
+                )
+                for future in done:
+                    if future.exception() is not None:
+                        logger.error(
+                            "Worker process error", exc_info=future.exception()
+                        )
@@ -0,0 +1,78 @@
+from django.contrib.auth import get_user_model
+from django.db import models
+from django.utils import timezone
+
+User = get_user_model()
+
+
+class Job(models.Model):
+    """
+    A call of a registered task (jobs.queue.task), run by `manage.py run_workers`.
+    """
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (SUCCEEDED, "Succeeded"),
+        (FAILED, "Failed"),
+    ]
+
+    name = models.CharField(max_length=100)  # the registered task
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, null=True, blank=True, related_name="jobs"
+    )
+    payload = models.JSONField(default=dict, blank=True)  # the task's keyword arguments
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_after = models.DateTimeField(
+        default=timezone.now
+    )  # pushed back between retries
+    progress = models.FloatField(default=0.0)  # 0 to 1
+    progress_message = models.CharField(max_length=255, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    # A file the task produced, e.g. an export
+    output = models.BinaryField(null=True, blank=True)
+    output_name = models.CharField(max_length=255, blank=True)
+    output_content_type = models.CharField(max_length=100, blank=True)
+    locked_by = models.CharField(max_length=100, blank=True)  # the worker running it
+    locked_at = models.DateTimeField(null=True, blank=True)  # claim or last heartbeat
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["status", "run_after"]),
+            models.Index(fields=["user", "status"]),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+    def report_progress(self, done, total=None, message=""):
+        """
+        Record progress, `done` out of `total` (or a 0-1 fraction). Also a
+        heartbeat: jobs that stop reporting for JOBS["STALE_AFTER"] seconds
+        are considered lost with their worker and run again.
+        """
+        self.progress = min(1.0, done / total) if total else float(done)
+        self.progress_message = message[:255]
+        self.locked_at = timezone.now()
+        Job.objects.filter(pk=self.pk).update(
+            progress=self.progress,
+            progress_message=self.progress_message,
+            locked_at=self.locked_at,
+            updated_at=self.locked_at,
+        )
+
+    def set_output(self, content, name, content_type):
+        self.output = content
+        self.output_name = name
+        self.output_content_type = content_type
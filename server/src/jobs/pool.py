@@ -0,0 +1,27 @@
+"""
+Entry points of run_workers' pool processes. They are spawned from scratch
+and import this module before Django is set up: no model imports up here.
+"""
+
+import signal
+
+import django
+
+
+def init_pool_process():
+    # Ctrl+C reaches the whole process group; the parent decides when to stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    django.setup()
+
+
+def run_job_in_pool(job_pk, worker):
+    from django.db import close_old_connections
+
+    from jobs.queue import run_job
+
+    # Pool processes are long-lived: treat each job like a request
+    close_old_connections()
+    try:
+        run_job(job_pk, worker)
+    finally:
+        close_old_connections()
@@ -0,0 +1,159 @@
+"""
+Database-backed job queue.
+
+Tasks are functions registered with @task; enqueue() stores a Job, and
+`manage.py run_workers` claims queued jobs and runs them in a process pool.
+A failing job is retried with exponential backoff until max_attempts, and a
+job whose worker died (no heartbeat for STALE_AFTER seconds) is claimed again.
+
+    @task("budgethink.export_transactions")
+    def export_transactions(job, start=None):
+        ...
+        job.report_progress(done, total)
+        return {"rows": done}  # stored as job.result
+
+Claiming uses SELECT ... FOR UPDATE SKIP LOCKED where the database has it
+(Postgres), so workers never wait on each other's rows; on SQLite, which
+serializes writes anyway, a conditional UPDATE claims the row.
+"""
+
+import logging
+import os
+import socket
+import traceback
+from contextlib import nullcontext
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from jobs.models import Job
+from main.sharding import user_shard
+
+logger = logging.getLogger("jobs")
+
+DEFAULT_JOBS = {
+    "POLL_INTERVAL": 1.0,  # seconds between polls of an empty queue
+    "STALE_AFTER": 600,  # seconds without a heartbeat before a running job is reclaimed
+    "RETRY_DELAY": 10,  # seconds before the first retry, doubled for each later one
+}
+
+_tasks = {}
+
+
+def jobs_config():
+    return {**DEFAULT_JOBS, **getattr(settings, "JOBS", {})}
+
+
+def task(name):
+    """Register the decorated function as the task `name`."""
+
+    def register(function):
+        _tasks[name] = function
+        return function
+
+    return register
+
+
+def get_task(name):
+    return _tasks.get(name)
+
+
+def enqueue(name, payload=None, user=None, max_attempts=3):
+    if name not in _tasks:
+        raise ValueError(f"Unknown task: {name}")
+    return Job.objects.create(
+        name=name, payload=payload or {}, user=user, max_attempts=max_attempts
+    )
+
+
+def worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def claim_job(worker):
+    """Mark the next runnable job as running for `worker` and return it, or None."""
+    now = timezone.now()
+    stale = now - timedelta(seconds=jobs_config()["STALE_AFTER"])
+    claimable = Job.objects.filter(
+        Q(status=Job.QUEUED, run_after__lte=now)
+        | Q(status=Job.RUNNING, locked_at__lt=stale)
+    ).order_by("run_after", "pk")
+    claim = {
+        "status": Job.RUNNING,
+        "attempts": F("attempts") + 1,
+        "locked_by": worker,
+        "locked_at": now,
+        "updated_at": now,
+    }
+
+    database = router.db_for_write(Job)
+    if connections[database].features.has_select_for_update_skip_locked:
+        with transaction.atomic(using=database):
+            job = claimable.select_for_update(skip_locked=True).only("pk").first()
+            if job is None:
+                return None
+            Job.objects.filter(pk=job.pk).update(**claim)
+        return Job.objects.get(pk=job.pk)
+
+    # The UPDATE only matches while the row is as it was read: if another
+    # worker claimed it in between, try the next one
+    for pk, status, locked_at in claimable.values_list("pk", "status", "locked_at")[
+        :10
+    ]:
+        if Job.objects.filter(pk=pk, status=status, locked_at=locked_at).update(
+            **claim
+        ):
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def run_job(job_pk, worker):
+    """Run a claimed job and record its outcome."""
+    job = Job.objects.get(pk=job_pk)
+    function = get_task(job.name)
+    if function is None:
+        finish(job, worker, Job.FAILED, error=f"Unknown task: {job.name}")
+        return
+    if (
+        job.attempts > job.max_attempts
+    ):  # reclaimed after its last attempt's worker died
+        finish(job, worker, Job.FAILED, error=job.error or "Worker lost")
+        return
+
+    try:
+        # A user's job reads and writes their data on their shard (main.sharding)
+        with user_shard(job.user_id) if job.user_id else nullcontext():
+            result = function(job, **job.payload)
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning("Job %s (%s) failed, attempt %s", job.pk, job.name, job.attempts)
+        if job.attempts < job.max_attempts:
+            delay = jobs_config()["RETRY_DELAY"] * 2 ** (job.attempts - 1)
+            run_after = timezone.now() + timedelta(seconds=delay)
+            finish(job, worker, Job.QUEUED, error=error, run_after=run_after)
+        else:
+            finish(job, worker, Job.FAILED, error=error)
+    else:
+        finish(
+            job,
+            worker,
+            Job.SUCCEEDED,
+            result=result,
+            progress=1.0,
+            output=job.output,
+            output_name=job.output_name,
+            output_content_type=job.output_content_type,
+        )
+
+
+def finish(job, worker, status, **fields):
+    now = timezone.now()
+    if status != Job.QUEUED:
+        fields["finished_at"] = now
+    # A no-op if the job was reclaimed from this worker in the meantime
+    Job.objects.filter(pk=job.pk, locked_by=worker).update(
+        status=status, locked_by="", locked_at=None, updated_at=now, **fields
+    )
@@ -0,0 +1,29 @@
+from rest_framework import serializers
+
+from jobs.models import Job
+
+
+class JobSerializer(serializers.ModelSerializer):
+    has_output = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Job
+        fields = [
+            "id",
+            "name",
+            "status",
+            "progress",
+            "progress_message",
+            "attempts",
+            "max_attempts",
+            "result",
+            "error",
+            "has_output",
+            "output_name",
+            "created_at",
+            "updated_at",
+            "finished_at",
+        ]
+
+    def get_has_output(self, obj):
+        return bool(obj.output_name)
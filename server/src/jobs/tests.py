@@ -0,0 +1,168 @@
+import csv
+import io
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from account.models import User
+from budgethink.models import Category, Transaction
+from jobs.models import Job
+from jobs.queue import claim_job, enqueue, run_job, task
+
+calls = []
+
+
+@task("tests.flaky")
+def flaky(job, failures=0):
+    calls.append(job.attempts)
+    job.report_progress(1, 2, "halfway")
+    if job.attempts <= failures:
+        raise RuntimeError("boom")
+    return {"attempts": job.attempts}
+
+
+class JobQueueTest(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def run_next(self):
+        job = claim_job("worker-1")
+        run_job(job.pk, "worker-1")
+        job.refresh_from_db()
+        return job
+
+    def test_success(self):
+        enqueue("tests.flaky")
+        job = self.run_next()
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertEqual(job.result, {"attempts": 1})
+        self.assertEqual((job.progress, job.progress_message), (1.0, "halfway"))
+        self.assertIsNotNone(job.finished_at)
+        self.assertIsNone(claim_job("worker-1"))
+
+    @override_settings(JOBS={"RETRY_DELAY": 0})
+    def test_retries_then_fails(self):
+        enqueue("tests.flaky", {"failures": 5}, max_attempts=2)
+        with self.assertLogs("jobs", "WARNING"):
+            job = self.run_next()
+            self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+            self.assertIn("RuntimeError: boom", job.error)
+            job = self.run_next()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+        self.assertEqual(calls, [1, 2])
+
+    def test_retry_waits_for_backoff(self):
+        enqueue("tests.flaky", {"failures": 1})
+        with self.assertLogs("jobs", "WARNING"):
+            self.run_next()
+        self.assertIsNone(claim_job("worker-1"))
+
+    def test_reclaims_jobs_of_lost_workers(self):
+        job = enqueue("tests.flaky")
+        claim_job("worker-1")
+        self.assertIsNone(claim_job("worker-2"))
+        Job.objects.filter(pk=job.pk).update(
+            locked_at=timezone.now() - timedelta(hours=1)
+        )
+        self.assertEqual(claim_job("worker-2").pk, job.pk)
+        # The lost worker's late result is ignored
+        run_job(job.pk, "worker-1")
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.locked_by), (Job.RUNNING, "worker-2"))
+
+    def test_run_workers_burst(self):
+        for _ in range(3):
+            enqueue("tests.flaky")
+        call_command("run_workers", concurrency=0, burst=True, stdout=StringIO())
+        self.assertEqual(Job.objects.filter(status=Job.SUCCEEDED).count(), 3)
+
+
+class TransactionJobsTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        self.category = Category.objects.create(name="Food", user=self.user)
+        Transaction.objects.create(
+            user=self.user,
+            category=self.category,
+            title="Lunch",
+            amount="12.50",
+            transaction_date=date(2024, 1, 5),
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def request(self, method, url, data=None):
+        return getattr(self.client, method)(url, data, format="json")
+
+    def run_workers(self):
+        call_command("run_workers", concurrency=0, burst=True, stdout=StringIO())
+
+    def test_export(self):
+        response = self.request(
+            "post", reverse("transaction-export"), {"start": "2024-01-01"}
+        )
+        self.assertEqual(
+            (response.status_code, response.data["status"]), (202, Job.QUEUED)
+        )
+        self.run_workers()
+
+        job = self.request(
+            "get", reverse("job-detail", kwargs={"pk": response.data["id"]})
+        ).data
+        self.assertEqual(
+            (job["status"], job["result"], job["has_output"]),
+            ("succeeded", {"rows": 1}, True),
+        )
+        download = self.request(
+            "get", reverse("job-download", kwargs={"pk": job["id"]})
+        )
+        rows = list(csv.reader(io.StringIO(download.content.decode())))
+        self.assertEqual(
+            rows[1], ["2024-01-05", "Lunch", "", "expense", "12.50", "Food"]
+        )
+
+    def test_import(self):
+        rows = [
+            {
+                "title": "Salary",
+                "type": "income",
+                "amount": "1000.00",
+                "transaction_date": "2024-02-01",
+                "category": "Food",
+            },
+            {"title": "Broken", "amount": "lots", "transaction_date": "2024-02-02"},
+        ]
+        response = self.request("post", reverse("transaction-import"), {"rows": rows})
+        self.assertEqual(response.status_code, 202)
+        with mock.patch("budgethink.tasks.invalidate_scope") as invalidate:
+            self.run_workers()
+        invalidate.assert_called_once()
+
+        job = Job.objects.get(pk=response.data["id"])
+        self.assertEqual(job.result["imported"], 1)
+        self.assertEqual(list(job.result["errors"]), ["1"])
+        salary = Transaction.objects.get(title="Salary")
+        self.assertEqual((salary.category, salary.type), (self.category, "income"))
+
+    def test_jobs_are_private(self):
+        other = User.objects.create_user(
+            username="other", email="other@example.com", password="testpass123"
+        )
+        job = enqueue("budgethink.export_transactions", user=other)
+        self.assertEqual(
+            self.request("get", reverse("job-list")).data["total_count"], 0
+        )
+        self.assertEqual(
+            self.request(
+                "get", reverse("job-detail", kwargs={"pk": job.pk})
+            ).status_code,
+            404,
+        )
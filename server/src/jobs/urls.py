@@ -0,0 +1,13 @@
+from django.urls import path
+
+from .views import JobView
+
+urlpatterns = [
+    path("", JobView.as_view({"get": "list"}), name="job-list"),
+    path("<int:pk>/", JobView.as_view({"get": "retrieve"}), name="job-detail"),
+    path(
+        "<int:pk>/download/",
+        JobView.as_view({"get": "download_endpoint"}),
+        name="job-download",
+    ),
+]
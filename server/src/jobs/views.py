@@ -0,0 +1,31 @@
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+
+from jobs.models import Job
+from jobs.serializers import JobSerializer
+from main.permissions import IsAuthenticated
+from main.utils import GenericView
+
+
+class JobView(GenericView):
+    serializer_class = JobSerializer
+    # Outputs can be large: only the download endpoint loads them
+    queryset = Job.objects.defer("output", "payload")
+    permission_classes = [IsAuthenticated]
+    allowed_methods = ["list", "retrieve"]
+    filter_fields = {"status": ["exact", "in"]}
+    filter_scope = ["user"]
+
+    def initialize_queryset(self, request):
+        self.queryset = self.queryset.filter(user=self.request.user)
+
+    def download_endpoint(self, request, pk=None):
+        job = get_object_or_404(
+            Job.objects.filter(user=request.user, status=Job.SUCCEEDED).exclude(
+                output_name=""
+            ),
+            pk=pk,
+        )
+        response = HttpResponse(bytes(job.output), content_type=job.output_content_type)
+        response["Content-Disposition"] = f'attachment; filename="{job.output_name}"'
+        return response
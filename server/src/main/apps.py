@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+from django.core import checks
+
+
+class MainConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "main"
+
+    def ready(self):
+        from main import signals  # noqa
+        from main.cache import check_shared_l2
+
+        checks.register(check_shared_l2, checks.Tags.caches, deploy=True)
@@ -3,6 +3,11 @@ ASGI config for main project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Long-lived responses such as the live dashboard stream
+(budgethink.live.dashboard_stream) are only served through this entry point:
+
+    uvicorn main.asgi:application
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -14,3 +19,7 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "main.settings")
 
 application = get_asgi_application()
+
+from main.cache import log_unshared_l2  # noqa: E402 (needs the apps loaded)
+
+log_unshared_l2()
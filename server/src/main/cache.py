@@ -0,0 +1,370 @@
+"""
+Two-tier cache for GenericView: a small per-process L1 (cachetools TTL/LRU)
+in front of the shared Django cache (L2).
+
+Every entry belongs to a scope (GenericView uses one per user) and is stamped
+with the scope's version, kept in L2. Writing to a scope bumps its version,
+which turns every entry stamped with the old one into a miss, in every
+process. Other processes learn about a bump the next time they read the
+version from L2, at most VERSION_CHECK_INTERVAL seconds after they last did;
+the writing process sees it immediately. An interval of 0 reads the version
+on every lookup (one small L2 round trip, bundled with the entry's).
+
+get_or_compute() adds stampede protection on top: single-flight
+recomputation through a lock key in L2, and probabilistic early expiration.
+"""
+
+import logging
+import math
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+
+from cachetools import TTLCache
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connections, transaction
+
+DEFAULT_TWO_TIER_CACHE = {
+    "ALIAS": "default",  # the L2 cache
+    "L1_MAXSIZE": 1024,  # entries per process; 0 disables L1
+    "L1_TTL": 60,  # seconds
+    "VERSION_CHECK_INTERVAL": 1.0,  # seconds a process trusts its copy of a scope version
+    "LOCK_TIMEOUT": 10,  # seconds a recomputation may hold a key's lock
+    "LOCK_WAIT": 2.0,  # seconds to wait for another worker's recomputation
+    "STALE_TTL": 300,  # seconds an expired entry may still be served while it's recomputed
+}
+
+
+class CountingTTLCache(TTLCache):
+    """TTLCache that counts LRU evictions and expirations."""
+
+    def __init__(self, maxsize, ttl):
+        super().__init__(maxsize, ttl)
+        self.evictions = 0
+        self.expirations = 0
+
+    def popitem(self):
+        # Only called to make room: an eviction
+        self.evictions += 1
+        return super().popitem()
+
+    def clear(self):
+        evictions = self.evictions
+        super().clear()  # pops every item
+        self.evictions = evictions
+
+    def expire(self, time=None):
+        expired = super().expire(time)
+        self.expirations += len(expired)
+        return expired
+
+
+class TwoTierCache:
+    lock_poll_interval = (
+        0.02  # seconds between checks while waiting for a recomputation
+    )
+
+    def __init__(
+        self,
+        alias,
+        l1_maxsize,
+        l1_ttl,
+        version_check_interval,
+        lock_timeout=10,
+        lock_wait=2.0,
+        stale_ttl=300,
+    ):
+        self.alias = alias
+        self.version_check_interval = version_check_interval
+        self.lock_timeout = lock_timeout
+        self.lock_wait = lock_wait
+        self.stale_ttl = stale_ttl
+        self.l1 = CountingTTLCache(l1_maxsize, l1_ttl) if l1_maxsize else None
+        # scope -> (version, monotonic time it was read from L2)
+        self.versions = TTLCache(
+            max(l1_maxsize, 128), max(l1_ttl, version_check_interval)
+        )
+        self.lock = threading.Lock()
+        self.counters = dict.fromkeys(
+            [
+                "l1_hits",
+                "l2_hits",
+                "misses",
+                "stale_hits",
+                "waits",
+                "early_refreshes",
+                "computes",
+            ],
+            0,
+        )
+
+    @property
+    def l2(self):
+        return caches[self.alias]
+
+    @staticmethod
+    def version_key(scope):
+        return f"cache_version:{scope}"
+
+    def local_version(self, scope):
+        with self.lock:
+            entry = self.versions.get(scope)
+        if (
+            entry is not None
+            and time.monotonic() - entry[1] < self.version_check_interval
+        ):
+            return entry[0]
+        return None
+
+    def remember_version(self, scope, version):
+        with self.lock:
+            self.versions[scope] = (version, time.monotonic())
+
+    def resolve_version(self, scope, version):
+        if version is None:
+            # Never stamp entries with a missing version: an evicted version
+            # key would otherwise make entries from before a bump valid again
+            version = time.time_ns()
+            if not self.l2.add(self.version_key(scope), version, None):
+                version = self.l2.get(self.version_key(scope), version)
+        self.remember_version(scope, version)
+        return version
+
+    def get_version(self, scope):
+        version = self.local_version(scope)
+        if version is None:
+            version = self.resolve_version(scope, self.l2.get(self.version_key(scope)))
+        return version
+
+    def lookup(self, key, scope, record=True):
+        """
+        (entry, fresh) for `key`: entry is (version, value, expires_at, delta)
+        and is None unless stamped with the scope's current version. A stale
+        entry outlived its timeout but may still be served while another
+        worker recomputes it.
+        """
+        version = self.local_version(scope)
+        if self.l1 is not None and version is not None:
+            with self.lock:
+                entry = self.l1.get(key)
+            if entry is not None and entry[0] == version and entry[2] > time.time():
+                self.record("l1_hits", record)
+                return entry, True
+
+        if version is None:
+            # One round trip for the version and the entry
+            found = self.l2.get_many([self.version_key(scope), key])
+            version = self.resolve_version(scope, found.get(self.version_key(scope)))
+            entry = found.get(key)
+        else:
+            entry = self.l2.get(key)
+        if entry is None or entry[0] != version:
+            self.record("misses", record)
+            return None, False
+        if entry[2] <= time.time():
+            self.record("misses", record)
+            return entry, False
+
+        self.record("l2_hits", record)
+        if self.l1 is not None:
+            with self.lock:
+                self.l1[key] = entry
+        return entry, True
+
+    def record(self, counter, enabled=True):
+        if enabled:
+            with self.lock:
+                self.counters[counter] += 1
+
+    def get(self, key, scope):
+        """The value cached under `key` for the current version of `scope`, or None."""
+        entry, fresh = self.lookup(key, scope)
+        return entry[1] if fresh else None
+
+    def set(self, key, value, scope, timeout, delta=0.0):
+        """Cache `value`, which took `delta` seconds to compute, for `timeout` seconds."""
+        entry = (self.get_version(scope), value, time.time() + timeout, delta)
+        # Kept past its timeout to be served stale during a recomputation
+        self.l2.set(key, entry, timeout + self.stale_ttl)
+        if self.l1 is not None:
+            with self.lock:
+                self.l1[key] = entry
+
+    def get_or_compute(self, key, scope, compute, timeout, beta=1.0):
+        """
+        The cached value of `key`, computing and caching it on a miss, with
+        stampede protection:
+        - single flight: one worker at a time holds the key's lock in L2 and
+          calls `compute`; the others serve the entry they found if it only
+          expired, or wait up to LOCK_WAIT seconds for the new one (after an
+          invalidation, so a user always reads their own writes);
+        - probabilistic early expiration (XFetch): a fresh entry is
+          recomputed early with a probability that rises as it nears expiry
+          and with how long it took to compute, scaled by `beta` (0 disables),
+          so popular keys are refreshed before every reader misses at once.
+        """
+        entry, fresh = self.lookup(key, scope)
+        if fresh and not self.expires_early(entry, beta):
+            return entry[1]
+        if fresh:
+            self.record("early_refreshes")
+
+        lock_key = f"cache_lock:{key}"
+        if self.l2.add(lock_key, True, self.lock_timeout):
+            try:
+                return self.compute_and_set(key, scope, compute, timeout)
+            finally:
+                self.l2.delete(lock_key)
+
+        if entry is not None:
+            self.record("stale_hits")
+            return entry[1]
+        # Invalidated or never cached: wait for the worker holding the lock
+        self.record("waits")
+        deadline = time.monotonic() + self.lock_wait
+        while time.monotonic() < deadline:
+            time.sleep(self.lock_poll_interval)
+            entry, fresh = self.lookup(key, scope, record=False)
+            if fresh:
+                return entry[1]
+        # It's taking too long, or died holding the lock
+        return self.compute_and_set(key, scope, compute, timeout)
+
+    def expires_early(self, entry, beta):
+        if not beta:
+            return False
+        # 1 - random() is in (0, 1]: log() is <= 0
+        return time.time() - entry[3] * beta * math.log(1 - random.random()) >= entry[2]
+
+    def compute_and_set(self, key, scope, compute, timeout):
+        self.record("computes")
+        started = time.monotonic()
+        value = compute()
+        self.set(key, value, scope, timeout, time.monotonic() - started)
+        return value
+
+    def bump(self, scope):
+        """Invalidate every entry of `scope`, in all processes."""
+        version = time.time_ns()
+        self.l2.set(self.version_key(scope), version, None)
+        self.remember_version(scope, version)
+
+    def clear_local(self):
+        with self.lock:
+            if self.l1 is not None:
+                self.l1.clear()
+            self.versions.clear()
+
+    def stats(self):
+        with self.lock:
+            return {
+                **self.counters,
+                "l1_size": len(self.l1) if self.l1 is not None else 0,
+                "l1_evictions": self.l1.evictions if self.l1 is not None else 0,
+                "l1_expirations": self.l1.expirations if self.l1 is not None else 0,
+            }
+
+
+@lru_cache(maxsize=None)
+def get_two_tier_cache():
+    config = {**DEFAULT_TWO_TIER_CACHE, **getattr(settings, "TWO_TIER_CACHE", {})}
+    return TwoTierCache(
+        config["ALIAS"],
+        config["L1_MAXSIZE"],
+        config["L1_TTL"],
+        config["VERSION_CHECK_INTERVAL"],
+        config["LOCK_TIMEOUT"],
+        config["LOCK_WAIT"],
+        config["STALE_TTL"],
+    )
+
+
+def check_shared_l2(app_configs=None, **kwargs):
+    """main.W001: workers outside DEBUG must share L2 to see each other's bumps."""
+    config = {**DEFAULT_TWO_TIER_CACHE, **getattr(settings, "TWO_TIER_CACHE", {})}
+    if settings.DEBUG or not isinstance(caches[config["ALIAS"]], LocMemCache):
+        return []
+    return [
+        checks.Warning(
+            "The two-tier cache's L2 is a per-process memory cache: with several "
+            "workers, writes in one leave stale responses cached in the others.",
+            hint="Set CACHE_URL to a Redis URL, or file:///some/dir on a single host.",
+            id="main.W001",
+        )
+    ]
+
+
+def log_unshared_l2():
+    """Log main.W001 at worker startup: gunicorn and uvicorn run no system checks."""
+    for message in check_shared_l2():
+        logging.getLogger(__name__).warning("%s", message)
+
+
+def user_cache_scope(user_id):
+    return f"user:{user_id}"
+
+
+_pending_invalidations = ContextVar("pending_cache_invalidations", default=None)
+
+
+@contextmanager
+def batched_cache_invalidation():
+    """
+    Defer cache invalidations made inside the block and run each distinct one
+    once when it exits (used by the batch endpoint).
+    """
+    pending = {}
+    token = _pending_invalidations.set(pending)
+    try:
+        yield
+    finally:
+        _pending_invalidations.reset(token)
+        for invalidate in pending.values():
+            invalidate()
+
+
+def flush_cache_invalidations():
+    """
+    Run the invalidations batched_cache_invalidation() deferred so far, now;
+    returns them ({key: function}).
+    """
+    pending = _pending_invalidations.get()
+    if not pending:
+        return {}
+    flushed = dict(pending)
+    pending.clear()
+    for function in flushed.values():
+        function()
+    return flushed
+
+
+def invalidate(key, function):
+    """Call `function` now, or once at the end of batched_cache_invalidation()."""
+    pending = _pending_invalidations.get()
+    if pending is None:
+        function()
+    else:
+        pending[key] = function
+
+
+def invalidate_scope(scope):
+    """Bump `scope`'s version (deferred inside batched_cache_invalidation())."""
+
+    def bump():
+        get_two_tier_cache().bump(scope)
+        # Reads racing an open transaction may cache the old rows under the new
+        # version: bump again once the write is visible. The write may be on
+        # any database (the user's shard, default), so follow each open one.
+        for db in connections.all(initialized_only=True):
+            if db.in_atomic_block:
+                transaction.on_commit(
+                    lambda: get_two_tier_cache().bump(scope), using=db.alias
+                )
+
+    invalidate(("scope", scope), bump)
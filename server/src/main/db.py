@@ -0,0 +1,141 @@
+"""
+Environment-driven database configuration.
+
+`database_config()` builds the `DATABASES` setting from environment
+variables so the same settings module works for local SQLite development
+and a pooled Postgres deployment with an optional read replica.
+
+**Environment variables**
+- DB_ENGINE: `sqlite` (default) or `postgresql`
+- DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT: primary connection
+- DB_CONN_MAX_AGE: persistent connection lifetime in seconds (default: 60)
+- DB_CONN_HEALTH_CHECKS: check persistent connections before reuse (default: True)
+- DB_POOL: use psycopg3's native connection pool on Postgres (default: False)
+- DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_POOL_TIMEOUT: pool sizing
+- DB_REPLICA_NAME, DB_REPLICA_HOST, DB_REPLICA_PORT: read replica; on SQLite
+  DB_REPLICA_NAME is the path of a second database file
+- DB_SHARDS: comma-separated databases for budgethink data besides the
+  primary, as aliases shard_1, shard_2... (see main.sharding): SQLite file
+  paths, or Postgres host[:port] with the primary's name and credentials
+- DB_SQLITE_TUNING: SQLite production profile, WAL and friends (default: False)
+- DB_SQLITE_MMAP_SIZE, DB_SQLITE_CACHE_SIZE, DB_SQLITE_BUSY_TIMEOUT: tuning knobs
+"""
+
+from main.routers import REPLICA_ALIAS
+from main.sharding import SHARD_PREFIX
+
+TRUE_VALUES = ("1", "true", "yes", "on")
+
+
+def env_bool(env, key, default=False):
+    value = env.get(key)
+    if value is None or value == "":
+        return default
+    return value.strip().lower() in TRUE_VALUES
+
+
+def env_int(env, key, default):
+    value = env.get(key)
+    if value is None or value == "":
+        return default
+    return int(value)
+
+
+def sqlite_config(name, env):
+    config = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": name,
+        "CONN_MAX_AGE": env_int(env, "DB_CONN_MAX_AGE", 60),
+        "CONN_HEALTH_CHECKS": env_bool(env, "DB_CONN_HEALTH_CHECKS", True),
+        "OPTIONS": {},
+    }
+    if env_bool(env, "DB_SQLITE_TUNING"):
+        # Take the write lock when the transaction starts instead of failing
+        # with "database is locked" when a reader later upgrades to a writer
+        config["OPTIONS"]["transaction_mode"] = "IMMEDIATE"
+    return config
+
+
+def sqlite_pragmas(env):
+    """
+    Return the PRAGMAs applied to every new SQLite connection (see
+    main.signals). Empty unless DB_SQLITE_TUNING is enabled.
+    """
+    if not env_bool(env, "DB_SQLITE_TUNING"):
+        return {}
+    return {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": env_int(env, "DB_SQLITE_MMAP_SIZE", 256 * 1024 * 1024),
+        # Negative values are KiB rather than pages
+        "cache_size": env_int(env, "DB_SQLITE_CACHE_SIZE", -64 * 1024),
+        "temp_store": "MEMORY",
+        "busy_timeout": env_int(env, "DB_SQLITE_BUSY_TIMEOUT", 5000),
+    }
+
+
+def postgres_config(env, host=None, port=None):
+    config = {
+        "ENGINE": "django.db.backends.postgresql",
+        "NAME": env.get("DB_NAME") or "budgethink",
+        "USER": env.get("DB_USER") or "budgethink",
+        "PASSWORD": env.get("DB_PASSWORD") or "",
+        "HOST": host or env.get("DB_HOST") or "localhost",
+        "PORT": port or env.get("DB_PORT") or "5432",
+        "CONN_MAX_AGE": env_int(env, "DB_CONN_MAX_AGE", 60),
+        "CONN_HEALTH_CHECKS": env_bool(env, "DB_CONN_HEALTH_CHECKS", True),
+        "OPTIONS": {},
+    }
+    if env_bool(env, "DB_POOL"):
+        # The pool owns connection reuse, Django refuses CONN_MAX_AGE with it
+        config["CONN_MAX_AGE"] = 0
+        config["OPTIONS"]["pool"] = {
+            "min_size": env_int(env, "DB_POOL_MIN_SIZE", 2),
+            "max_size": env_int(env, "DB_POOL_MAX_SIZE", 10),
+            "timeout": env_int(env, "DB_POOL_TIMEOUT", 10),
+        }
+    return config
+
+
+def database_config(env, base_dir):
+    """
+    Return the `DATABASES` setting for the given environment mapping.
+
+    A replica alias is only added when DB_REPLICA_NAME (SQLite) or
+    DB_REPLICA_HOST (Postgres) is set. It mirrors `default` under the test
+    runner, so tests see a single database. DB_SHARDS adds shard aliases.
+    """
+    engine = (env.get("DB_ENGINE") or "sqlite").lower()
+
+    if engine in ("postgres", "postgresql"):
+        databases = {"default": postgres_config(env)}
+        if env.get("DB_REPLICA_HOST"):
+            databases[REPLICA_ALIAS] = postgres_config(
+                env, env.get("DB_REPLICA_HOST"), env.get("DB_REPLICA_PORT")
+            )
+    elif engine in ("sqlite", "sqlite3"):
+        databases = {
+            "default": sqlite_config(env.get("DB_NAME") or base_dir / "db.sqlite3", env)
+        }
+        if env.get("DB_REPLICA_NAME"):
+            databases[REPLICA_ALIAS] = sqlite_config(env.get("DB_REPLICA_NAME"), env)
+    else:
+        raise ValueError(f"Unsupported DB_ENGINE: {engine}")
+
+    shards = [
+        shard.strip()
+        for shard in (env.get("DB_SHARDS") or "").split(",")
+        if shard.strip()
+    ]
+    for index, shard in enumerate(shards, 1):
+        if engine.startswith("postgres"):
+            host, _, port = shard.partition(":")
+            databases[f"{SHARD_PREFIX}{index}"] = postgres_config(
+                env, host, port or None
+            )
+        else:
+            databases[f"{SHARD_PREFIX}{index}"] = sqlite_config(shard, env)
+
+    if REPLICA_ALIAS in databases:
+        databases[REPLICA_ALIAS]["TEST"] = {"MIRROR": "default"}
+    return databases
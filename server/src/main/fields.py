@@ -0,0 +1,105 @@
+import decimal
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+from django import forms
+from django.conf import settings
+from django.core import exceptions, validators
+from django.db import models
+from django.utils.functional import cached_property
+
+AMOUNT_STORAGES = ("decimal", "cents")
+
+
+class CentsField(models.BigIntegerField):
+    """
+    Money stored, with settings.AMOUNT_STORAGE = "cents", as an integer number
+    of minor units (cents, centavos), or as a plain decimal(max_digits,
+    decimal_places) column with the default "decimal".
+
+    Python code, serializers and the API see `Decimal` values with
+    `decimal_places` places in both modes; in cents mode only the database
+    sees integers, so SUM and comparisons run on native integers instead of
+    numerics. Aggregates over the field (Sum, Min, Max) come back as Decimal
+    too. `manage.py convert_amount_storage` converts existing columns after
+    the setting changes.
+    """
+
+    description = (
+        "Decimal amount, optionally stored as an integer number of minor units"
+    )
+
+    def __init__(self, *args, max_digits=20, decimal_places=2, storage=None, **kwargs):
+        self.max_digits = max_digits
+        self.decimal_places = decimal_places
+        self.quantum = Decimal(1).scaleb(-decimal_places)
+        # Fixed storage for this instance (convert_amount_storage); model
+        # fields leave it unset, so migrations are the same in both modes
+        self.fixed_storage = storage
+        super().__init__(*args, **kwargs)
+
+    @property
+    def storage(self):
+        return self.fixed_storage or getattr(settings, "AMOUNT_STORAGE", "decimal")
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.max_digits != 20:
+            kwargs["max_digits"] = self.max_digits
+        if self.decimal_places != 2:
+            kwargs["decimal_places"] = self.decimal_places
+        if self.fixed_storage:
+            kwargs["storage"] = self.fixed_storage
+        return name, path, args, kwargs
+
+    def get_internal_type(self):
+        # Picks the column type and the backend's converters
+        return "BigIntegerField" if self.storage == "cents" else "DecimalField"
+
+    @cached_property
+    def context(self):
+        # Read by the SQLite backend's decimal converter
+        return decimal.Context(prec=self.max_digits)
+
+    @property
+    def validators(self):
+        if self.storage == "cents":
+            return super().validators
+        return [
+            *super(models.IntegerField, self).validators,
+            validators.DecimalValidator(self.max_digits, self.decimal_places),
+        ]
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        if self.storage == "cents":
+            return Decimal(value).scaleb(-self.decimal_places)
+        # Decimal sums come back unrounded (as floats on SQLite)
+        return Decimal(value).quantize(self.quantum, rounding=ROUND_HALF_UP)
+
+    def to_python(self, value):
+        if value is None or isinstance(value, Decimal):
+            return value
+        try:
+            return Decimal(str(value))
+        except (InvalidOperation, ValueError):
+            raise exceptions.ValidationError(
+                self.error_messages["invalid"], code="invalid", params={"value": value}
+            )
+
+    def get_prep_value(self, value):
+        if value is None or hasattr(value, "resolve_expression"):
+            return value
+        amount = self.to_python(value).quantize(self.quantum, rounding=ROUND_HALF_UP)
+        if self.storage == "cents":
+            return int(amount.scaleb(self.decimal_places))
+        return amount
+
+    def formfield(self, **kwargs):
+        return super(models.BigIntegerField, self).formfield(
+            **{
+                "form_class": forms.DecimalField,
+                "decimal_places": self.decimal_places,
+                **kwargs,
+            }
+        )
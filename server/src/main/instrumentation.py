@@ -0,0 +1,123 @@
+"""
+Per-request performance metrics.
+
+`RequestMetricsMiddleware` (main.middleware) creates a `RequestMetrics` for
+each request and makes it current for the duration of the request. Code
+that wants to contribute to it (GenericView's cache lookups, serializer
+timing) calls the helpers below, which are no-ops outside a request.
+"""
+
+import heapq
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_current = ContextVar("request_metrics", default=None)
+
+
+class RequestMetrics:
+    __slots__ = (
+        "queries",
+        "query_seconds",
+        "cache_hits",
+        "cache_misses",
+        "serialize_seconds",
+        "render_seconds",
+        "top_sql",
+        "slowest",
+    )
+
+    def __init__(self, top_sql=0):
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.serialize_seconds = 0.0
+        self.render_seconds = 0.0
+        self.top_sql = top_sql
+        self.slowest = []  # min-heap of (seconds, sql), at most top_sql long
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        """`connection.execute_wrapper` hook counting and timing every query."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.queries += 1
+            self.query_seconds += elapsed
+            if self.top_sql:
+                if len(self.slowest) < self.top_sql:
+                    heapq.heappush(self.slowest, (elapsed, sql))
+                elif elapsed > self.slowest[0][0]:
+                    heapq.heapreplace(self.slowest, (elapsed, sql))
+
+    def slowest_queries(self):
+        return [
+            {"ms": round(seconds * 1000, 3), "sql": sql}
+            for seconds, sql in sorted(self.slowest, reverse=True)
+        ]
+
+    def server_timing(self, total_seconds):
+        """Value for the `Server-Timing` response header."""
+        return ", ".join(
+            [
+                f'db;dur={self.query_seconds * 1000:.2f};desc="{self.queries} queries"',
+                f'cache;desc="{self.cache_hits} hits, {self.cache_misses} misses"',
+                f"ser;dur={self.serialize_seconds * 1000:.2f}",
+                f"render;dur={self.render_seconds * 1000:.2f}",
+                f"total;dur={total_seconds * 1000:.2f}",
+            ]
+        )
+
+    def as_dict(self):
+        return {
+            "db_queries": self.queries,
+            "db_ms": round(self.query_seconds * 1000, 3),
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "serialize_ms": round(self.serialize_seconds * 1000, 3),
+            "render_ms": round(self.render_seconds * 1000, 3),
+        }
+
+
+def current_metrics():
+    return _current.get()
+
+
+@contextmanager
+def collect_metrics(metrics):
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+
+
+def record_cache_lookup(hit):
+    metrics = _current.get()
+    if metrics is None:
+        return
+    if hit:
+        metrics.cache_hits += 1
+    else:
+        metrics.cache_misses += 1
+
+
+@contextmanager
+def time_serialization():
+    """
+    Time a serializer block. Queries run lazily inside it (querysets evaluated
+    by `serializer.data`) are already counted as db time and excluded here.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    query_seconds = metrics.query_seconds
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.serialize_seconds += elapsed - (metrics.query_seconds - query_seconds)
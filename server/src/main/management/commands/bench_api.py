@@ -0,0 +1,388 @@
+import json
+import logging
+import math
+import platform
+import time
+from contextlib import ExitStack
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.test.runner import DiscoverRunner
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from budgethink.models import Budget, Category, Transaction
+from main.cache import get_two_tier_cache, user_cache_scope
+
+User = get_user_model()
+
+PASSWORD = "testpass123"  # create_mock_data's password for user id=1
+
+# Seeded data sets: create_mock_data options
+SIZES = {
+    "small": {"users": 1, "days": 30, "tx_per_day": 5},
+    "medium": {"users": 3, "days": 365, "tx_per_day": 7},
+    "large": {"users": 5, "days": 3 * 365, "tx_per_day": 10},
+}
+
+
+class BenchContext:
+    """Benchmark user, auth header and factories for per-iteration fixtures."""
+
+    def __init__(self, user):
+        self.user = user
+        self.counter = 0
+        refresh = RefreshToken.for_user(user)
+        self.headers = {"HTTP_AUTHORIZATION": f"Bearer {refresh.access_token}"}
+        self.category = user.categories.first()
+        self.transaction = user.transactions.first()
+        self.budget = user.budgets.first()
+
+    def next(self):
+        self.counter += 1
+        return self.counter
+
+    def new_category(self):
+        return Category.objects.create(user=self.user, name=f"Bench {self.next()}")
+
+    def new_transaction(self):
+        return Transaction.objects.create(
+            user=self.user,
+            category=self.category,
+            title="Bench transaction",
+            amount="10.00",
+            transaction_date=timezone.now().date(),
+        )
+
+    def new_budget(self):
+        return Budget.objects.create(
+            user=self.user, amount_limit="1000.00", month=1, year=3000 + self.next()
+        )
+
+    def category_body(self):
+        return {
+            "user_id": self.user.pk,
+            "name": f"Bench {self.next()}",
+            "hex_color": "#123456",
+        }
+
+    def transaction_body(self):
+        return {
+            "user_id": self.user.pk,
+            "category_id": self.category.pk,
+            "title": f"Bench {self.next()}",
+            "type": "expense",
+            "amount": "42.50",
+            "transaction_date": str(timezone.now().date()),
+        }
+
+    def budget_body(self):
+        return {
+            "user_id": self.user.pk,
+            "category_id": None,
+            "amount_limit": "5000.00",
+            "month": 1,
+            "year": 3000 + self.next(),
+        }
+
+    def user_body(self):
+        return {
+            "username": self.user.username,
+            "email": self.user.email,
+            "first_name": "Bench",
+            "last_name": "User",
+        }
+
+    def login_body(self):
+        cache.clear()  # the login throttles allow 10 attempts per hour
+        return {"username": self.user.username, "password": PASSWORD}
+
+    def register_body(self):
+        number = self.next()
+        return {
+            "username": f"bench_register_{number}",
+            "email": f"bench_register_{number}@example.com",
+            "password": PASSWORD,
+        }
+
+
+# (method, url name, setup) where setup(ctx) returns (url kwargs, body or query params)
+ENDPOINTS = [
+    # budgethink/urls.py
+    ("get", "category-list", lambda ctx: ({}, {})),
+    ("post", "category-list", lambda ctx: ({}, ctx.category_body())),
+    ("get", "category-detail", lambda ctx: ({"pk": ctx.category.pk}, {})),
+    (
+        "put",
+        "category-detail",
+        lambda ctx: ({"pk": ctx.new_category().pk}, ctx.category_body()),
+    ),
+    ("delete", "category-detail", lambda ctx: ({"pk": ctx.new_category().pk}, {})),
+    ("get", "transaction-list", lambda ctx: ({}, {})),
+    (
+        "get",
+        "transaction-list",
+        lambda ctx: ({}, {"search": "grocery", "type": "expense"}),
+    ),
+    ("post", "transaction-list", lambda ctx: ({}, ctx.transaction_body())),
+    ("get", "transaction-dashboard", lambda ctx: ({}, {"months_span": 6})),
+    (
+        "get",
+        "transaction-timeseries",
+        lambda ctx: ({}, {"granularity": "week", "group_by": "category"}),
+    ),
+    ("get", "transaction-detail", lambda ctx: ({"pk": ctx.transaction.pk}, {})),
+    (
+        "put",
+        "transaction-detail",
+        lambda ctx: ({"pk": ctx.new_transaction().pk}, ctx.transaction_body()),
+    ),
+    (
+        "delete",
+        "transaction-detail",
+        lambda ctx: ({"pk": ctx.new_transaction().pk}, {}),
+    ),
+    ("get", "budget-list", lambda ctx: ({}, {})),
+    ("post", "budget-list", lambda ctx: ({}, ctx.budget_body())),
+    ("get", "budget-detail", lambda ctx: ({"pk": ctx.budget.pk}, {})),
+    (
+        "put",
+        "budget-detail",
+        lambda ctx: ({"pk": ctx.new_budget().pk}, ctx.budget_body()),
+    ),
+    ("delete", "budget-detail", lambda ctx: ({"pk": ctx.new_budget().pk}, {})),
+    ("get", "sync", lambda ctx: ({}, {})),
+    # account/urls.py
+    ("post", "register", lambda ctx: ({}, ctx.register_body())),
+    ("post", "login", lambda ctx: ({}, ctx.login_body())),
+    (
+        "post",
+        "token_refresh",
+        lambda ctx: ({}, {"refresh": str(RefreshToken.for_user(ctx.user))}),
+    ),
+    ("get", "user_profile", lambda ctx: ({}, {})),
+    ("post", "logout", lambda ctx: ({}, {})),
+    ("get", "user-detail", lambda ctx: ({"pk": ctx.user.pk}, {})),
+    ("put", "user-detail", lambda ctx: ({"pk": ctx.user.pk}, ctx.user_body())),
+]
+
+
+class QueryTimer:
+    """`execute_wrapper` that counts queries and their wall time."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def endpoint_label(method, url_name, params, cached=False):
+    label = f"{method.upper()} {url_name}"
+    if method == "get" and params:
+        label += "?" + "&".join(f"{key}={value}" for key, value in params.items())
+    return label + " (cached)" if cached else label
+
+
+def measure(client, ctx, method, url_name, setup, iterations, warmup, cached=False):
+    """
+    Run one endpoint `warmup + iterations` times and summarize the measured
+    runs. Unless `cached`, the user's cached responses are dropped before
+    each run, as a write would, so GETs measure the full request.
+    """
+    latencies, query_counts, query_times, statuses = [], [], [], set()
+    label = None
+    for iteration in range(warmup + iterations):
+        kwargs, data = setup(ctx)
+        url = reverse(url_name, kwargs=kwargs)
+        label = label or endpoint_label(method, url_name, data, cached)
+        if not cached:
+            get_two_tier_cache().bump(user_cache_scope(ctx.user.pk))
+        timer = QueryTimer()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(timer))
+            started = time.perf_counter()
+            if method == "get":
+                response = client.get(url, data, **ctx.headers)
+            else:
+                response = getattr(client, method)(
+                    url,
+                    json.dumps(data),
+                    content_type="application/json",
+                    **ctx.headers,
+                )
+            elapsed = time.perf_counter() - started
+        if iteration < warmup:
+            continue
+        latencies.append(elapsed * 1000)
+        query_counts.append(timer.count)
+        query_times.append(timer.seconds * 1000)
+        statuses.add(response.status_code)
+
+    return label, {
+        "status": sorted(statuses),
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "mean_ms": round(sum(latencies) / len(latencies), 3),
+        "queries": percentile(query_counts, 50),
+        "query_ms": round(percentile(query_times, 50), 3),
+    }
+
+
+def run_suite(size, iterations, warmup, seed=1):
+    """Seed one data set into the current database and benchmark every endpoint."""
+    call_command("flush", interactive=False, verbosity=0)
+    cache.clear()
+    call_command("create_mock_data", seed=seed, stdout=StringIO(), **SIZES[size])
+
+    ctx = BenchContext(User.objects.get(pk=1))
+    client = Client()
+    results = {}
+    for method, url_name, setup in ENDPOINTS:
+        # GETs twice: served from the cache, and computed
+        for cached in [True, False] if method == "get" else [False]:
+            label, summary = measure(
+                client, ctx, method, url_name, setup, iterations, warmup, cached
+            )
+            results[label] = summary
+    return results
+
+
+def compare_to_baseline(results, baseline, threshold, noise_ms):
+    """
+    Return regression messages for endpoints whose p95 latency grew by more than
+    `threshold` (and more than `noise_ms`), or that now run more queries.
+    """
+    regressions = []
+    for size, endpoints in results["results"].items():
+        for label, current in endpoints.items():
+            base = baseline.get("results", {}).get(size, {}).get(label)
+            if base is None:
+                continue
+            limit = base["p95_ms"] * (1 + threshold)
+            if (
+                current["p95_ms"] > limit
+                and current["p95_ms"] - base["p95_ms"] > noise_ms
+            ):
+                regressions.append(
+                    f"[{size}] {label}: p95 {current['p95_ms']:.2f} ms > "
+                    f"{limit:.2f} ms (baseline {base['p95_ms']:.2f} ms)"
+                )
+            if current["queries"] > base["queries"]:
+                regressions.append(
+                    f"[{size}] {label}: {current['queries']} queries > "
+                    f"baseline {base['queries']}"
+                )
+    return regressions
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks every budgethink and account endpoint on seeded data sets, "
+        "writes JSON results and fails on regressions against a baseline"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            default="small,medium",
+            help=f"Comma-separated: {', '.join(SIZES)}",
+        )
+        parser.add_argument("--iterations", type=int, default=30)
+        parser.add_argument("--warmup", type=int, default=3)
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--output", default="bench_api_results.json")
+        parser.add_argument("--baseline", help="Results file to compare against")
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.25,
+            help="Allowed p95 growth, 0.25 = 25%%",
+        )
+        parser.add_argument(
+            "--noise-ms", type=float, default=1.0, help="Ignore p95 growth below this"
+        )
+        parser.add_argument(
+            "--update-baseline", action="store_true", help="Write results to --baseline"
+        )
+
+    def handle(self, *args, **options):
+        sizes = [size.strip() for size in options["sizes"].split(",") if size.strip()]
+        unknown = set(sizes) - set(SIZES)
+        if unknown:
+            raise CommandError(f"Unknown sizes: {', '.join(sorted(unknown))}")
+
+        # Keep per-request and slow-request log lines out of the report
+        logging.getLogger("main.requests").setLevel(logging.ERROR)
+
+        # Never touch the real database: run against throwaway test databases
+        setup_test_environment()
+        runner = DiscoverRunner(verbosity=0, interactive=False)
+        old_config = runner.setup_databases()
+        try:
+            results = {
+                "meta": {
+                    "created_at": timezone.now().isoformat(),
+                    "python": platform.python_version(),
+                    "vendor": connections["default"].vendor,
+                    "iterations": options["iterations"],
+                },
+                "results": {},
+            }
+            for size in sizes:
+                self.stdout.write(f"Benchmarking {size} data set...")
+                results["results"][size] = run_suite(
+                    size, options["iterations"], options["warmup"], options["seed"]
+                )
+                for label, summary in results["results"][size].items():
+                    self.stdout.write(
+                        f"  {label:<48} p50 {summary['p50_ms']:>8.2f} ms  "
+                        f"p95 {summary['p95_ms']:>8.2f} ms  {summary['queries']:>3} queries  "
+                        f"{summary['query_ms']:>7.2f} ms in SQL  {summary['status']}"
+                    )
+        finally:
+            runner.teardown_databases(old_config)
+            teardown_test_environment()
+
+        with open(options["output"], "w") as output:
+            json.dump(results, output, indent=2)
+        self.stdout.write(f"Results written to {options['output']}")
+
+        baseline_path = options["baseline"]
+        if baseline_path and options["update_baseline"]:
+            with open(baseline_path, "w") as output:
+                json.dump(results, output, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Baseline updated: {baseline_path}"))
+        elif baseline_path:
+            with open(baseline_path) as baseline_file:
+                baseline = json.load(baseline_file)
+            regressions = compare_to_baseline(
+                results, baseline, options["threshold"], options["noise_ms"]
+            )
+            if regressions:
+                raise CommandError(
+                    "Performance regressions:\n" + "\n".join(regressions)
+                )
+            self.stdout.write(self.style.SUCCESS("No regressions against baseline"))
@@ -0,0 +1,206 @@
+import logging
+import time
+from contextlib import ExitStack
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.runner import DiscoverRunner
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from budgethink.views import BudgetView, CategoryView, TransactionView
+from main.cache import DEFAULT_TWO_TIER_CACHE, TwoTierCache
+from main.management.commands.bench_api import ENDPOINTS, SIZES, BenchContext, measure
+
+User = get_user_model()
+
+CACHED_VIEWS = [CategoryView, TransactionView, BudgetView]
+CACHED_ENDPOINTS = [
+    endpoint
+    for endpoint in ENDPOINTS
+    if endpoint[0] == "get"
+    and endpoint[1].split("-")[0] in ("category", "transaction", "budget")
+    and endpoint[1].endswith(("-list", "-detail"))
+]
+
+
+class RemoteCache:
+    """A Django cache whose every call first waits one simulated network round trip."""
+
+    def __init__(self, cache, latency):
+        self.cache = cache
+        self.latency = latency
+        self.round_trips = 0
+
+    def __getattr__(self, name):
+        method = getattr(self.cache, name)
+
+        def call(*args, **kwargs):
+            self.round_trips += 1
+            time.sleep(self.latency)
+            return method(*args, **kwargs)
+
+        return call
+
+
+class BenchTwoTierCache(TwoTierCache):
+    def __init__(self, l2, **kwargs):
+        super().__init__(alias=None, **kwargs)
+        self.remote = l2
+
+    @property
+    def l2(self):
+        return self.remote
+
+
+def run_config(ctx, two_tier, iterations, warmup, rendered=False):
+    """
+    p50 ms of every cached endpoint with `two_tier` as the cache (None: no
+    caching), caching serializer data or, with `rendered`, response bytes.
+    """
+    client = Client()
+    with ExitStack() as stack:
+        for view in CACHED_VIEWS:
+            stack.enter_context(mock.patch.object(view, "cache_rendered", rendered))
+        if two_tier is None:
+            for view in CACHED_VIEWS:
+                stack.enter_context(mock.patch.object(view, "cache_key_prefix", None))
+        else:
+            stack.enter_context(
+                mock.patch(
+                    "main.utils.generic_api.get_two_tier_cache", return_value=two_tier
+                )
+            )
+        return {
+            label: summary["p50_ms"]
+            for label, summary in (
+                measure(client, ctx, method, url_name, setup, iterations, warmup)
+                for method, url_name, setup in CACHED_ENDPOINTS
+            )
+        }
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks cached GET endpoints on seeded data without caching, with the "
+        "shared cache only (L2) and with the per-process L1 in front of it, over a "
+        "simulated L2 round trip, then cache hits with serializer data vs rendered "
+        "response bytes cached"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--size", default="medium", help=f"One of: {', '.join(SIZES)}"
+        )
+        parser.add_argument("--iterations", type=int, default=200)
+        parser.add_argument("--warmup", type=int, default=5)
+        parser.add_argument(
+            "--l2-latency-ms",
+            type=float,
+            default=0.5,
+            help="Simulated round trip to the shared cache (e.g. Redis on another host)",
+        )
+        parser.add_argument(
+            "--accept-encoding",
+            default="br, gzip",
+            help="Accept-Encoding of the benchmark requests ('' for none)",
+        )
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        if options["size"] not in SIZES:
+            raise CommandError(f"Unknown size: {options['size']}")
+        logging.getLogger("main.requests").setLevel(logging.WARNING)
+        latency = options["l2_latency_ms"] / 1000
+        settings = {
+            "l1_ttl": DEFAULT_TWO_TIER_CACHE["L1_TTL"],
+            "version_check_interval": DEFAULT_TWO_TIER_CACHE["VERSION_CHECK_INTERVAL"],
+        }
+
+        # Never touch the real database: seed a throwaway test database
+        setup_test_environment()
+        runner = DiscoverRunner(verbosity=0, interactive=False)
+        old_config = runner.setup_databases()
+        try:
+            call_command(
+                "create_mock_data",
+                seed=options["seed"],
+                stdout=StringIO(),
+                **SIZES[options["size"]],
+            )
+            ctx = BenchContext(User.objects.get(pk=1))
+            if options["accept_encoding"]:
+                ctx.headers["HTTP_ACCEPT_ENCODING"] = options["accept_encoding"]
+            caches["default"].clear()
+            l2_only = BenchTwoTierCache(
+                RemoteCache(caches["default"], latency), l1_maxsize=0, **settings
+            )
+            two_tier, two_tier_rendered = (
+                BenchTwoTierCache(
+                    RemoteCache(caches["default"], latency),
+                    l1_maxsize=DEFAULT_TWO_TIER_CACHE["L1_MAXSIZE"],
+                    **settings,
+                )
+                for _ in range(2)
+            )
+            args = (options["iterations"], options["warmup"])
+            results = {
+                "uncached": run_config(ctx, None, *args),
+                "L2": run_config(ctx, l2_only, *args),
+                "L1+L2": run_config(ctx, two_tier, *args),
+                "rendered": run_config(ctx, two_tier_rendered, *args, rendered=True),
+            }
+        finally:
+            runner.teardown_databases(old_config)
+            teardown_test_environment()
+
+        self.stdout.write(
+            f"p50 ms per request, L2 round trip {options['l2_latency_ms']} ms "
+            f"({options['iterations']} iterations, {options['size']} data set)"
+        )
+        self.stdout.write(
+            f"  {'endpoint':<56} {'uncached':>9} {'L2':>8} {'L1+L2':>8} {'saved':>9}"
+        )
+        saved_total = 0.0
+        for label in results["uncached"]:
+            uncached, l2, l1 = (
+                results[name][label] for name in ("uncached", "L2", "L1+L2")
+            )
+            saved_total += l2 - l1
+            self.stdout.write(
+                f"  {label:<56} {uncached:>9.3f} {l2:>8.3f} {l1:>8.3f} {(l2 - l1) * 1000:>7.0f}us"
+            )
+        self.stdout.write(
+            f"L1 saves {saved_total / len(results['uncached']) * 1000:.0f} us per cached request "
+            "over L2 alone"
+        )
+        self.stdout.write(
+            f"Cache hits (L1+L2), serializer data vs rendered bytes, "
+            f"Accept-Encoding: {options['accept_encoding'] or 'none'}"
+        )
+        self.stdout.write(
+            f"  {'endpoint':<56} {'data':>8} {'rendered':>9} {'saved':>9}"
+        )
+        saved_total = 0.0
+        for label in results["uncached"]:
+            data, rendered = results["L1+L2"][label], results["rendered"][label]
+            saved_total += data - rendered
+            self.stdout.write(
+                f"  {label:<56} {data:>8.3f} {rendered:>9.3f} {(data - rendered) * 1000:>7.0f}us"
+            )
+        self.stdout.write(
+            f"Rendered bytes save {saved_total / len(results['uncached']) * 1000:.0f} us per "
+            "cache hit over serializer data"
+        )
+        for name, cache in (
+            ("L2", l2_only),
+            ("L1+L2", two_tier),
+            ("rendered", two_tier_rendered),
+        ):
+            self.stdout.write(
+                f"{name}: {cache.stats()}, {cache.remote.round_trips} L2 round trips"
+            )
@@ -0,0 +1,127 @@
+import logging
+import statistics
+import time
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.runner import DiscoverRunner
+from django.test.utils import (
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+from django.urls import reverse
+
+from main.management.commands.bench_api import (
+    ENDPOINTS,
+    SIZES,
+    BenchContext,
+    endpoint_label,
+)
+from main.middleware import DEFAULT_COMPRESSION, brotli, compress_bytes
+
+User = get_user_model()
+
+# (encoding, setting, levels) compared for every payload
+LEVELS = [
+    ("gzip", "GZIP_LEVEL", [1, 6, 9]),
+    ("br", "BROTLI_QUALITY", [1, 4, 5, 8, 11]),
+]
+
+
+def collect_payloads(ctx):
+    """Uncompressed body of every GET endpoint, by label."""
+    client = Client()
+    payloads = {}
+    # Bodies as the API sends them without compression
+    with override_settings(COMPRESSION={"ENABLED": False}):
+        for method, url_name, setup in ENDPOINTS:
+            if method != "get":
+                continue
+            kwargs, params = setup(ctx)
+            response = client.get(
+                reverse(url_name, kwargs=kwargs), params, **ctx.headers
+            )
+            payloads[endpoint_label(method, url_name, params)] = response.content
+    return payloads
+
+
+def cpu_per_call(function, repeat):
+    """Median CPU seconds of `repeat` calls, and the last result."""
+    timings = []
+    for _ in range(repeat):
+        started = time.process_time()
+        result = function()
+        timings.append(time.process_time() - started)
+    return statistics.median(timings), result
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks response bytes and compression CPU per response for every GET "
+        "endpoint on seeded data, for gzip and Brotli at several levels"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--size", default="medium", help=f"One of: {', '.join(SIZES)}"
+        )
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        if options["size"] not in SIZES:
+            raise CommandError(f"Unknown size: {options['size']}")
+        logging.getLogger("main.requests").setLevel(logging.WARNING)
+        levels = [entry for entry in LEVELS if entry[0] != "br" or brotli is not None]
+
+        # Never touch the real database: seed a throwaway test database
+        setup_test_environment()
+        runner = DiscoverRunner(verbosity=0, interactive=False)
+        old_config = runner.setup_databases()
+        try:
+            call_command(
+                "create_mock_data",
+                seed=options["seed"],
+                stdout=StringIO(),
+                **SIZES[options["size"]],
+            )
+            payloads = collect_payloads(BenchContext(User.objects.get(pk=1)))
+        finally:
+            runner.teardown_databases(old_config)
+            teardown_test_environment()
+
+        totals = {}
+        for label, body in payloads.items():
+            self.stdout.write(f"{label} ({len(body):,} bytes)")
+            for encoding, setting, values in levels:
+                for level in values:
+                    config = {**DEFAULT_COMPRESSION, setting: level}
+                    seconds, compressed = cpu_per_call(
+                        lambda: compress_bytes(encoding, body, config),
+                        options["repeat"],
+                    )
+                    name = f"{encoding}-{level}"
+                    total = totals.setdefault(name, [0, 0, 0.0])
+                    total[0] += len(body)
+                    total[1] += len(compressed)
+                    total[2] += seconds
+                    self.stdout.write(
+                        f"  {name:<6} {len(compressed):>9,} bytes {len(compressed) / len(body):>6.1%}"
+                        f"  {seconds * 1e6:>9.0f} us CPU"
+                    )
+
+        self.stdout.write(f"All {len(payloads)} responses:")
+        for name, (raw, compressed, seconds) in totals.items():
+            default = (
+                name == f"gzip-{DEFAULT_COMPRESSION['GZIP_LEVEL']}"
+                or name == f"br-{DEFAULT_COMPRESSION['BROTLI_QUALITY']}"
+            )
+            self.stdout.write(
+                f"  {name:<6} {compressed:>9,} / {raw:,} bytes {compressed / raw:>6.1%}"
+                f"  {seconds / len(payloads) * 1e6:>7.0f} us CPU per response"
+                + ("  (default)" if default else "")
+            )
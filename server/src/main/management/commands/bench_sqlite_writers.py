@@ -0,0 +1,100 @@
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test.utils import override_settings
+
+from main.db import sqlite_config, sqlite_pragmas
+
+BENCH_TABLE = "bench_writes"
+
+
+def _writer(args):
+    """Run `writes` read-then-write transactions against the benchmark file."""
+    settings_dict, pragmas, worker_id, writes = args
+    alias = f"bench_writer_{worker_id}"
+    latencies = []
+    errors = 0
+    with override_settings(SQLITE_PRAGMAS=pragmas):
+        connections[alias] = DatabaseWrapper(settings_dict, alias)
+        try:
+            for i in range(writes):
+                started = time.perf_counter()
+                try:
+                    with transaction.atomic(using=alias):
+                        with connections[alias].cursor() as cursor:
+                            # Same shape as GenericView.create: read, then write
+                            cursor.execute(
+                                f"SELECT COUNT(*) FROM {BENCH_TABLE} WHERE user_id = %s",
+                                [worker_id],
+                            )
+                            cursor.execute(
+                                f"INSERT INTO {BENCH_TABLE} (user_id, amount) VALUES (%s, %s)",
+                                [worker_id, i],
+                            )
+                except OperationalError:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - started)
+        finally:
+            connections[alias].close()
+    return latencies, errors
+
+
+class Command(BaseCommand):
+    help = "Benchmarks concurrent SQLite writers with and without the tuned profile"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--writers", type=int, default=8)
+        parser.add_argument("--writes", type=int, default=500, help="Writes per writer")
+
+    def run_mode(self, name, env, writers, writes):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "bench.sqlite3")
+            settings_dict = dict(connections["default"].settings_dict)
+            settings_dict.update(sqlite_config(path, env))
+            settings_dict["CONN_MAX_AGE"] = 0
+            pragmas = sqlite_pragmas(env)
+
+            setup = DatabaseWrapper(settings_dict, "bench_setup")
+            with override_settings(SQLITE_PRAGMAS=pragmas), setup.cursor() as cursor:
+                cursor.execute(
+                    f"CREATE TABLE {BENCH_TABLE} "
+                    "(id INTEGER PRIMARY KEY, user_id INTEGER, amount INTEGER)"
+                )
+                cursor.execute(f"CREATE INDEX bench_user ON {BENCH_TABLE} (user_id)")
+            setup.close()
+
+            # Children must not inherit open connections from this process
+            connections.close_all()
+            context = multiprocessing.get_context("fork")
+            started = time.perf_counter()
+            with context.Pool(writers) as pool:
+                results = pool.map(
+                    _writer,
+                    [
+                        (settings_dict, pragmas, worker_id, writes)
+                        for worker_id in range(writers)
+                    ],
+                )
+            elapsed = time.perf_counter() - started
+
+        latencies = [latency for worker, _ in results for latency in worker]
+        errors = sum(worker_errors for _, worker_errors in results)
+        p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else 0
+        self.stdout.write(
+            f"{name:<8} {len(latencies) / elapsed:>10.0f} tx/s "
+            f"{errors:>6} locked  p50 {statistics.median(latencies or [0]) * 1000:>7.2f} ms  "
+            f"p95 {p95 * 1000:>7.2f} ms"
+        )
+
+    def handle(self, *args, **options):
+        writers, writes = options["writers"], options["writes"]
+        self.stdout.write(f"{writers} writers x {writes} read-then-write transactions")
+        self.run_mode("default", {}, writers, writes)
+        self.run_mode("tuned", {"DB_SQLITE_TUNING": "True"}, writers, writes)
@@ -0,0 +1,91 @@
+import copy
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections, models, router
+from django.db.models import F, Value
+from django.db.models.functions import Cast, Round
+
+from main.fields import AMOUNT_STORAGES, CentsField
+
+
+def amount_fields():
+    """(model, field) for every CentsField of an installed model."""
+    return [
+        (model, field)
+        for model in apps.get_models()
+        for field in model._meta.local_concrete_fields
+        if isinstance(field, CentsField)
+    ]
+
+
+def column_storage(connection, model, field):
+    """How `field` is stored on `connection` now: "cents" or "decimal"."""
+    with connection.cursor() as cursor:
+        description = connection.introspection.get_table_description(
+            cursor, model._meta.db_table
+        )
+    info = next(info for info in description if info.name == field.column)
+    field_type = connection.introspection.get_field_type(info.type_code, info)
+    return "cents" if field_type in ("BigIntegerField", "IntegerField") else "decimal"
+
+
+def convert_column(connection, model, field, storage):
+    """
+    Alter `field`'s column to `storage`, scaling the values: to cents before
+    the type change, so no cent is rounded away, back to decimal after it.
+    """
+    old_field, new_field = copy.copy(field), copy.copy(field)
+    old_field.fixed_storage = "decimal" if storage == "cents" else "cents"
+    new_field.fixed_storage = storage
+    rows = model._base_manager.using(connection.alias)
+    scale = 10**field.decimal_places
+    with connection.schema_editor() as editor:
+        if storage == "cents":
+            # Rounded: 10.07 * 100 is 1006.999... on SQLite
+            rows.update(
+                **{
+                    field.attname: Cast(
+                        Round(F(field.attname) * scale), models.BigIntegerField()
+                    )
+                }
+            )
+            editor.alter_field(model, old_field, new_field)
+        else:
+            editor.alter_field(model, old_field, new_field)
+            decimal = models.DecimalField(
+                max_digits=field.max_digits, decimal_places=field.decimal_places
+            )
+            rows.update(
+                **{field.attname: Cast(F(field.attname) / Value(float(scale)), decimal)}
+            )
+
+
+class Command(BaseCommand):
+    help = (
+        "Converts the money amount columns of every database to --to "
+        "(default: settings.AMOUNT_STORAGE), integer cents or decimals"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--to", choices=AMOUNT_STORAGES, default=None)
+
+    def handle(self, *args, **options):
+        storage = options["to"] or settings.AMOUNT_STORAGE
+        converted = 0
+        for alias in connections:
+            connection = connections[alias]
+            for model, field in amount_fields():
+                if not router.allow_migrate_model(alias, model):
+                    continue
+                if column_storage(connection, model, field) == storage:
+                    continue
+                convert_column(connection, model, field, storage)
+                converted += 1
+                self.stdout.write(
+                    f"{alias}: {model._meta.db_table}.{field.column} -> {storage}"
+                )
+        self.stdout.write(
+            self.style.SUCCESS(f"Converted {converted} columns to {storage}")
+        )
@@ -0,0 +1,473 @@
+import asyncio
+import gzip
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from main.management.commands.bench_api import percentile
+
+PASSWORD = "testpass123"  # create_mock_data's password for mock_user_<n>
+API = "/api/v1"
+
+SERVERS = {
+    "gunicorn": lambda port, workers: [
+        sys.executable,
+        "-m",
+        "gunicorn",
+        "main.wsgi:application",
+        "--bind",
+        f"127.0.0.1:{port}",
+        "--workers",
+        str(workers),
+        "--log-level",
+        "warning",
+    ],
+    "uvicorn": lambda port, workers: [
+        sys.executable,
+        "-m",
+        "uvicorn",
+        "main.asgi:application",
+        "--host",
+        "127.0.0.1",
+        "--port",
+        str(port),
+        "--workers",
+        str(workers),
+        "--log-level",
+        "warning",
+    ],
+}
+
+# (operation, weight) for what a signed-in session does between requests
+WORKLOAD = [
+    ("dashboard", 15),
+    ("list_page", 30),
+    ("search", 10),
+    ("categories", 10),
+    ("create", 20),
+    ("budget_edit", 15),
+]
+SEARCH_TERMS = ["grocer", "rent", "coffee", "salary", "gas", "movie"]
+
+
+class HttpError(Exception):
+    pass
+
+
+class HttpClient:
+    """
+    Minimal keep-alive HTTP/1.1 client on asyncio streams, one connection per
+    session like a browser tab. `source` binds it to a loopback address of
+    its own, so that per-IP throttles see separate clients.
+    """
+
+    def __init__(self, port, source=None):
+        self.port = port
+        self.source = source
+        self.reader = self.writer = None
+        self.token = None
+
+    async def connect(self):
+        local_addr = (self.source, 0) if self.source else None
+        self.reader, self.writer = await asyncio.open_connection(
+            "127.0.0.1", self.port, local_addr=local_addr
+        )
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except OSError:
+                pass
+            self.writer = None
+
+    async def request(self, method, path, body=None):
+        """(status, parsed JSON body or None); reconnects once if the server closed the connection."""
+        payload = json.dumps(body).encode() if body is not None else b""
+        headers = [
+            f"{method} {API}{path} HTTP/1.1",
+            f"Host: 127.0.0.1:{self.port}",
+            "Accept: application/json",
+            "Accept-Encoding: gzip",
+            f"Content-Length: {len(payload)}",
+        ]
+        if body is not None:
+            headers.append("Content-Type: application/json")
+        if self.token:
+            headers.append(f"Authorization: Bearer {self.token}")
+        message = ("\r\n".join(headers) + "\r\n\r\n").encode() + payload
+
+        for attempt in range(2):
+            if self.writer is None:
+                await self.connect()
+            try:
+                self.writer.write(message)
+                await self.writer.drain()
+                return await self.read_response()
+            except (ConnectionError, asyncio.IncompleteReadError):
+                await self.close()
+                if attempt:
+                    raise
+
+    async def read_response(self):
+        status_line = await self.reader.readuntil(b"\r\n")
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readuntil(b"\r\n")
+            if line == b"\r\n":
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await self.reader.readuntil(b"\r\n")).split(b";")[0], 16)
+                chunks.append(await self.reader.readexactly(size + 2))
+                if size == 0:
+                    break
+            content = b"".join(chunk[:-2] for chunk in chunks)
+        elif "content-length" in headers:
+            content = await self.reader.readexactly(int(headers["content-length"]))
+        else:
+            content = await self.reader.read()
+        if headers.get("connection", "").lower() == "close":
+            await self.close()
+
+        if headers.get("content-encoding") == "gzip":
+            content = gzip.decompress(content)
+        try:
+            return status, json.loads(content) if content else None
+        except ValueError:
+            return status, None
+
+
+class Session:
+    """One signed-in user replaying WORKLOAD until the deadline."""
+
+    def __init__(self, port, username, source, results, rng):
+        self.client = HttpClient(port, source)
+        self.username = username
+        self.results = results
+        self.rng = rng
+        self.user_id = None
+        self.category_ids = []
+        self.budgets = []
+        self.created = 0
+
+    async def call(self, operation, method, path, body=None):
+        started = time.perf_counter()
+        try:
+            status, data = await self.client.request(method, path, body)
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            status, data = None, None
+        self.results.append((operation, time.perf_counter() - started, status))
+        if status is None or status >= 400:
+            raise HttpError(f"{operation}: {status}")
+        return data
+
+    async def sign_in(self):
+        data = await self.call(
+            "login",
+            "POST",
+            "/auth/login/",
+            {"username": self.username, "password": PASSWORD},
+        )
+        self.client.token = data["access"]
+        self.user_id = data["user"]["id"]
+        categories = await self.call("categories", "GET", "/budgethink/categories/")
+        self.category_ids = [category["id"] for category in categories["objects"]]
+        budgets = await self.call("budgets", "GET", "/budgethink/budgets/")
+        self.budgets = budgets["objects"]
+
+    async def dashboard(self):
+        months = self.rng.choice([1, 4, 6, 12])
+        await self.call(
+            "dashboard",
+            "GET",
+            f"/budgethink/transactions/dashboard/?months_span={months}",
+        )
+
+    async def list_page(self):
+        page = self.rng.choice([1, 1, 1, 2, 3])
+        await self.call("list_page", "GET", f"/budgethink/transactions/?page={page}")
+
+    async def search(self):
+        term = self.rng.choice(SEARCH_TERMS)
+        await self.call("search", "GET", f"/budgethink/transactions/?search={term}")
+
+    async def categories(self):
+        await self.call("categories", "GET", "/budgethink/categories/")
+
+    async def create(self):
+        self.created += 1
+        await self.call(
+            "create",
+            "POST",
+            "/budgethink/transactions/",
+            {
+                "user_id": self.user_id,
+                "category_id": (
+                    self.rng.choice(self.category_ids) if self.category_ids else None
+                ),
+                "title": f"Load test {self.created}",
+                "type": self.rng.choice(["expense", "expense", "expense", "income"]),
+                "amount": f"{self.rng.uniform(1, 200):.2f}",
+                "transaction_date": date.today().isoformat(),
+            },
+        )
+
+    async def budget_edit(self):
+        if not self.budgets:
+            return await self.dashboard()
+        budget = self.rng.choice(self.budgets)
+        await self.call(
+            "budget_edit",
+            "PUT",
+            f"/budgethink/budgets/{budget['id']}/",
+            {
+                "user_id": self.user_id,
+                "category_id": budget["category"]["id"] if budget["category"] else None,
+                "name": budget["name"],
+                "amount_limit": f"{self.rng.uniform(500, 5000):.2f}",
+                "month": budget["month"],
+                "year": budget["year"],
+            },
+        )
+
+    async def run(self, deadline):
+        operations, weights = zip(*WORKLOAD)
+        try:
+            await self.sign_in()
+        except HttpError:
+            return await self.client.close()
+        while time.perf_counter() < deadline:
+            operation = self.rng.choices(operations, weights)[0]
+            try:
+                await getattr(self, operation)()
+            except HttpError:
+                pass  # counted in the results
+        await self.client.close()
+
+
+async def run_level(port, usernames, concurrency, duration, seed):
+    """Run `concurrency` sessions for `duration` seconds; returns [(operation, seconds, status)]."""
+    results = []
+    deadline = time.perf_counter() + duration
+    sessions = [
+        Session(
+            port,
+            usernames[index % len(usernames)],
+            # 127.0.0.0/8 is all loopback on Linux
+            f"127.0.{1 + index // 250}.{2 + index % 250}",
+            results,
+            random.Random(seed * 100003 + index),
+        )
+        for index in range(concurrency)
+    ]
+    await asyncio.gather(*(session.run(deadline) for session in sessions))
+    return results
+
+
+def summarize(results, elapsed):
+    latencies = [seconds * 1000 for _, seconds, _ in results]
+    errors = Counter(
+        str(status or "connection")
+        for _, _, status in results
+        if status is None or status >= 400
+    )
+    return {
+        "requests": len(results),
+        "throughput": round(len(results) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50), 2) if latencies else 0,
+        "p95_ms": round(percentile(latencies, 95), 2) if latencies else 0,
+        "p99_ms": round(percentile(latencies, 99), 2) if latencies else 0,
+        "error_rate": round(sum(errors.values()) / len(results), 4) if results else 0,
+        "errors": dict(errors),  # by status
+    }
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = (
+        "Starts the app under gunicorn or uvicorn on a seeded throwaway database and "
+        "replays a mixed workload of many users at increasing concurrency, reporting "
+        "throughput, latency percentiles and error rates"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--server", choices=list(SERVERS), default="gunicorn")
+        parser.add_argument(
+            "--workers", type=int, default=4, help="Server worker processes"
+        )
+        parser.add_argument(
+            "--concurrency", default="1,4,16,64", help="Comma-separated session counts"
+        )
+        parser.add_argument(
+            "--duration", type=float, default=10.0, help="Seconds per concurrency level"
+        )
+        parser.add_argument("--users", type=int, default=50, help="Seeded users")
+        parser.add_argument(
+            "--days", type=int, default=90, help="Days of seeded history per user"
+        )
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument(
+            "--db-name",
+            help="Database to seed and serve; default a temporary SQLite file (required on Postgres)",
+        )
+        parser.add_argument(
+            "--output", help="Also write the results as JSON to this file"
+        )
+
+    def handle(self, *args, **options):
+        try:
+            levels = [
+                int(level)
+                for level in options["concurrency"].split(",")
+                if level.strip()
+            ]
+        except ValueError:
+            raise CommandError("--concurrency must be comma-separated integers")
+        if options["users"] < 2:
+            raise CommandError(
+                "--users must be at least 2"
+            )  # user id=1 has no usable password
+        postgres = settings.DATABASES["default"]["ENGINE"].endswith("postgresql")
+        if postgres and not options["db_name"]:
+            raise CommandError(
+                "--db-name is required on Postgres: the run fills that database"
+            )
+
+        with tempfile.TemporaryDirectory() as directory:
+            env = {
+                **os.environ,
+                "DB_NAME": options["db_name"]
+                or os.path.join(directory, "load_test.sqlite3"),
+                # The workers share the two-tier cache's L2 as in production
+                # (each would have its own memory cache without it)
+                "CACHE_URL": os.environ.get("CACHE_URL")
+                or f"file://{os.path.join(directory, 'cache')}",
+                "PYTHONUNBUFFERED": "1",
+            }
+            self.seed(env, options)
+            port = free_port()
+            log_path = os.path.join(directory, "server.log")
+            with open(log_path, "w") as log:
+                server = subprocess.Popen(
+                    SERVERS[options["server"]](port, options["workers"]),
+                    cwd=settings.BASE_DIR,
+                    env=env,
+                    stdout=log,
+                    stderr=subprocess.STDOUT,
+                )
+                try:
+                    self.wait_for(server, port, log_path)
+                    report = self.run_levels(port, levels, options)
+                finally:
+                    server.terminate()
+                    try:
+                        server.wait(timeout=10)
+                    except subprocess.TimeoutExpired:
+                        server.kill()
+
+        if options["output"]:
+            with open(options["output"], "w") as output:
+                json.dump(report, output, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+    def seed(self, env, options):
+        self.stdout.write(
+            f"Seeding {options['users']} users x {options['days']} days..."
+        )
+        for command in (
+            ["migrate", "--noinput", "-v", "0"],
+            [
+                "create_mock_data",
+                "--users",
+                str(options["users"]),
+                "--days",
+                str(options["days"]),
+                "--seed",
+                str(options["seed"]),
+            ],
+        ):
+            subprocess.run(
+                [sys.executable, "manage.py", *command],
+                cwd=settings.BASE_DIR,
+                env=env,
+                check=True,
+                stdout=subprocess.DEVNULL,
+            )
+
+    def wait_for(self, server, port, log_path, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                with open(log_path) as log:
+                    raise CommandError(f"The server exited:\n{log.read()}")
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise CommandError(f"The server didn't listen on port {port} within {timeout}s")
+
+    def run_levels(self, port, levels, options):
+        usernames = [f"mock_user_{index}" for index in range(1, options["users"])]
+        self.stdout.write(
+            f"{options['server']} with {options['workers']} workers, "
+            f"{options['duration']:.0f}s per level"
+        )
+        report = {
+            "meta": {
+                key: options[key]
+                for key in ("server", "workers", "users", "days", "duration")
+            },
+            "levels": {},
+        }
+        for level in levels:
+            started = time.perf_counter()
+            results = asyncio.run(
+                run_level(port, usernames, level, options["duration"], options["seed"])
+            )
+            elapsed = time.perf_counter() - started
+            summary = summarize(results, elapsed)
+            summary["operations"] = {
+                operation: summarize(
+                    [result for result in results if result[0] == operation], elapsed
+                )
+                for operation in sorted({result[0] for result in results})
+            }
+            report["levels"][level] = summary
+            self.stdout.write(
+                f"  {level:>4} sessions {summary['throughput']:>9.1f} req/s  "
+                f"p50 {summary['p50_ms']:>8.2f} ms  p95 {summary['p95_ms']:>8.2f} ms  "
+                f"p99 {summary['p99_ms']:>8.2f} ms  errors {summary['error_rate']:>7.2%}"
+            )
+            for operation, ops in summary["operations"].items():
+                self.stdout.write(
+                    f"       {operation:<12} {ops['requests']:>7} req  "
+                    f"p50 {ops['p50_ms']:>8.2f} ms  p95 {ops['p95_ms']:>8.2f} ms  "
+                    f"errors {ops['error_rate']:>7.2%}  "
+                    + " ".join(
+                        f"{status}: {count}" for status, count in ops["errors"].items()
+                    )
+                )
+        return report
@@ -0,0 +1,162 @@
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from django.utils.module_loading import import_string
+
+# Run in a fresh interpreter under `-X importtime`: the phases of a worker
+# cold start, each timed, printed as JSON on stdout
+COLD_START = """
+import json, os, time
+started = time.perf_counter()
+phases = {}
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "main.settings")
+import django
+from django.conf import settings
+settings.INSTALLED_APPS
+phases["settings"] = time.perf_counter() - started
+django.setup(set_prefix=False)
+phases["apps"] = time.perf_counter() - started - sum(phases.values())
+from django.core.handlers.wsgi import WSGIHandler
+application = WSGIHandler()
+phases["middleware"] = time.perf_counter() - started - sum(phases.values())
+from django.urls import get_resolver
+get_resolver().url_patterns
+phases["urls and views"] = time.perf_counter() - started - sum(phases.values())
+print(json.dumps(phases))
+"""
+
+PROJECT_PACKAGES = {"main", "account", "budgethink"}
+
+
+def parse_importtime(stderr):
+    """[(module, self seconds, cumulative seconds)] from `-X importtime` output."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        # Later lines for an already imported module are just name lookups
+        modules.setdefault(
+            name.strip(), (name.strip(), int(self_us) / 1e6, int(cumulative_us) / 1e6)
+        )
+    return list(modules.values())
+
+
+def middleware_overhead(paths, iterations):
+    """
+    Microseconds each middleware adds per request around a trivial view, and
+    the whole chain's. Each one is measured on top of those listed before it,
+    which it may depend on (AuthenticationMiddleware needs a session).
+    """
+    factory = RequestFactory()
+
+    def view(request):
+        return HttpResponse(b'{"ok": true}', content_type="application/json")
+
+    def per_request(count):
+        handler = view
+        for path in reversed(paths[:count]):
+            handler = import_string(path)(handler)
+        handler(factory.get("/api/v1/budgethink/categories/"))  # warm up
+        total = 0.0
+        for _ in range(iterations):
+            request = factory.get("/api/v1/budgethink/categories/")
+            started = time.perf_counter()
+            handler(request)
+            total += time.perf_counter() - started
+        return total / iterations * 1e6
+
+    with override_settings(ALLOWED_HOSTS=["*"]):  # CommonMiddleware validates the host
+        timings = [per_request(count) for count in range(len(paths) + 1)]
+    overhead = {
+        path: max(0.0, timings[index + 1] - timings[index])
+        for index, path in enumerate(paths)
+    }
+    return overhead, timings[-1] - timings[0]
+
+
+class Command(BaseCommand):
+    help = (
+        "Reports worker cold-start time (per phase, package and module, from "
+        "`python -X importtime`) and the per-request cost of each middleware"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--top", type=int, default=15, help="Slowest modules to list"
+        )
+        parser.add_argument("--iterations", type=int, default=2000)
+        parser.add_argument(
+            "--api-only",
+            action="store_true",
+            help="Profile the cold start with API_ONLY=True",
+        )
+
+    def handle(self, *args, **options):
+        env = {
+            **os.environ,
+            "DJANGO_SETTINGS_MODULE": os.environ["DJANGO_SETTINGS_MODULE"],
+        }
+        if options["api_only"]:
+            env["API_ONLY"] = "True"
+        started = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", COLD_START],
+            capture_output=True,
+            text=True,
+            env=env,
+            cwd=settings.BASE_DIR,
+        )
+        wall = time.perf_counter() - started
+        if result.returncode:
+            raise CommandError(result.stderr[-2000:])
+        phases = json.loads(result.stdout.strip().splitlines()[-1])
+        modules = parse_importtime(result.stderr)
+
+        profile = "API_ONLY" if options["api_only"] else "full"
+        self.stdout.write(
+            f"Cold start ({profile} profile): {wall * 1000:.0f} ms wall, including the interpreter"
+        )
+        for phase, seconds in phases.items():
+            self.stdout.write(f"  {phase:<16} {seconds * 1000:>8.1f} ms")
+
+        packages = defaultdict(float)
+        for name, self_seconds, _ in modules:
+            packages[name.split(".")[0]] += self_seconds
+        self.stdout.write(f"Import time by package (top {options['top']}):")
+        for package, seconds in sorted(packages.items(), key=lambda item: -item[1])[
+            : options["top"]
+        ]:
+            self.stdout.write(f"  {package:<28} {seconds * 1000:>8.1f} ms")
+
+        self.stdout.write(f"Slowest modules, cumulative (top {options['top']}):")
+        slowest = sorted(modules, key=lambda module: -module[2])
+        for name, _, cumulative in slowest[: options["top"]]:
+            self.stdout.write(f"  {name:<48} {cumulative * 1000:>8.1f} ms")
+        project = [
+            module for module in slowest if module[0].split(".")[0] in PROJECT_PACKAGES
+        ]
+        self.stdout.write("Project modules, cumulative:")
+        for name, _, cumulative in project[: options["top"]]:
+            self.stdout.write(f"  {name:<48} {cumulative * 1000:>8.1f} ms")
+
+        # Per-request cost of this process's MIDDLEWARE setting
+        logging.getLogger("main.requests").setLevel(logging.WARNING)
+        overhead, chain = middleware_overhead(
+            settings.MIDDLEWARE, options["iterations"]
+        )
+        self.stdout.write(
+            f"Middleware overhead per request ({len(overhead)} middleware):"
+        )
+        for path, microseconds in overhead.items():
+            self.stdout.write(f"  {path:<56} {microseconds:>7.1f} us")
+        self.stdout.write(f"  {'whole chain':<56} {chain:>7.1f} us")
@@ -0,0 +1,275 @@
+import json
+import logging
+import random
+import time
+import zlib
+from contextlib import ExitStack
+from functools import wraps
+
+from django.conf import settings
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+
+from main.instrumentation import RequestMetrics, collect_metrics, current_metrics
+
+try:
+    import brotli
+except ImportError:  # optional: without it only gzip is offered
+    brotli = None
+
+logger = logging.getLogger("main.requests")
+
+DEFAULT_REQUEST_METRICS = {
+    "ENABLED": True,
+    "LOG_REQUESTS": False,  # one structured log line per request, not just slow ones
+    "SLOW_REQUEST_MS": 500,
+    "SLOW_SAMPLE_RATE": 1.0,  # share of slow requests logged with their top SQL
+    "TOP_SQL": 5,
+}
+
+DEFAULT_COMPRESSION = {
+    "ENABLED": True,
+    "MIN_LENGTH": 512,  # bytes; smaller bodies gain less than the header costs
+    "ENCODINGS": ["br", "gzip"],  # preferred first when the client accepts both
+    "BROTLI_QUALITY": 5,  # 0-11
+    "GZIP_LEVEL": 6,  # 1-9
+    # Long-lived streams would each pin a compressor for tiny events
+    "SKIP_CONTENT_TYPES": ["text/event-stream"],
+}
+
+
+class RequestMetricsMiddleware:
+    """
+    Records DB query count and time, GenericView cache hits and misses,
+    serializer time and render time for every request. They are exposed as a
+    `Server-Timing` header and a structured log line on the `main.requests`
+    logger; slow requests are sampled with their slowest SQL statements.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.config = {
+            **DEFAULT_REQUEST_METRICS,
+            **getattr(settings, "REQUEST_METRICS", {}),
+        }
+
+    def __call__(self, request):
+        if not self.config["ENABLED"]:
+            return self.get_response(request)
+
+        metrics = RequestMetrics(top_sql=self.config["TOP_SQL"])
+        started = time.perf_counter()
+        with collect_metrics(metrics), ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(
+                    connections[alias].execute_wrapper(metrics.execute_wrapper)
+                )
+            response = self.get_response(request)
+        total = time.perf_counter() - started
+
+        response["Server-Timing"] = metrics.server_timing(total)
+        self.log(request, response, metrics, total)
+        return response
+
+    def process_template_response(self, request, response):
+        # Called just before the response (DRF's included) is rendered
+        metrics = current_metrics()
+        if metrics is not None:
+            started = time.perf_counter()
+
+            def rendered(response):
+                metrics.render_seconds += time.perf_counter() - started
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    def log(self, request, response, metrics, total):
+        duration_ms = total * 1000
+        slow = duration_ms >= self.config["SLOW_REQUEST_MS"]
+        if not slow and not (
+            self.config["LOG_REQUESTS"] and logger.isEnabledFor(logging.INFO)
+        ):
+            return
+
+        record = {
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "duration_ms": round(duration_ms, 3),
+            **metrics.as_dict(),
+        }
+        if slow and random.random() < self.config["SLOW_SAMPLE_RATE"]:
+            record["slow_queries"] = metrics.slowest_queries()
+            logger.warning(json.dumps(record))
+        elif self.config["LOG_REQUESTS"]:
+            logger.info(json.dumps(record))
+
+
+class GzipCompressor:
+    def __init__(self, level):
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data):
+        return self.compressor.compress(data)
+
+    def flush(self):
+        return self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self.compressor.flush()
+
+
+class BrotliCompressor:
+    def __init__(self, quality):
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self.compressor.process(data)
+
+    def flush(self):
+        return self.compressor.flush()
+
+    def finish(self):
+        return self.compressor.finish()
+
+
+def get_compressor(encoding, config):
+    if encoding == "br":
+        return BrotliCompressor(config["BROTLI_QUALITY"])
+    return GzipCompressor(config["GZIP_LEVEL"])
+
+
+def compress_bytes(encoding, data, config):
+    compressor = get_compressor(encoding, config)
+    return compressor.compress(data) + compressor.finish()
+
+
+def compression_config():
+    return {**DEFAULT_COMPRESSION, **getattr(settings, "COMPRESSION", {})}
+
+
+def supported_encodings(config):
+    """config["ENCODINGS"] this process can produce (Brotli is optional)."""
+    return [
+        encoding
+        for encoding in config["ENCODINGS"]
+        if encoding == "gzip" or (encoding == "br" and brotli is not None)
+    ]
+
+
+def negotiate_encoding(accept_encoding, encodings):
+    """The first of `encodings` with the highest q-value in Accept-Encoding, or None."""
+    accepted = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[name.strip().lower()] = quality
+
+    best, best_quality = None, 0.0
+    for encoding in encodings:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress_exempt(view):
+    """
+    Send the view's responses uncompressed: bodies holding secrets (tokens)
+    next to request data would leak them through their compressed length
+    (BREACH).
+    """
+
+    @wraps(view)
+    def wrapped_view(*args, **kwargs):
+        response = view(*args, **kwargs)
+        response.compress_exempt = True
+        return response
+
+    return wrapped_view
+
+
+class CompressionMiddleware:
+    """
+    Compresses responses with Brotli or gzip, whichever Accept-Encoding
+    prefers (Brotli on ties). Bodies under MIN_LENGTH are sent as they are;
+    streaming responses are compressed chunk by chunk, each chunk flushed so
+    it reaches the client right away. Views wrapped in compress_exempt() are
+    skipped. See DEFAULT_COMPRESSION for settings.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.config = compression_config()
+        self.encodings = supported_encodings(self.config)
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if self.config["ENABLED"]:
+            self.compress(request, response)
+        return response
+
+    def compress(self, request, response):
+        if response.has_header("Content-Encoding") or getattr(
+            response, "compress_exempt", False
+        ):
+            return
+        content_type = response.get("Content-Type", "").split(";")[0].strip()
+        if content_type in self.config["SKIP_CONTENT_TYPES"]:
+            return
+        if not response.streaming and len(response.content) < self.config["MIN_LENGTH"]:
+            return
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        encoding = negotiate_encoding(
+            request.META.get("HTTP_ACCEPT_ENCODING", ""), self.encodings
+        )
+        if encoding is None:
+            return
+
+        if response.streaming:
+            compressor = get_compressor(encoding, self.config)
+            if response.is_async:
+                response.streaming_content = self.compress_async(
+                    compressor, response.streaming_content
+                )
+            else:
+                response.streaming_content = self.compress_stream(
+                    compressor, response.streaming_content
+                )
+            del response["Content-Length"]
+        else:
+            compressed = compress_bytes(encoding, response.content, self.config)
+            if len(compressed) >= len(response.content):
+                return
+            response.content = compressed
+            response["Content-Length"] = str(len(compressed))
+
+        # The compressed body differs byte for byte: a strong ETag must go weak
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = "W/" + etag
+        response["Content-Encoding"] = encoding
+
+    @staticmethod
+    def compress_stream(compressor, chunks):
+        for chunk in chunks:
+            data = compressor.compress(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+
+    @staticmethod
+    async def compress_async(compressor, chunks):
+        async for chunk in chunks:
+            data = compressor.compress(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
@@ -1,8 +1,5 @@
+from django.conf import settings
 from rest_framework.permissions import BasePermission
-import os
-import dotenv
-
-dotenv.load_dotenv()
 
 
 class IsAuthenticated(BasePermission):
@@ -11,6 +8,6 @@ class IsAuthenticated(BasePermission):
     """
 
     def has_permission(self, request, view):
-        if os.getenv("DISABLE_AUTH") == "True":
+        if settings.DISABLE_AUTH:
             return True
         return bool(request.user and request.user.is_authenticated)
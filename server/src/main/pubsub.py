@@ -0,0 +1,127 @@
+"""
+Publish/subscribe for pushing server-side events to streaming responses.
+
+Publishers are ordinary (sync) request code; subscribers are async views
+running on the ASGI event loop. The backend is chosen by settings.PUBSUB:
+
+- LocalPubSub (default): in-process queues. Publishers and subscribers must
+  share a process, so use it with a single ASGI worker, and in tests.
+- RedisPubSub: Redis channels, for several workers or servers. Needs the
+  `redis` package and OPTIONS {"url": "redis://..."}.
+"""
+
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+RESET = {"reset": True}  # sent to subscribers that fell too far behind
+
+
+class LocalSubscription:
+    def __init__(self, pubsub, channel, max_pending):
+        self.pubsub = pubsub
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(max_pending)
+
+    def deliver(self, message):
+        # Called from publisher threads; the queue belongs to the event loop
+        try:
+            self.loop.call_soon_threadsafe(self._put, message)
+        except RuntimeError:
+            pass  # loop already closed, the stream is gone
+
+    def _put(self, message):
+        if self.queue.full():
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            message = RESET
+        self.queue.put_nowait(message)
+
+    async def get(self):
+        return await self.queue.get()
+
+    async def close(self):
+        self.pubsub.unsubscribe(self)
+
+
+class LocalPubSub:
+    def __init__(self, max_pending=1000):
+        self.max_pending = max_pending
+        self.subscriptions = defaultdict(set)
+        self.lock = threading.Lock()
+
+    def has_subscribers(self, channel):
+        return bool(self.subscriptions.get(channel))
+
+    def publish(self, channel, message):
+        with self.lock:
+            subscriptions = list(self.subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            subscription.deliver(message)
+
+    async def subscribe(self, channel):
+        subscription = LocalSubscription(self, channel, self.max_pending)
+        with self.lock:
+            self.subscriptions[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscriptions = self.subscriptions.get(subscription.channel)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self.subscriptions[subscription.channel]
+
+
+class RedisSubscription:
+    def __init__(self, pubsub):
+        self.pubsub = pubsub
+
+    async def get(self):
+        while True:
+            message = await self.pubsub.get_message(
+                ignore_subscribe_messages=True, timeout=None
+            )
+            if message is not None:
+                return json.loads(message["data"])
+
+    async def close(self):
+        await self.pubsub.aclose()
+
+
+class RedisPubSub:
+    def __init__(self, url="redis://localhost:6379/0"):
+        try:
+            import redis
+            import redis.asyncio
+        except ImportError:
+            raise ImproperlyConfigured("RedisPubSub requires the redis package")
+        self.url = url
+        self.client = redis.Redis.from_url(url)
+        self.async_client = redis.asyncio.Redis.from_url(url)
+
+    def has_subscribers(self, channel):
+        return True  # asking Redis costs as much as publishing
+
+    def publish(self, channel, message):
+        self.client.publish(channel, json.dumps(message))
+
+    async def subscribe(self, channel):
+        pubsub = self.async_client.pubsub()
+        await pubsub.subscribe(channel)
+        return RedisSubscription(pubsub)
+
+
+@lru_cache(maxsize=None)
+def get_pubsub():
+    config = getattr(settings, "PUBSUB", {})
+    backend = import_string(config.get("BACKEND", "main.pubsub.LocalPubSub"))
+    return backend(**config.get("OPTIONS", {}))
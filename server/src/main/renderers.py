@@ -0,0 +1,58 @@
+"""
+Response formats for GenericView besides row-oriented JSON:
+- MessagePack, for clients sending `Accept: application/msgpack`
+- the columnar list layout (`?layout=columnar`), in any format
+"""
+
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import msgpack
+except ImportError:  # optional: without it only JSON is offered
+    msgpack = None
+
+LAYOUTS = ["rows", "columnar"]
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    # Dates, UUIDs, lazy strings... as the JSON renderer sends them
+    encoder = JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return msgpack.packb(data, default=self.encoder.default)
+
+
+def columnar(objects):
+    """
+    Rows as {field: [values]}, plus the related objects they embed (dicts
+    with an `id`) as {field: {id: object}}, each sent once, with the rows'
+    column holding their ids.
+    """
+    columns, related = {}, {}
+    for index, row in enumerate(objects):
+        for field, value in row.items():
+            if isinstance(value, dict) and "id" in value:
+                objects_by_id = related.get(field)
+                if objects_by_id is None:
+                    objects_by_id = related[field] = {}
+                if value["id"] not in objects_by_id:
+                    objects_by_id[value["id"]] = value
+                value = value["id"]
+            values = columns.get(field)
+            if values is None:
+                # Padded with None for the earlier rows without the field
+                values = columns[field] = [None] * index
+            values.append(value)
+        if len(row) < len(columns):
+            for values in columns.values():
+                if len(values) <= index:
+                    values.append(None)
+    return columns, related
@@ -0,0 +1,87 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, router, transaction
+
+REPLICA_ALIAS = "replica"
+
+_replica_reads = ContextVar("replica_reads", default=False)
+_primary_reads = ContextVar("primary_reads", default=False)
+
+
+@contextmanager
+def replica_reads():
+    """Route ORM reads inside the block to the read replica, if configured."""
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+@contextmanager
+def primary_reads():
+    """
+    Keep every read inside the block on the primary, even in use_replica
+    views, so that it sees writes made earlier in the block.
+    """
+    token = _primary_reads.set(True)
+    try:
+        yield
+    finally:
+        _primary_reads.reset(token)
+
+
+def use_replica(view_method):
+    """Decorator for read-only view methods (list, retrieve, dashboards)."""
+
+    @wraps(view_method)
+    def wrapper(*args, **kwargs):
+        with replica_reads():
+            return view_method(*args, **kwargs)
+
+    return wrapper
+
+
+def atomic_write(view_method):
+    """
+    Decorator for GenericView write methods: transaction.atomic on the
+    database the view's model is written to (with sharding, the user's).
+    """
+
+    @wraps(view_method)
+    def wrapper(self, *args, **kwargs):
+        with transaction.atomic(using=router.db_for_write(self.queryset.model)):
+            return view_method(self, *args, **kwargs)
+
+    return wrapper
+
+
+class ReadReplicaRouter:
+    """
+    Sends reads made inside `replica_reads()` (but not `primary_reads()`) to
+    the replica alias and every write to the primary. Without a configured
+    replica this router is a no-op.
+    """
+
+    def db_for_read(self, model, **hints):
+        if (
+            _replica_reads.get()
+            and not _primary_reads.get()
+            and REPLICA_ALIAS in settings.DATABASES
+        ):
+            return REPLICA_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        # Objects loaded from the replica must still be saved on the primary
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica receives its schema through replication
+        return db != REPLICA_ALIAS
@@ -10,8 +10,15 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+import dotenv
+
+from main.db import database_config, sqlite_pragmas
+
+dotenv.load_dotenv()
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -30,33 +37,53 @@ ALLOWED_HOSTS = []
 
 # Application definition
 
+# API_ONLY=True drops the admin site and the session, message and CSRF
+# machinery it needs: the API authenticates with JWTs only, so workers start
+# faster and every request runs fewer middleware.
+API_ONLY = os.getenv("API_ONLY", "False") == "True"
+
+# IsAuthenticated lets every request through (local debugging only)
+DISABLE_AUTH = os.getenv("DISABLE_AUTH") == "True"
+
 INSTALLED_APPS = [
-    "django.contrib.admin",
     "django.contrib.auth",
     "django.contrib.contenttypes",
-    "django.contrib.sessions",
-    "django.contrib.messages",
     "django.contrib.staticfiles",
     "main",
     "account",
     "budgethink",
+    "jobs",
 ]
+ADMIN_APPS = [
+    "django.contrib.admin",
+    "django.contrib.sessions",
+    "django.contrib.messages",
+]
+if not API_ONLY:
+    INSTALLED_APPS = ADMIN_APPS + INSTALLED_APPS
 
 # Custom user model
 AUTH_USER_MODEL = "account.User"
 
 MIDDLEWARE = [
+    "main.middleware.RequestMetricsMiddleware",
+    "main.middleware.CompressionMiddleware",
+    "django.middleware.security.SecurityMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
     "account.middleware.JWTAuthMiddleware",
-    "django.middleware.security.SecurityMiddleware",
-    "django.contrib.sessions.middleware.SessionMiddleware",
-    "django.contrib.auth.middleware.AuthenticationMiddleware",
-    "django.middleware.common.CommonMiddleware",
-    "django.middleware.csrf.CsrfViewMiddleware",
-    "django.contrib.messages.middleware.MessageMiddleware",
-    "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
+if not API_ONLY:
+    # The session user is set first so a JWT can take over from it
+    MIDDLEWARE[-1:-1] = [
+        "django.contrib.sessions.middleware.SessionMiddleware",
+        "django.contrib.auth.middleware.AuthenticationMiddleware",
+    ]
+    MIDDLEWARE += [
+        "django.middleware.csrf.CsrfViewMiddleware",
+        "django.contrib.messages.middleware.MessageMiddleware",
+        "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    ]
 
 ROOT_URLCONF = "main.urls"
 
@@ -69,8 +96,8 @@ TEMPLATES = [
             "context_processors": [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
-                "django.contrib.messages.context_processors.messages",
-            ],
+            ]
+            + ([] if API_ONLY else ["django.contrib.messages.context_processors.messages"]),
         },
     },
 ]
@@ -81,23 +108,24 @@ WSGI_APPLICATION = "main.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
-    }
-}
+# SQLite by default; set DB_ENGINE=postgresql for production. See main/db.py
+# for the full list of DB_* environment variables.
+DATABASES = database_config(os.environ, BASE_DIR)
+
+# PRAGMAs applied to each new SQLite connection, enabled by DB_SQLITE_TUNING
+SQLITE_PRAGMAS = sqlite_pragmas(os.environ)
 
-# DATABASES = {
-#     "default": {
-#         "ENGINE": "django.db.backends.postgresql",
-#         "NAME": os.getenv("DB_NAME") or "haircat",
-#         "USER": os.getenv("DB_USER") or "haircatuser",
-#         "PASSWORD": os.getenv("DB_PASSWORD") or "password",
-#         "HOST": os.getenv("DB_HOST") or "localhost",
-#         "PORT": os.getenv("DB_PORT") or "5432",
-#     }
-# }
+# budgethink data goes to the requesting user's shard when DB_SHARDS
+# configures shards (main.sharding). Reads made by list/retrieve/dashboard
+# views go to the "replica" alias when one is configured, everything else
+# stays on "default".
+DATABASE_ROUTERS = ["main.sharding.UserShardRouter", "main.routers.ReadReplicaRouter"]
+
+# Column type of money amounts (main.fields.CentsField): "decimal" columns, or
+# "cents" for integer minor units (exact sums, faster row fetches). Run
+# `manage.py convert_amount_storage` after changing it on an existing database;
+# `manage.py bench_amount_storage` compares the two.
+AMOUNT_STORAGE = os.getenv("AMOUNT_STORAGE", "decimal")
 
 
 # Password validation
@@ -168,3 +196,78 @@ CORS_ALLOW_CREDENTIALS = True
 #     'https://app.tranches.com',
 #     'https://staging.tranches.com',
 # ]
+
+# Per-request metrics: Server-Timing headers and structured logs on the
+# "main.requests" logger. See main.middleware.RequestMetricsMiddleware.
+REQUEST_METRICS = {
+    "ENABLED": os.getenv("REQUEST_METRICS", "True") == "True",
+    "LOG_REQUESTS": os.getenv("LOG_REQUESTS", "False") == "True",
+    "SLOW_REQUEST_MS": int(os.getenv("SLOW_REQUEST_MS", 500)),
+    "SLOW_SAMPLE_RATE": 1.0,
+    "TOP_SQL": 5,
+}
+
+# Brotli/gzip response compression. See main.middleware.CompressionMiddleware
+# and `manage.py bench_compression` for the size/CPU trade-off of each level.
+COMPRESSION = {
+    "ENABLED": os.getenv("COMPRESSION", "True") == "True",
+    "MIN_LENGTH": 512,
+    "BROTLI_QUALITY": int(os.getenv("BROTLI_QUALITY", 5)),
+    "GZIP_LEVEL": int(os.getenv("GZIP_LEVEL", 6)),
+}
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "main.requests": {"handlers": ["console"], "level": "INFO", "propagate": False},
+        "jobs": {"handlers": ["console"], "level": "INFO", "propagate": False},
+    },
+}
+
+# Pub/sub feeding the live dashboard stream (main.pubsub). The in-process
+# backend only reaches subscribers in the same worker; set PUBSUB_URL to
+# share events between workers through Redis.
+PUBSUB = (
+    {"BACKEND": "main.pubsub.RedisPubSub", "OPTIONS": {"url": os.getenv("PUBSUB_URL")}}
+    if os.getenv("PUBSUB_URL")
+    else {"BACKEND": "main.pubsub.LocalPubSub", "OPTIONS": {}}
+)
+
+# Shared cache (L2 of the two-tier cache): CACHE_URL is a Redis URL, or
+# file:///some/dir for a directory shared by the workers of one host. Without
+# it each worker has its own memory cache, so cache entries and invalidations
+# stay local to it: outside DEBUG, the workers and `manage.py check --deploy`
+# warn about that (main.W001).
+CACHE_URL = os.getenv("CACHE_URL", "")
+if CACHE_URL.startswith("file://"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": CACHE_URL.removeprefix("file://"),
+            "OPTIONS": {"MAX_ENTRIES": 100000},
+        }
+    }
+elif CACHE_URL:
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": CACHE_URL}}
+else:
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+# Per-process L1 in front of CACHES for GenericView responses (main.cache).
+# A write in another worker reaches this one's L1 within
+# VERSION_CHECK_INTERVAL seconds. See `manage.py bench_cache`.
+TWO_TIER_CACHE = {
+    "L1_MAXSIZE": int(os.getenv("CACHE_L1_MAXSIZE", 1024)),
+    "L1_TTL": 60,
+    "VERSION_CHECK_INTERVAL": float(os.getenv("CACHE_VERSION_CHECK_INTERVAL", 1.0)),
+}
+
+# Background jobs (jobs.queue), run by `manage.py run_workers --concurrency N`
+JOBS = {
+    "POLL_INTERVAL": float(os.getenv("JOBS_POLL_INTERVAL", 1.0)),
+    "STALE_AFTER": 600,
+    "RETRY_DELAY": 10,
+}
@@ -0,0 +1,156 @@
+"""
+Per-user sharding of the SHARDED_APPS models (budgethink) across databases.
+
+Every `shard_<n>` alias in DATABASES is a shard, besides `default`, which
+also holds everything that isn't sharded (users, jobs...). Shards are
+migrated like default (`migrate --database shard_1`) and carry the full
+schema, but only the sharded apps' tables hold rows there; their foreign
+keys to users have no database constraint.
+
+A user's shard is stored on the user (`User.shard`), chosen when the account
+is created; `manage.py move_user_shard` moves one.
+
+UserShardRouter sends a sharded model's queries to:
+- the shard of the instance's `user_id`, for saves, deletes and related
+  managers (`category.transactions`);
+- otherwise the shard set by `user_shard()` for the current context:
+  GenericView sets the requesting user's for the whole request, background
+  code sets it around each user's work;
+- otherwise `default`.
+
+Without any shard alias configured the router does nothing, and the read
+replica router behaves as before.
+"""
+
+import zlib
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+SHARD_PREFIX = "shard_"
+DEFAULT_SHARDED_APPS = ["budgethink"]
+SHARD_CACHE_DURATION = 60 * 60
+
+_user_shard = ContextVar("user_shard", default=None)  # (user_id, alias)
+
+
+def sharded_apps():
+    return getattr(settings, "SHARDED_APPS", DEFAULT_SHARDED_APPS)
+
+
+def shard_aliases():
+    """`default`, then the configured shards."""
+    return [DEFAULT_DB_ALIAS] + sorted(
+        (alias for alias in connections.settings if alias.startswith(SHARD_PREFIX)),
+        key=lambda alias: (len(alias), alias),  # shard_2 before shard_10
+    )
+
+
+def sharding_enabled():
+    return any(alias.startswith(SHARD_PREFIX) for alias in connections.settings)
+
+
+def new_user_shard(username):
+    """Shard for a new account: spread by a stable hash of the username."""
+    aliases = shard_aliases()
+    return aliases[zlib.crc32(username.encode()) % len(aliases)]
+
+
+def shard_for_user(user_id):
+    """The user's shard, cached in the user's cache scope (moves reset it)."""
+    if not sharding_enabled():
+        return DEFAULT_DB_ALIAS
+    current = _user_shard.get()
+    if current is not None and current[0] == user_id:
+        return current[1]
+
+    from django.contrib.auth import get_user_model
+
+    from main.cache import get_two_tier_cache, user_cache_scope
+
+    def lookup():
+        users = get_user_model().objects.using(DEFAULT_DB_ALIAS)
+        return (
+            users.filter(pk=user_id).values_list("shard", flat=True).first()
+            or DEFAULT_DB_ALIAS
+        )
+
+    scope = user_cache_scope(user_id)
+    return get_two_tier_cache().get_or_compute(
+        f"shard_{scope}", scope, lookup, SHARD_CACHE_DURATION
+    )
+
+
+def group_by_shard(user_ids):
+    """{alias: [user_id, ...]} for `user_ids`, in one query."""
+    if not sharding_enabled():
+        return {DEFAULT_DB_ALIAS: list(user_ids)}
+    from django.contrib.auth import get_user_model
+
+    groups = defaultdict(list)
+    users = (
+        get_user_model().objects.using(DEFAULT_DB_ALIAS).filter(pk__in=list(user_ids))
+    )
+    for user_id, alias in users.values_list("pk", "shard"):
+        groups[alias].append(user_id)
+    return dict(groups)
+
+
+def use_user_shard(user_id, alias=None):
+    """user_shard() for the rest of the current context (GenericView: the request)."""
+    _user_shard.set((user_id, alias or shard_for_user(user_id)))
+
+
+@contextmanager
+def user_shard(user_id, alias=None):
+    """
+    Route the sharded models' queries inside the block that have no instance
+    to go by (querysets, bulk_create) to the shard of `user_id`; `alias` saves
+    the lookup when the caller already has it (request.user.shard).
+    """
+    token = _user_shard.set((user_id, alias or shard_for_user(user_id)))
+    try:
+        yield
+    finally:
+        _user_shard.reset(token)
+
+
+class UserShardRouter:
+    """See the module docstring. Goes before ReadReplicaRouter."""
+
+    def shard(self, model, hints):
+        if not sharding_enabled():
+            return None
+        instance = hints.get("instance")
+        if model._meta.app_label not in sharded_apps():
+            # e.g. `transaction.user`: not on the shard the transaction came from
+            if instance is not None and (instance._state.db or "").startswith(
+                SHARD_PREFIX
+            ):
+                return DEFAULT_DB_ALIAS
+            return None
+
+        from django.contrib.auth import get_user_model
+
+        if isinstance(instance, get_user_model()):  # user.transactions
+            alias = instance.shard
+        elif getattr(instance, "user_id", None) is not None:
+            alias = shard_for_user(instance.user_id)
+        else:
+            current = _user_shard.get()
+            alias = current[1] if current is not None else DEFAULT_DB_ALIAS
+        # Left to the next router on default, so that reads can use the replica
+        return None if alias == DEFAULT_DB_ALIAS else alias
+
+    def db_for_read(self, model, **hints):
+        return self.shard(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self.shard(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Sharded rows point at users on default
+        return True
@@ -0,0 +1,1239 @@
+import asyncio
+import gzip
+import json
+import os
+import tempfile
+import threading
+import time
+import zlib
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest import mock, skipIf
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.models import Sum
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
+
+from account.middleware import JWTAuthMiddleware
+from account.models import User
+from budgethink.dashboard import dashboard_totals
+from budgethink.models import Category, Transaction
+from budgethink.views import CategoryView, TransactionView
+from main.cache import TwoTierCache, check_shared_l2, log_unshared_l2, user_cache_scope
+from main.db import database_config, sqlite_config, sqlite_pragmas
+from main.fields import CentsField
+from main.management.commands.bench_api import (
+    compare_to_baseline,
+    endpoint_label,
+    percentile,
+)
+from main.management.commands.load_test import HttpClient, summarize
+from main.management.commands.startup_profile import (
+    middleware_overhead,
+    parse_importtime,
+)
+from main.middleware import (
+    CompressionMiddleware,
+    brotli,
+    compress_exempt,
+    negotiate_encoding,
+)
+from main.permissions import IsAuthenticated
+from main.pubsub import RESET, LocalPubSub
+from main.renderers import columnar, msgpack
+from main.routers import REPLICA_ALIAS, ReadReplicaRouter, replica_reads
+from main.utils.filters import FilterSchema, compile_filter_schema
+from main.utils.generic_api import planner_row_estimate
+
+
+class DatabaseConfigTest(SimpleTestCase):
+    def test_sqlite_default(self):
+        """Test SQLite is used with persistent connections when nothing is set"""
+        databases = database_config({}, Path("/srv/app"))
+        self.assertEqual(list(databases), ["default"])
+        self.assertEqual(databases["default"]["ENGINE"], "django.db.backends.sqlite3")
+        self.assertEqual(databases["default"]["NAME"], Path("/srv/app/db.sqlite3"))
+        self.assertEqual(databases["default"]["CONN_MAX_AGE"], 60)
+        self.assertTrue(databases["default"]["CONN_HEALTH_CHECKS"])
+
+    def test_sqlite_replica(self):
+        """Test two SQLite files can stand in for primary and replica"""
+        databases = database_config(
+            {"DB_NAME": "primary.sqlite3", "DB_REPLICA_NAME": "replica.sqlite3"},
+            Path("/srv/app"),
+        )
+        self.assertEqual(databases["default"]["NAME"], "primary.sqlite3")
+        self.assertEqual(databases[REPLICA_ALIAS]["NAME"], "replica.sqlite3")
+        self.assertEqual(databases[REPLICA_ALIAS]["TEST"], {"MIRROR": "default"})
+
+    def test_postgres_pool(self):
+        """Test the psycopg pool disables Django's persistent connections"""
+        databases = database_config(
+            {
+                "DB_ENGINE": "postgresql",
+                "DB_NAME": "budgethink",
+                "DB_POOL": "True",
+                "DB_POOL_MAX_SIZE": "20",
+                "DB_CONN_MAX_AGE": "600",
+                "DB_REPLICA_HOST": "replica.internal",
+            },
+            Path("/srv/app"),
+        )
+        default = databases["default"]
+        self.assertEqual(default["ENGINE"], "django.db.backends.postgresql")
+        self.assertEqual(default["CONN_MAX_AGE"], 0)
+        self.assertEqual(default["OPTIONS"]["pool"]["max_size"], 20)
+        self.assertEqual(databases[REPLICA_ALIAS]["HOST"], "replica.internal")
+
+    def test_postgres_persistent_connections(self):
+        """Test CONN_MAX_AGE is honored when pooling is off"""
+        databases = database_config(
+            {"DB_ENGINE": "postgresql", "DB_CONN_MAX_AGE": "600"}, Path("/srv/app")
+        )
+        self.assertEqual(databases["default"]["CONN_MAX_AGE"], 600)
+        self.assertNotIn("pool", databases["default"]["OPTIONS"])
+
+    def test_shards(self):
+        """Test DB_SHARDS adds numbered shard aliases on either engine"""
+        databases = database_config(
+            {"DB_SHARDS": "a.sqlite3, b.sqlite3"}, Path("/srv/app")
+        )
+        self.assertEqual(list(databases), ["default", "shard_1", "shard_2"])
+        self.assertEqual(databases["shard_2"]["NAME"], "b.sqlite3")
+        databases = database_config(
+            {"DB_ENGINE": "postgresql", "DB_SHARDS": "db1.internal,db2.internal:6432"},
+            Path("/srv/app"),
+        )
+        self.assertEqual(
+            [
+                (databases[alias]["HOST"], databases[alias]["PORT"])
+                for alias in ("shard_1", "shard_2")
+            ],
+            [("db1.internal", "5432"), ("db2.internal", "6432")],
+        )
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            database_config({"DB_ENGINE": "oracle"}, Path("/srv/app"))
+
+
+class ReadReplicaRouterTest(SimpleTestCase):
+    def setUp(self):
+        self.router = ReadReplicaRouter()
+        replica = dict(settings.DATABASES["default"], TEST={"MIRROR": "default"})
+        patcher = mock.patch.dict(settings.DATABASES, {REPLICA_ALIAS: replica})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_reads_outside_replica_block(self):
+        """Test reads default to the primary"""
+        self.assertIsNone(self.router.db_for_read(Transaction))
+
+    def test_reads_inside_replica_block(self):
+        """Test reads inside replica_reads() go to the replica"""
+        with replica_reads():
+            self.assertEqual(self.router.db_for_read(Transaction), REPLICA_ALIAS)
+        self.assertIsNone(self.router.db_for_read(Transaction))
+
+    def test_writes_go_to_primary(self):
+        """Test writes always go to the primary, even for replica-loaded objects"""
+        with replica_reads():
+            self.assertEqual(self.router.db_for_write(Transaction), DEFAULT_DB_ALIAS)
+
+    def test_replica_not_migrated(self):
+        self.assertTrue(self.router.allow_migrate(DEFAULT_DB_ALIAS, "budgethink"))
+        self.assertFalse(self.router.allow_migrate(REPLICA_ALIAS, "budgethink"))
+
+    def test_missing_replica(self):
+        """Test the router is a no-op when no replica is configured"""
+        del settings.DATABASES[REPLICA_ALIAS]
+        with replica_reads():
+            self.assertIsNone(self.router.db_for_read(Transaction))
+
+
+class SQLiteTuningTest(SimpleTestCase):
+    def test_profile_disabled_by_default(self):
+        self.assertEqual(sqlite_pragmas({}), {})
+        self.assertNotIn("transaction_mode", sqlite_config("db.sqlite3", {})["OPTIONS"])
+
+    def test_writes_begin_immediate(self):
+        config = sqlite_config("db.sqlite3", {"DB_SQLITE_TUNING": "True"})
+        self.assertEqual(config["OPTIONS"]["transaction_mode"], "IMMEDIATE")
+
+    def test_pragmas_applied_on_connect(self):
+        """Test the connection_created signal applies the tuned PRAGMAs"""
+        env = {"DB_SQLITE_TUNING": "True", "DB_SQLITE_BUSY_TIMEOUT": "1234"}
+        with tempfile.TemporaryDirectory() as directory:
+            settings_dict = dict(connections["default"].settings_dict)
+            settings_dict.update(
+                sqlite_config(os.path.join(directory, "t.sqlite3"), env)
+            )
+            connection = DatabaseWrapper(settings_dict, "tuning_test")
+            with override_settings(SQLITE_PRAGMAS=sqlite_pragmas(env)):
+                connection.ensure_connection()
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute("PRAGMA journal_mode")
+                    self.assertEqual(cursor.fetchone()[0], "wal")
+                    cursor.execute("PRAGMA synchronous")
+                    self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+                    cursor.execute("PRAGMA temp_store")
+                    self.assertEqual(cursor.fetchone()[0], 2)  # MEMORY
+                    cursor.execute("PRAGMA busy_timeout")
+                    self.assertEqual(cursor.fetchone()[0], 1234)
+            finally:
+                connection.close()
+
+
+class BenchApiTest(SimpleTestCase):
+    def results(self, p95_ms, queries):
+        return {
+            "results": {
+                "small": {
+                    "GET transaction-list": {"p95_ms": p95_ms, "queries": queries}
+                }
+            }
+        }
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 95), 95)
+        self.assertEqual(percentile([7], 99), 7)
+
+    def test_latency_regression(self):
+        """Test p95 growth beyond the threshold and noise floor is reported"""
+        baseline = self.results(10.0, 4)
+        self.assertEqual(
+            compare_to_baseline(self.results(12.0, 4), baseline, 0.25, 1.0), []
+        )
+        self.assertEqual(
+            len(compare_to_baseline(self.results(13.0, 4), baseline, 0.25, 1.0)), 1
+        )
+        self.assertEqual(
+            compare_to_baseline(self.results(13.0, 4), baseline, 0.25, 5.0), []
+        )
+
+    def test_query_count_regression(self):
+        """Test any extra query is a regression"""
+        regressions = compare_to_baseline(
+            self.results(10.0, 5), self.results(10.0, 4), 0.25, 1.0
+        )
+        self.assertEqual(len(regressions), 1)
+        self.assertIn("5 queries", regressions[0])
+
+    def test_cached_gets_are_reported_apart(self):
+        self.assertEqual(endpoint_label("get", "sync", {}), "GET sync")
+        self.assertEqual(
+            endpoint_label("get", "sync", {}, cached=True), "GET sync (cached)"
+        )
+
+    def test_new_endpoint_is_not_a_regression(self):
+        self.assertEqual(
+            compare_to_baseline(self.results(10.0, 4), {"results": {}}, 0.25, 1.0), []
+        )
+
+
+class LoadTestTest(SimpleTestCase):
+    def test_summarize(self):
+        results = [("list_page", 0.010, 200)] * 8 + [
+            ("create", 0.050, 500),
+            ("create", 1.0, None),
+        ]
+        summary = summarize(results, elapsed=2.0)
+        self.assertEqual((summary["requests"], summary["throughput"]), (10, 5.0))
+        self.assertEqual(summary["p50_ms"], 10.0)
+        self.assertEqual(summary["error_rate"], 0.2)
+        self.assertEqual(summary["errors"], {"500": 1, "connection": 1})
+
+    def test_http_client(self):
+        """Test keep-alive requests, with chunked and gzipped responses"""
+        body = gzip.compress(b'{"ok": true}')
+
+        async def handle(reader, writer):
+            for response in (
+                b'HTTP/1.1 201 Created\r\nContent-Length: 9\r\n\r\n{"id": 1}',
+                b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\nContent-Encoding: gzip\r\n\r\n"
+                + f"{len(body):x}\r\n".encode()
+                + body
+                + b"\r\n0\r\n\r\n",
+            ):
+                await reader.readuntil(b"\r\n\r\n")
+                writer.write(response)
+                await writer.drain()
+            writer.close()
+
+        async def run():
+            server = await asyncio.start_server(handle, "127.0.0.1", 0)
+            client = HttpClient(server.sockets[0].getsockname()[1])
+            try:
+                return [
+                    await client.request("GET", "/"),
+                    await client.request("GET", "/"),
+                ]
+            finally:
+                await client.close()
+                server.close()
+
+        self.assertEqual(asyncio.run(run()), [(201, {"id": 1}), (200, {"ok": True})])
+
+
+class RequestMetricsMiddlewareTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        Category.objects.create(name="Food", user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    @override_settings(REQUEST_METRICS={"LOG_REQUESTS": True})
+    def test_server_timing_header(self):
+        """Test the DB, cache, serializer and render phases are reported"""
+        with self.assertLogs("main.requests", "INFO") as logs:
+            response = self.client.get(reverse("category-list"))
+        self.assertEqual(response.status_code, 200)
+        timing = response["Server-Timing"]
+        for metric in (
+            "db;dur=",
+            "cache;desc=",
+            "ser;dur=",
+            "render;dur=",
+            "total;dur=",
+        ):
+            self.assertIn(metric, timing)
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record["path"], reverse("category-list"))
+        self.assertEqual(record["status"], 200)
+        self.assertGreater(record["db_queries"], 0)
+        self.assertNotIn("slow_queries", record)
+
+    def test_cache_hits_and_misses(self):
+        """Test GenericView's cache lookups are counted"""
+        with mock.patch.object(CategoryView, "cache_key_prefix", "metrics_test"):
+            first = self.client.get(reverse("category-list"))
+            second = self.client.get(reverse("category-list"))
+        self.assertIn('cache;desc="0 hits, 1 misses"', first["Server-Timing"])
+        self.assertIn('cache;desc="1 hits, 0 misses"', second["Server-Timing"])
+
+    @override_settings(REQUEST_METRICS={"SLOW_REQUEST_MS": 0, "TOP_SQL": 2})
+    def test_slow_requests_sample_top_sql(self):
+        """Test slow requests are logged with their slowest SQL statements"""
+        with self.assertLogs("main.requests", "WARNING") as logs:
+            self.client.get(reverse("category-list"))
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(len(record["slow_queries"]), 2)
+        durations = [query["ms"] for query in record["slow_queries"]]
+        self.assertEqual(durations, sorted(durations, reverse=True))
+        self.assertIn("SELECT", record["slow_queries"][0]["sql"])
+
+    def test_fast_requests_not_logged_by_default(self):
+        with self.assertNoLogs("main.requests"):
+            response = self.client.get(reverse("category-list"))
+        self.assertIn("Server-Timing", response)
+
+    @override_settings(REQUEST_METRICS={"ENABLED": False})
+    def test_disabled(self):
+        with self.assertNoLogs("main.requests"):
+            response = self.client.get(reverse("category-list"))
+        self.assertNotIn("Server-Timing", response)
+
+
+class GenericViewCountModeTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        self.category = Category.objects.create(name="Food", user=self.user)
+        Transaction.objects.bulk_create(
+            Transaction(
+                user=self.user,
+                category=self.category,
+                title=f"Transaction {index}",
+                amount="10.00",
+                transaction_date=date(2024, 1, 1),
+            )
+            for index in range(25)
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse("transaction-list")
+
+    def get(self, params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        count_queries = [q for q in queries.captured_queries if "COUNT(" in q["sql"]]
+        return response.json(), len(count_queries)
+
+    def test_exact_is_default(self):
+        data, count_queries = self.get({})
+        self.assertEqual(data["total_count"], 25)
+        self.assertEqual(data["num_pages"], 2)
+        self.assertTrue(data["has_next"])
+        self.assertEqual(count_queries, 1)
+
+    def test_none_skips_count(self):
+        """Test count=none pages with has_next and never runs COUNT(*)"""
+        data, count_queries = self.get({"count": "none"})
+        self.assertEqual(len(data["objects"]), 20)
+        self.assertTrue(data["has_next"])
+        self.assertNotIn("total_count", data)
+        self.assertEqual(count_queries, 0)
+
+        data, _ = self.get({"count": "none", "page": 2})
+        self.assertEqual(len(data["objects"]), 5)
+        self.assertFalse(data["has_next"])
+
+    def test_estimate_is_cached_and_refreshed_on_write(self):
+        """Test count=estimate reuses a cached count until the user writes"""
+        data, count_queries = self.get({"count": "estimate", "type": "expense"})
+        self.assertEqual((data["total_count"], count_queries), (25, 1))
+
+        data, count_queries = self.get(
+            {"count": "estimate", "type": "expense", "page": 2}
+        )
+        self.assertEqual((data["total_count"], count_queries), (25, 0))
+
+        response = self.client.post(
+            self.url,
+            {
+                "user_id": self.user.pk,
+                "category_id": self.category.pk,
+                "title": "New",
+                "amount": "5.00",
+                "type": "expense",
+                "transaction_date": "2024-01-02",
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+
+        data, count_queries = self.get({"count": "estimate", "type": "expense"})
+        self.assertEqual((data["total_count"], count_queries), (26, 1))
+
+    def test_estimate_is_per_filter_set(self):
+        self.get({"count": "estimate"})
+        data, count_queries = self.get({"count": "estimate", "type": "income"})
+        self.assertEqual((data["total_count"], count_queries), (0, 1))
+
+    def test_planner_estimate(self):
+        queryset = mock.Mock()
+        queryset.explain.return_value = (
+            '[{"Plan": {"Node Type": "Seq Scan", "Plan Rows": 1234}}]'
+        )
+        self.assertEqual(planner_row_estimate(queryset), 1234)
+        queryset.explain.assert_called_once_with(format="json")
+
+    def test_invalid_count_mode(self):
+        response = self.client.get(self.url, {"count": "sometimes"})
+        self.assertEqual(response.status_code, 400)
+
+
+class FilterSchemaTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        self.food = Category.objects.create(name="Food", user=self.user)
+        self.rent = Category.objects.create(name="Rent", user=self.user)
+        for category, day in [(self.food, 1), (self.food, 15), (self.rent, 28)]:
+            Transaction.objects.create(
+                user=self.user,
+                category=category,
+                title="Transaction",
+                amount="10.00",
+                transaction_date=date(2024, 1, day),
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse("transaction-list")
+
+    def get(self, params):
+        return self.client.get(self.url, params)
+
+    def test_values_are_coerced(self):
+        schema = compile_filter_schema(TransactionView)
+        filters, excludes = schema.parse(
+            {
+                "transaction_date__gte": "2024-01-10",
+                "category__in": f"{self.food.pk},{self.rent.pk}",
+                "exclude__type": "income",
+                "page": "2",
+            }
+        )
+        self.assertEqual(
+            filters,
+            {
+                "transaction_date__gte": date(2024, 1, 10),
+                "category__in": [self.food.pk, self.rent.pk],
+                "page": 2,
+            },
+        )
+        self.assertEqual(excludes, {"type": "income"})
+
+    def test_schema_is_compiled_once(self):
+        self.assertIs(
+            compile_filter_schema(TransactionView),
+            compile_filter_schema(TransactionView),
+        )
+
+    def test_filters_through_api(self):
+        response = self.get(
+            {
+                "transaction_date__gte": "2024-01-10",
+                "category": self.food.pk,
+                "search": "trans",
+            }
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["total_count"], 1)
+
+    def test_rejected_requests(self):
+        """Test undeclared fields, lookups, orderings and bad values are rejected"""
+        for params in [
+            {"category__user__email__icontains": "test"},
+            {"title__icontains": "rent"},
+            {"transaction_date__year": "2024"},
+            {"order_by": "category__user__password"},
+            {"transaction_date__gte": "yesterday"},
+            {"category__in": ",".join(["1"] * 101)},
+            {"page": "0"},
+        ]:
+            with self.subTest(params=params):
+                self.assertEqual(self.get(params).status_code, 400)
+
+    def test_unindexed_declarations_are_rejected(self):
+        """Test declaring lookups that can't use an index fails at compile time"""
+        for filter_fields in [
+            {"description": ["exact"]},
+            {"type": ["icontains"]},
+            {"category__user__email": ["exact"]},
+        ]:
+            with self.subTest(filter_fields=filter_fields):
+                with self.assertRaises(ImproperlyConfigured):
+                    FilterSchema(Transaction, filter_fields, scope=["user"])
+
+    def test_unindexed_orderings_are_rejected(self):
+        for ordering_fields in [["description"], ["category__name"]]:
+            with self.subTest(ordering_fields=ordering_fields):
+                with self.assertRaises(ImproperlyConfigured):
+                    FilterSchema(Transaction, {}, ordering_fields, scope=["user"])
+        ordering = FilterSchema(Transaction, {}, scope=["user"]).ordering
+        self.assertIn("transaction_date", ordering)
+        self.assertNotIn("description", ordering)
+
+    def test_scope_makes_composite_index_columns_usable(self):
+        self.assertRaises(
+            ImproperlyConfigured, FilterSchema, Transaction, {"type": ["exact"]}
+        )
+        FilterSchema(Transaction, {"type": ["exact"]}, scope=["user"])
+
+
+class CentsFieldTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        for amount in ["10.07", "0.01", "19.99"]:
+            Transaction.objects.create(
+                user=self.user,
+                title="Transaction",
+                amount=amount,
+                transaction_date=date(2024, 1, 1),
+            )
+
+    def test_exposed_as_decimal(self):
+        """Test values, aggregates and lookups all work in currency units"""
+        amounts = sorted(Transaction.objects.values_list("amount", flat=True))
+        self.assertEqual(amounts, [Decimal("0.01"), Decimal("10.07"), Decimal("19.99")])
+        self.assertEqual(
+            Transaction.objects.aggregate(total=Sum("amount"))["total"],
+            Decimal("30.07"),
+        )
+        self.assertEqual(Transaction.objects.filter(amount__gte="10.07").count(), 2)
+
+    def test_prep_value_rounds_to_cents(self):
+        field = CentsField(storage="cents")
+        self.assertEqual(field.get_prep_value("1.005"), 101)
+        self.assertEqual(field.get_prep_value(Decimal("-2.5")), -250)
+        self.assertIsNone(field.get_prep_value(None))
+        self.assertEqual(
+            CentsField(storage="decimal").get_prep_value("1.005"), Decimal("1.01")
+        )
+
+    def test_api_keeps_decimal_strings(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get(reverse("transaction-list"), {"order_by": "amount"})
+        amounts = [row["amount"] for row in response.json()["objects"]]
+        self.assertEqual(amounts, ["0.01", "10.07", "19.99"])
+
+
+@override_settings(AMOUNT_STORAGE="decimal")
+class AmountStorageTest(TransactionTestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.storage = settings.AMOUNT_STORAGE  # before the override applies
+        super().setUpClass()
+
+    def setUp(self):
+        call_command("convert_amount_storage", stdout=StringIO())
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        for amount in ["10.07", "0.01", "19.99"]:
+            Transaction.objects.create(
+                user=self.user,
+                title="Transaction",
+                amount=amount,
+                transaction_date=date(2024, 1, 1),
+            )
+
+    def tearDown(self):
+        # Back to the storage the rest of the suite runs with
+        call_command("convert_amount_storage", to=self.storage, stdout=StringIO())
+
+    def stored_amounts(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT amount FROM budgethink_transaction ORDER BY amount")
+            return [row[0] for row in cursor.fetchall()]
+
+    def test_convert_to_cents_and_back(self):
+        self.assertEqual(
+            [Decimal(str(amount)) for amount in self.stored_amounts()],
+            [Decimal("0.01"), Decimal("10.07"), Decimal("19.99")],
+        )
+
+        with override_settings(AMOUNT_STORAGE="cents"):
+            call_command("convert_amount_storage", stdout=StringIO())
+            self.assertEqual(self.stored_amounts(), [1, 1007, 1999])
+            self.assertEqual(
+                Transaction.objects.aggregate(total=Sum("amount"))["total"],
+                Decimal("30.07"),
+            )
+            Transaction.objects.create(
+                user=self.user,
+                title="Transaction",
+                amount="2.50",
+                transaction_date=date(2024, 1, 2),
+            )
+            self.assertEqual(self.stored_amounts(), [1, 250, 1007, 1999])
+
+        call_command("convert_amount_storage", stdout=StringIO())
+        amounts = sorted(Transaction.objects.values_list("amount", flat=True))
+        self.assertEqual(
+            amounts,
+            [Decimal("0.01"), Decimal("2.50"), Decimal("10.07"), Decimal("19.99")],
+        )
+
+
+class LocalPubSubTest(SimpleTestCase):
+    async def test_delivers_to_channel_subscribers(self):
+        pubsub = LocalPubSub()
+        subscription = await pubsub.subscribe("dashboard:1")
+        self.assertTrue(pubsub.has_subscribers("dashboard:1"))
+        await sync_to_async(pubsub.publish)("dashboard:1", {"changes": []})
+        pubsub.publish("dashboard:2", {"changes": ["other user"]})
+        self.assertEqual(await subscription.get(), {"changes": []})
+        self.assertTrue(subscription.queue.empty())
+
+        await subscription.close()
+        self.assertFalse(pubsub.has_subscribers("dashboard:1"))
+
+    async def test_overflow_resets(self):
+        pubsub = LocalPubSub(max_pending=2)
+        subscription = await pubsub.subscribe("dashboard:1")
+        for index in range(3):
+            pubsub.publish("dashboard:1", {"changes": [index]})
+        await asyncio.sleep(0)  # let the loop run the queued deliveries
+        self.assertEqual(await subscription.get(), RESET)
+        self.assertTrue(subscription.queue.empty())
+
+
+class BatchEndpointTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        self.category = Category.objects.create(name="Food", user=self.user)
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}"
+        )
+        self.url = reverse("batch")
+
+    def transaction_operation(self, amount="12.50"):
+        return {
+            "method": "POST",
+            "path": "budgethink/transactions/",
+            "body": {
+                "user_id": self.user.pk,
+                "category_id": self.category.pk,
+                "title": "Lunch",
+                "type": "expense",
+                "amount": amount,
+                "transaction_date": date.today().isoformat(),
+            },
+        }
+
+    def post(self, operations, atomic=False):
+        response = self.client.post(
+            self.url, {"atomic": atomic, "operations": operations}, format="json"
+        )
+        return response
+
+    def test_runs_operations_in_order(self):
+        authenticate = JWTAuthentication.authenticate
+        with mock.patch.object(
+            JWTAuthentication, "authenticate", autospec=True, side_effect=authenticate
+        ) as authentications:
+            response = self.post(
+                [
+                    self.transaction_operation(),
+                    {
+                        "method": "GET",
+                        "path": "/api/v1/budgethink/transactions/dashboard/",
+                    },
+                    {
+                        "method": "GET",
+                        "path": "budgethink/transactions/",
+                        "params": {"type": "expense"},
+                    },
+                ]
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(authentications.call_count, 1)
+        results = response.json()["results"]
+        self.assertEqual([result["status"] for result in results], [201, 200, 200])
+        self.assertEqual(results[1]["body"]["expense"], 12.5)
+        self.assertEqual(results[2]["body"]["total_count"], 1)
+
+    def test_atomic_failure_rolls_back(self):
+        response = self.post(
+            [
+                self.transaction_operation(),
+                {"method": "DELETE", "path": "budgethink/budgets/999/"},
+                self.transaction_operation(),
+            ],
+            atomic=True,
+        )
+        data = response.json()
+        self.assertTrue(data["rolled_back"])
+        self.assertEqual(
+            [result["status"] for result in data["results"]], [201, 404, 424]
+        )
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_atomic_failure_of_last_operation(self):
+        response = self.post(
+            [self.transaction_operation(), self.transaction_operation("0")], atomic=True
+        )
+        data = response.json()
+        self.assertTrue(data["rolled_back"])
+        self.assertEqual([result["status"] for result in data["results"]], [201, 400])
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_reads_see_earlier_writes_through_warm_caches(self):
+        list_url = reverse("transaction-list")
+        dashboard_url = reverse("transaction-dashboard")
+        self.assertEqual(self.client.get(list_url).json()["total_count"], 0)
+        self.assertEqual(self.client.get(dashboard_url).json()["expense"], 0)
+
+        results = self.post(
+            [
+                self.transaction_operation(),
+                {"method": "GET", "path": "budgethink/transactions/"},
+                self.transaction_operation("7.50"),
+                {"method": "GET", "path": "budgethink/transactions/dashboard/"},
+            ]
+        ).json()["results"]
+        self.assertEqual(results[1]["body"]["total_count"], 1)
+        self.assertEqual(results[3]["body"]["expense"], 20)
+
+    def test_rollback_drops_what_reads_cached(self):
+        list_url = reverse("transaction-list")
+        self.assertEqual(self.client.get(list_url).json()["total_count"], 0)
+        results = self.post(
+            [
+                self.transaction_operation(),
+                {"method": "GET", "path": "budgethink/transactions/"},
+                {"method": "DELETE", "path": "budgethink/budgets/999/"},
+            ],
+            atomic=True,
+        ).json()["results"]
+        self.assertEqual(results[1]["body"]["total_count"], 1)
+        self.assertEqual(self.client.get(list_url).json()["total_count"], 0)
+
+    def test_non_atomic_keeps_going(self):
+        response = self.post(
+            [self.transaction_operation(), self.transaction_operation("0")]
+        )
+        data = response.json()
+        self.assertFalse(data["rolled_back"])
+        self.assertEqual([result["status"] for result in data["results"]], [201, 400])
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_invalidates_caches_once(self):
+        scope = user_cache_scope(self.user.pk)
+        with mock.patch.object(TwoTierCache, "bump") as bump:
+            self.post([self.transaction_operation() for _ in range(3)])
+        bump.assert_called_once_with(scope)
+
+        # Once per run of writes: before the read, then at the end
+        with mock.patch.object(TwoTierCache, "bump") as bump:
+            self.post(
+                [
+                    self.transaction_operation(),
+                    self.transaction_operation(),
+                    {"method": "GET", "path": "budgethink/transactions/"},
+                    self.transaction_operation(),
+                ]
+            )
+        self.assertEqual(bump.call_args_list, [mock.call(scope)] * 2)
+
+    def test_rejects_bad_operations(self):
+        for operations in (
+            [],
+            [{"method": "GET", "path": "budgethink/nope/"}],
+            [{"method": "POST", "path": "batch/", "body": {"operations": []}}],
+            [{"method": "TRACE", "path": "budgethink/transactions/"}],
+        ):
+            self.assertEqual(self.post(operations).status_code, 400)
+
+
+class CompressionMiddlewareTest(SimpleTestCase):
+    body = json.dumps([{"title": "Lunch", "category": {"name": "Food"}}] * 50).encode()
+
+    def respond(self, response, accept_encoding="gzip, deflate, br", **config):
+        request = RequestFactory().get("/", HTTP_ACCEPT_ENCODING=accept_encoding)
+        with override_settings(COMPRESSION=config):
+            return CompressionMiddleware(lambda request: response)(request)
+
+    def test_negotiation(self):
+        encodings = ["br", "gzip"]
+        self.assertEqual(negotiate_encoding("gzip, deflate, br", encodings), "br")
+        self.assertEqual(negotiate_encoding("gzip;q=1.0, br;q=0.5", encodings), "gzip")
+        self.assertEqual(negotiate_encoding("br;q=0, *", encodings), "gzip")
+        self.assertIsNone(negotiate_encoding("identity", encodings))
+        self.assertIsNone(negotiate_encoding("", encodings))
+
+    def test_compresses_brotli_and_gzip(self):
+        response = self.respond(
+            HttpResponse(self.body, content_type="application/json")
+        )
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertEqual(brotli.decompress(response.content), self.body)
+        self.assertEqual(response["Content-Length"], str(len(response.content)))
+        self.assertIn("Accept-Encoding", response["Vary"])
+
+        response = self.respond(HttpResponse(self.body), "gzip", GZIP_LEVEL=1)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(response.content), self.body)
+
+    def test_skips_small_and_unaccepted_bodies(self):
+        response = self.respond(HttpResponse(b'{"ok": true}'))
+        self.assertFalse(response.has_header("Content-Encoding"))
+        response = self.respond(HttpResponse(self.body), "identity")
+        self.assertEqual(response.content, self.body)
+        self.assertIn("Accept-Encoding", response["Vary"])
+
+    def test_weakens_etag(self):
+        original = HttpResponse(self.body)
+        original["ETag"] = '"abc"'
+        self.assertEqual(self.respond(original)["ETag"], 'W/"abc"')
+
+    def test_streams_flush_every_chunk(self):
+        chunks = [self.body[:300], self.body[300:]]
+        response = self.respond(StreamingHttpResponse(iter(chunks)), "gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        output = [decompressor.decompress(part) for part in response.streaming_content]
+        # Each chunk is readable as soon as it arrives
+        self.assertEqual(output[:2], chunks)
+        self.assertEqual(b"".join(output), self.body)
+
+    def test_skips_exempt_views(self):
+        view = compress_exempt(lambda request: HttpResponse(self.body))
+        response = self.respond(view(None))
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(response.content, self.body)
+
+    def test_skips_event_streams(self):
+        response = self.respond(
+            StreamingHttpResponse(
+                iter([b"event: snapshot\n\n"]), content_type="text/event-stream"
+            )
+        )
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+
+class AuthCompressionTest(TestCase):
+    def test_tokens_are_sent_uncompressed(self):
+        User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        response = self.client.post(
+            reverse("login"),
+            {"username": "testuser", "password": "testpass123"},
+            HTTP_ACCEPT_ENCODING="gzip, br",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header("Content-Encoding"))
+        response = self.client.post(
+            reverse("token_refresh"),
+            {"refresh": response.json()["refresh"]},
+            HTTP_ACCEPT_ENCODING="gzip, br",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+
+class StartupProfileTest(SimpleTestCase):
+    def test_parse_importtime(self):
+        stderr = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       300 |        300 |   main.routers\n"
+            "import time:      1000 |       1300 | main.db\n"
+            "import time:        20 |         20 | main.db\n"
+        )
+        self.assertEqual(
+            parse_importtime(stderr),
+            [("main.routers", 0.0003, 0.0003), ("main.db", 0.001, 0.0013)],
+        )
+
+    def test_middleware_overhead_without_sessions(self):
+        paths = [
+            "django.middleware.common.CommonMiddleware",
+            "account.middleware.JWTAuthMiddleware",
+        ]
+        overhead, chain = middleware_overhead(paths, iterations=5)
+        self.assertEqual(list(overhead), paths)
+        self.assertGreaterEqual(chain, 0)
+
+    def test_jwt_middleware_without_sessions(self):
+        request = RequestFactory().get("/")
+        JWTAuthMiddleware(lambda request: HttpResponse())(request)
+        self.assertTrue(request.user.is_anonymous)
+
+    @override_settings(DISABLE_AUTH=True)
+    def test_disable_auth_is_a_setting(self):
+        request = RequestFactory().get("/")
+        request.user = None
+        self.assertTrue(IsAuthenticated().has_permission(request, None))
+
+
+class TwoTierCacheTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def make_cache(self, **kwargs):
+        options = {
+            "l1_maxsize": 8,
+            "l1_ttl": 60,
+            "version_check_interval": 1.0,
+            **kwargs,
+        }
+        return TwoTierCache("default", **options)
+
+    def test_l1_hit_skips_l2(self):
+        two_tier = self.make_cache()
+        two_tier.set("key", {"a": 1}, "user:1", 60)
+        with mock.patch.object(
+            cache, "get", side_effect=AssertionError
+        ), mock.patch.object(cache, "get_many", side_effect=AssertionError):
+            self.assertEqual(two_tier.get("key", "user:1"), {"a": 1})
+        self.assertEqual(two_tier.stats()["l1_hits"], 1)
+
+    def test_shared_l2_check(self):
+        with override_settings(DEBUG=False):
+            self.assertEqual(
+                [warning.id for warning in check_shared_l2()], ["main.W001"]
+            )
+            with self.assertLogs("main.cache", "WARNING"):
+                log_unshared_l2()
+        with override_settings(DEBUG=True):
+            self.assertEqual(check_shared_l2(), [])
+        with tempfile.TemporaryDirectory() as directory, override_settings(
+            DEBUG=False,
+            CACHES={
+                "default": {
+                    "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                    "LOCATION": directory,
+                },
+            },
+        ):
+            self.assertEqual(check_shared_l2(), [])
+
+    def test_bump_in_another_process(self):
+        # Two caches sharing L2 stand in for two workers
+        writer, reader = self.make_cache(), self.make_cache()
+        writer.set("key", "old", "user:1", 60)
+        self.assertEqual(reader.get("key", "user:1"), "old")
+        writer.bump("user:1")
+        self.assertIsNone(writer.get("key", "user:1"))
+        # The reader trusts its copy of the version for VERSION_CHECK_INTERVAL
+        self.assertEqual(reader.get("key", "user:1"), "old")
+        later = time.monotonic() + 2
+        with mock.patch("main.cache.time.monotonic", return_value=later):
+            self.assertIsNone(reader.get("key", "user:1"))
+        self.assertEqual(reader.stats()["misses"], 1)
+
+    def test_other_scopes_survive_a_bump(self):
+        two_tier = self.make_cache(version_check_interval=0)
+        two_tier.set("one", 1, "user:1", 60)
+        two_tier.set("two", 2, "user:2", 60)
+        two_tier.bump("user:1")
+        self.assertIsNone(two_tier.get("one", "user:1"))
+        self.assertEqual(two_tier.get("two", "user:2"), 2)
+
+    def test_evictions_are_counted(self):
+        two_tier = self.make_cache(l1_maxsize=2)
+        for index in range(3):
+            two_tier.set(f"key{index}", index, "user:1", 60)
+        stats = two_tier.stats()
+        self.assertEqual((stats["l1_size"], stats["l1_evictions"]), (2, 1))
+        # Evicted from L1 only
+        self.assertEqual(two_tier.get("key0", "user:1"), 0)
+        self.assertEqual(two_tier.stats()["l2_hits"], 1)
+
+
+class StampedeProtectionTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.two_tier = TwoTierCache("default", 8, 60, 1.0, lock_wait=1.0)
+        self.computes = 0
+
+    def compute(self, value="new"):
+        self.computes += 1
+        return value
+
+    def test_expired_entry_is_served_while_locked(self):
+        self.two_tier.set("key", "old", "user:1", -1)  # already expired
+        cache.add("cache_lock:key", True)  # another worker is recomputing
+        value = self.two_tier.get_or_compute("key", "user:1", self.compute, 60)
+        self.assertEqual((value, self.computes), ("old", 0))
+        self.assertEqual(self.two_tier.stats()["stale_hits"], 1)
+
+    def test_invalidated_entry_waits_for_the_recomputation(self):
+        self.two_tier.set("key", "old", "user:1", 60)
+        self.two_tier.bump("user:1")
+        cache.add("cache_lock:key", True)
+        other = TwoTierCache("default", 8, 60, 1.0)
+        timer = threading.Timer(0.1, lambda: other.set("key", "new", "user:1", 60))
+        timer.start()
+        value = self.two_tier.get_or_compute("key", "user:1", self.compute, 60)
+        timer.join()
+        self.assertEqual((value, self.computes), ("new", 0))
+
+    def test_early_expiration(self):
+        self.two_tier.set("key", "old", "user:1", 60, delta=10.0)
+        # random() near 1: 10 s * -log(1 - random()) is past the expiry
+        with mock.patch("main.cache.random.random", return_value=0.9999999):
+            self.assertEqual(
+                self.two_tier.get_or_compute("key", "user:1", self.compute, 60), "new"
+            )
+        with mock.patch("main.cache.random.random", return_value=0.9999999):
+            self.assertEqual(
+                self.two_tier.get_or_compute("key", "user:1", self.compute, 60, beta=0),
+                "new",
+            )
+        self.assertEqual(self.computes, 1)
+        self.assertEqual(self.two_tier.stats()["early_refreshes"], 1)
+
+
+class ConcurrentMissesTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        Transaction.objects.create(
+            user=self.user,
+            title="Salary",
+            type="income",
+            amount="100.00",
+            transaction_date=date.today(),
+        )
+
+    def test_parallel_misses_compute_once(self):
+        from budgethink import views
+
+        workers = 8
+        barrier = threading.Barrier(workers)
+        computations = []
+
+        def slow_dashboard_totals(*args):
+            computations.append(True)
+            time.sleep(0.2)  # long enough for every request to miss
+            return dashboard_totals(*args)
+
+        def request(results):
+            client = APIClient()
+            client.force_authenticate(self.user)
+            barrier.wait()
+            try:
+                results.append(client.get(reverse("transaction-dashboard")))
+            finally:
+                connection.close()
+
+        results = []
+        threads = [
+            threading.Thread(target=request, args=(results,)) for _ in range(workers)
+        ]
+        with mock.patch.object(views, "dashboard_totals", slow_dashboard_totals):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(len(computations), 1)
+        self.assertEqual(
+            [response.status_code for response in results], [200] * workers
+        )
+        self.assertEqual(
+            {response.data["income"] for response in results}, {Decimal("100.00")}
+        )
+
+
+class GenericViewCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        self.other = User.objects.create_user(
+            username="other", email="other@example.com", password="testpass123"
+        )
+        Category.objects.create(name="Food", user=self.user)
+        self.client = APIClient()
+        self.url = reverse("category-list")
+
+    def names(self, user):
+        self.client.force_authenticate(user)
+        response = self.client.get(self.url)
+        return [category["name"] for category in response.data["objects"]]
+
+    def test_cache_is_per_user(self):
+        self.assertEqual(self.names(self.user), ["Food"])
+        self.assertEqual(self.names(self.other), [])
+
+    def test_writes_outside_the_api_invalidate(self):
+        self.assertEqual(self.names(self.user), ["Food"])
+        Category.objects.create(name="Rent", user=self.user)
+        self.assertEqual(sorted(self.names(self.user)), ["Food", "Rent"])
+
+
+class RenderedCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        for index in range(10):
+            Category.objects.create(name=f"Category {index}", user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse("category-list")
+
+    def get(self, **headers):
+        return self.client.get(self.url, **headers)
+
+    def test_hits_send_stored_bytes(self):
+        expected = self.get().content
+        with mock.patch.object(CategoryView, "cache_rendered", True):
+            first = self.get()
+            with mock.patch("rest_framework.renderers.JSONRenderer.render") as render:
+                second = self.get()
+        render.assert_not_called()
+        self.assertEqual(first.content, expected)
+        self.assertEqual(second.content, expected)
+        self.assertEqual(second["ETag"], first["ETag"])
+        self.assertIn('cache;desc="1 hits, 0 misses"', second["Server-Timing"])
+
+    def test_precompressed_bodies_and_etags(self):
+        with mock.patch.object(CategoryView, "cache_rendered", True):
+            plain = self.get()
+            compressed = self.get(HTTP_ACCEPT_ENCODING="gzip")
+            not_modified = self.get(HTTP_IF_NONE_MATCH=compressed["ETag"])
+        self.assertEqual(compressed["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(compressed.content), plain.content)
+        self.assertEqual(compressed["ETag"], "W/" + plain["ETag"])
+        self.assertIn("Accept-Encoding", compressed["Vary"])
+        self.assertEqual(not_modified.status_code, 304)
+
+
+class ResponseFormatTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        food = Category.objects.create(name="Food", user=self.user)
+        for index in range(3):
+            Transaction.objects.create(
+                user=self.user,
+                category=food if index < 2 else None,
+                title=f"Lunch {index}",
+                amount="10.00",
+                transaction_date=date(2024, 1, index + 1),
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse("transaction-list")
+
+    def get(self, params=None, **headers):
+        return self.client.get(
+            self.url, {"order_by": "transaction_date", **(params or {})}, **headers
+        )
+
+    @skipIf(msgpack is None, "msgpack is not installed")
+    def test_msgpack(self):
+        response = self.get(HTTP_ACCEPT="application/msgpack")
+        self.assertEqual(response["Content-Type"], "application/msgpack")
+        self.assertEqual(
+            msgpack.unpackb(response.content), json.loads(self.get().content)
+        )
+
+    def test_columnar_layout(self):
+        rows = self.get().json()["objects"]
+        data = self.get({"layout": "columnar"}).json()
+        self.assertEqual(data["objects"]["title"], [row["title"] for row in rows])
+        category_id = rows[0]["category"]["id"]
+        self.assertEqual(data["objects"]["category"], [category_id, category_id, None])
+        self.assertEqual(
+            data["related"]["category"], {str(category_id): rows[0]["category"]}
+        )
+        self.assertEqual(list(data["related"]["user"]), [str(self.user.pk)])
+        self.assertEqual(data["total_count"], 3)
+
+    def test_unknown_layout(self):
+        self.assertEqual(self.get({"layout": "nested"}).status_code, 400)
+
+    def test_columnar_pads_missing_fields(self):
+        columns, related = columnar([{"a": 1}, {"a": 2, "b": {"id": 5}}, {"b": None}])
+        self.assertEqual(columns, {"a": [1, 2, None], "b": [None, 5, None]})
+        self.assertEqual(related, {"b": {5: {"id": 5}}})
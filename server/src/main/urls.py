@@ -15,11 +15,19 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 
-from django.contrib import admin
+from django.apps import apps
 from django.urls import path, include
 
+from main.views import BatchView
+
 urlpatterns = [
-    path("admin/", admin.site.urls),
     path("api/v1/auth/", include("account.urls")),
     path("api/v1/budgethink/", include("budgethink.urls")),
+    path("api/v1/jobs/", include("jobs.urls")),
+    path("api/v1/batch/", BatchView.as_view(), name="batch"),
 ]
+
+if apps.is_installed("django.contrib.admin"):  # not with API_ONLY
+    from django.contrib import admin
+
+    urlpatterns.insert(0, path("admin/", admin.site.urls))
@@ -0,0 +1,251 @@
+"""
+Compiled filter schemas for GenericView query params.
+
+A view declares which fields can be filtered and with which lookups
+(`GenericView.filter_fields`). The declaration is checked against the model
+once per view class: every path must resolve to forward relations no deeper
+than `max_filter_depth`, and every field/lookup pair and ordering field must
+be able to use an index. Parsing a request is then one dict lookup per query param, with
+values coerced by the model field instead of `json.loads`.
+"""
+
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import models
+from rest_framework.exceptions import ValidationError
+
+# Lookups a B-tree index can answer; pattern lookups (icontains, regex...) can't
+INDEXABLE_LOOKUPS = {"exact", "in", "gt", "gte", "lt", "lte", "range", "isnull"}
+
+# Query params GenericView handles itself, with their coercion
+RESERVED_QUERY_PARAMS = {
+    "page": "positive",
+    "top": "non_negative",
+    "bottom": "non_negative",
+    "order_by": "ordering",
+    "count": "string",
+    "layout": "string",
+}
+
+TRUE_VALUES = {"true", "1", "t", "yes"}
+FALSE_VALUES = {"false", "0", "f", "no"}
+
+
+def parse_bool(value):
+    lowered = value.strip().lower()
+    if lowered in TRUE_VALUES:
+        return True
+    if lowered in FALSE_VALUES:
+        return False
+    raise ValidationError(f"'{value}' is not a boolean")
+
+
+def index_column_sets(model):
+    """Field names of every index on the model, in column order."""
+    opts = model._meta
+    column_sets = [
+        [field.name]
+        for field in opts.concrete_fields
+        if field.primary_key or field.unique or field.db_index
+    ]
+    column_sets += [
+        [name.lstrip("-") for name in index.fields] for index in opts.indexes
+    ]
+    column_sets += [list(fields) for fields in opts.unique_together]
+    column_sets += [
+        list(constraint.fields)
+        for constraint in opts.constraints
+        if isinstance(constraint, models.UniqueConstraint) and constraint.fields
+    ]
+    return column_sets
+
+
+def indexed_field_names(model, scope=()):
+    """
+    Fields an index can be used for when the queryset is already filtered on
+    `scope` (e.g. `user`): the leading column of an index, or a later column
+    whose preceding columns are all in scope.
+    """
+    indexed = set()
+    for columns in index_column_sets(model):
+        for name in columns:
+            indexed.add(name)
+            if name not in scope:
+                break
+    return indexed
+
+
+class FilterRule:
+    __slots__ = ("orm_key", "field", "lookup")
+
+    def __init__(self, orm_key, field, lookup):
+        self.orm_key = orm_key
+        self.field = field
+        self.lookup = lookup
+
+    def coerce_one(self, value):
+        if self.lookup == "isnull" or isinstance(self.field, models.BooleanField):
+            return parse_bool(value)
+        field = self.field.target_field if self.field.is_relation else self.field
+        try:
+            return field.to_python(value.strip())
+        except DjangoValidationError as e:
+            raise ValidationError(
+                f"Invalid value for {self.orm_key}: {' '.join(e.messages)}"
+            )
+
+    def coerce(self, value, max_values):
+        if self.lookup not in ("in", "range"):
+            return self.coerce_one(value)
+        values = [v for v in value.split(",") if v.strip()]
+        if self.lookup == "range" and len(values) != 2:
+            raise ValidationError(f"{self.orm_key} takes exactly two values")
+        if len(values) > max_values:
+            raise ValidationError(f"{self.orm_key} takes at most {max_values} values")
+        return [self.coerce_one(v) for v in values]
+
+
+class FilterSchema:
+    """
+    Query param parser for one view. Raises ImproperlyConfigured for
+    declarations that can't use an index and DRF's ValidationError for
+    requests outside the schema.
+    """
+
+    def __init__(
+        self,
+        model,
+        filter_fields=None,
+        ordering_fields=None,
+        scope=(),
+        max_depth=1,
+        max_values=100,
+        extra_params=(),
+    ):
+        self.model = model
+        self.max_depth = max_depth
+        self.max_values = max_values
+        self.extra_params = set(extra_params)
+        self.scope = set(scope)
+        if filter_fields is None:
+            filter_fields = self.default_filter_fields()
+
+        self.rules = {}
+        for path, lookups in filter_fields.items():
+            field, indexed = self.resolve(path)
+            for lookup in lookups:
+                self.add_rule(path, field, indexed, lookup)
+
+        if ordering_fields is None:
+            ordering_fields = self.default_ordering_fields()
+        for path in ordering_fields:
+            # A joined table's column never orders the rows by an index
+            if "__" in path or not self.resolve(path)[1]:
+                raise ImproperlyConfigured(f"Ordering by {path} can't use an index")
+        self.ordering = set(ordering_fields)
+
+    def default_filter_fields(self):
+        # Indexed local fields, equality only
+        indexed = indexed_field_names(self.model, self.scope)
+        return {
+            field.name: ["exact", "in", "isnull"] if field.null else ["exact", "in"]
+            for field in self.model._meta.concrete_fields
+            if field.name in indexed and field.name not in self.scope
+        }
+
+    def default_ordering_fields(self):
+        indexed = indexed_field_names(self.model, self.scope)
+        return [
+            field.name
+            for field in self.model._meta.concrete_fields
+            if field.name in indexed and field.name not in self.scope
+        ]
+
+    def resolve(self, path):
+        """Follow `path` through forward relations; returns (field, indexed)."""
+        model = self.model
+        names = path.split("__")
+        if len(names) - 1 > self.max_depth:
+            raise ImproperlyConfigured(
+                f"{path} joins {len(names) - 1} tables, max_filter_depth is {self.max_depth}"
+            )
+        field = None
+        for depth, name in enumerate(names):
+            if field is not None:
+                if not (field.many_to_one or field.one_to_one) or field.auto_created:
+                    raise ImproperlyConfigured(
+                        f"{path}: {field.name} is not a forward relation"
+                    )
+                model = field.related_model
+            try:
+                field = model._meta.get_field(name)
+            except FieldDoesNotExist:
+                raise ImproperlyConfigured(
+                    f"{path}: {model.__name__} has no field {name}"
+                )
+        if not field.concrete:
+            raise ImproperlyConfigured(f"{path} is not a concrete field")
+        scope = self.scope if len(names) == 1 else ()
+        return field, field.name in indexed_field_names(model, scope)
+
+    def add_rule(self, path, field, indexed, lookup):
+        if field.get_lookup(lookup) is None:
+            raise ImproperlyConfigured(f"{path} does not support the {lookup} lookup")
+        if lookup not in INDEXABLE_LOOKUPS or not indexed:
+            raise ImproperlyConfigured(f"{path}__{lookup} can't use an index")
+        orm_key = path if lookup == "exact" else f"{path}__{lookup}"
+        rule = FilterRule(orm_key, field, lookup)
+        self.rules[orm_key] = rule
+        if lookup == "exact":
+            self.rules[f"{path}__exact"] = rule
+
+    def parse(self, query_params):
+        """Split query params into typed (filters, excludes) for Q(**...)."""
+        filters = {}
+        excludes = {}
+        for key, value in query_params.items():
+            if key in RESERVED_QUERY_PARAMS:
+                filters[key] = self.parse_reserved(key, value)
+            elif key in self.extra_params:
+                filters[key] = value
+            else:
+                target = filters
+                if key.startswith("exclude__"):
+                    key, target = key[9:], excludes
+                rule = self.rules.get(key)
+                if rule is None:
+                    raise ValidationError(f"Filtering on {key} is not supported")
+                target[rule.orm_key] = rule.coerce(value, self.max_values)
+        return filters, excludes
+
+    def parse_reserved(self, key, value):
+        kind = RESERVED_QUERY_PARAMS[key]
+        if kind == "ordering":
+            if value.lstrip("-") not in self.ordering:
+                raise ValidationError(f"Ordering by {value} is not supported")
+            return value
+        if kind == "string":
+            return value
+        try:
+            number = int(value)
+        except ValueError:
+            raise ValidationError(f"{key} must be an integer")
+        if number < (1 if kind == "positive" else 0):
+            raise ValidationError(f"{key} must be {kind.replace('_', '-')}")
+        return number
+
+
+@lru_cache(maxsize=None)
+def compile_filter_schema(view_class):
+    """The FilterSchema of a GenericView subclass, built once per class."""
+    return FilterSchema(
+        view_class.queryset.model,
+        filter_fields=view_class.filter_fields,
+        ordering_fields=view_class.ordering_fields,
+        scope=view_class.filter_scope,
+        max_depth=view_class.max_filter_depth,
+        max_values=view_class.max_filter_values,
+        extra_params=view_class.extra_query_params,
+    )
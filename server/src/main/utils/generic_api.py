@@ -2,14 +2,39 @@ from rest_framework import viewsets
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.exceptions import ValidationError
+from rest_framework.settings import api_settings
 
 from django.shortcuts import get_object_or_404
-from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.db.models import Q
+from django.utils import timezone
 from django.core.paginator import Paginator
-from django.db import transaction
-
+from django.db import connections
+
+from main.cache import (
+    get_two_tier_cache,
+    invalidate_scope,
+    user_cache_scope,
+)
+from main.instrumentation import record_cache_lookup, time_serialization
+from main.middleware import (
+    compress_bytes,
+    compression_config,
+    negotiate_encoding,
+    supported_encodings,
+)
+from main.renderers import LAYOUTS, MessagePackRenderer, columnar, msgpack
+from main.routers import atomic_write, use_replica
+from main.sharding import sharding_enabled, use_user_shard
+from main.utils.filters import compile_filter_schema
+
+import hashlib
 import json
+import math
+from contextvars import copy_context
 
 
 class GenericView(viewsets.ViewSet):
@@ -21,12 +46,28 @@ class GenericView(viewsets.ViewSet):
 
     **Optional attributes**
     - allowed_methods: list of allowed methods (default: ['list', 'retrieve', 'create', 'update', 'delete'])
-    - allowed_filter_fields: list of allowed filter fields (default: ['*'])
+    - filter_fields: dict of filterable field paths to allowed lookups,
+      e.g. {'transaction_date': ['gte', 'lte']} (default: indexed fields, exact/in)
+    - ordering_fields: list of fields accepted by `order_by` (default: indexed fields)
+    - filter_scope: fields initialize_queryset always filters on, e.g. ['user'];
+      later columns of indexes starting with them count as indexed
+    - max_filter_depth: max relations a filter or ordering path may join (default: 1)
+    - max_filter_values: max values of an `in` filter (default: 100)
+    - extra_query_params: params passed through raw for filter_queryset (e.g. ['search'])
     - allowed_update_fields: list of allowed update fields (default: ['*'])
+    - bulk_update_fields: fields PATCH /bulk/ may set (default: [])
+    - max_bulk_ids: max ids per bulk request (default: 1000)
     - size_per_request: number of objects to return per request (default: 20)
     - permission_classes: list of permission classes
     - cache_key_prefix: cache key prefix
     - cache_duration: cache duration in seconds (default: 1 hour)
+    - cache_early_expiration: how eagerly entries are recomputed before they
+      expire, scaled by how long they take to compute; 0 disables (default: 1.0)
+    - cache_rendered: cache responses as rendered, pre-compressed bytes
+      with an ETag instead of serializer data (default: False)
+    - count_modes: accepted values of the `count` query param (default: ['exact', 'estimate', 'none'])
+    - default_count_mode: count mode when `count` is not given (default: 'exact')
+    - count_cache_duration: lifetime of cached counts for `count=estimate` (default: 5 minutes)
 
     **API endpoints**
     - GET /: list objects
@@ -34,93 +75,138 @@ class GenericView(viewsets.ViewSet):
     - POST /: create object
     - PUT /<pk>: update object
     - DELETE /<pk>: delete object
+    - PATCH /bulk/: {"ids": [...], "set": {field: value}}, or the list filters
+      as query params with {"set": ...}; add 'bulk_update' to allowed_methods
+    - DELETE /bulk/: {"ids": [...]} or list filters; add 'bulk_delete'
 
     **Features**
-    - Pagination
-    - Filtering
-    - Caching
+    - Formats: JSON, or MessagePack for `Accept: application/msgpack` (needs
+      the msgpack package); lists also take `?layout=columnar` for
+      {field: [values]} with embedded objects sent once, under `related`
+    - Pagination, with `?count=exact|estimate|none`:
+        - exact: `total_count` and `num_pages` from a COUNT(*) on every page
+        - estimate: counts cached per user and filter set, refreshed on write
+          (or the query planner's estimate on Postgres)
+        - none: no count at all, `has_next` comes from fetching one extra row
+    - Filtering, through a schema compiled once per view: unknown fields,
+      lookups that can't use an index and too deep joins are rejected with 400
+    - Caching, per user in the two-tier cache (main.cache), with concurrent
+      misses computing each entry once
     - CRUD operations
+    - Bulk update/delete as one UPDATE/DELETE, scoped by initialize_queryset
+    - list/retrieve reads go to the read replica when one is configured
+    - With shards configured, every query of a request goes to the user's shard
+      (main.sharding), writes in one transaction there
     """
 
     queryset = None  # the model queryset
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES] + (
+        [MessagePackRenderer] if msgpack is not None else []
+    )
     serializer_class = None  # DRF model serializer class
     size_per_request = 20  # number of objects to return per request
     permission_classes = []  # list of permission classes
     allowed_methods = ["list", "create", "retrieve", "update", "delete"]
-    allowed_filter_fields = ["*"]  # list of allowed filter fields
+    filter_fields = None  # {field path: [lookups]}, None for indexed fields
+    ordering_fields = None  # fields accepted by order_by, None for indexed fields
+    filter_scope = []  # fields initialize_queryset always filters on
+    max_filter_depth = 1  # max joins per filter or ordering path
+    max_filter_values = 100  # max values of an `in` filter
+    extra_query_params = []  # passed through to filter_queryset untouched
     allowed_update_fields = ["*"]  # list of allowed update fields
+    bulk_update_fields = []  # fields PATCH /bulk/ may set
+    max_bulk_ids = 1000  # max ids per bulk request
 
     cache_key_prefix = None  # cache key prefix
     cache_duration = 60 * 60  # cache duration in seconds
+    cache_early_expiration = 1.0  # XFetch beta, 0 disables early recomputation
+    cache_rendered = False  # cache JSON responses as rendered bytes
+
+    count_modes = ["exact", "estimate", "none"]
+    default_count_mode = "exact"
+    count_cache_duration = 60 * 5  # cached count lifetime in seconds
 
     def __init__(self):
         if self.queryset is None or not self.serializer_class:
             raise NotImplementedError("queryset and serializer_class must be defined")
 
+    def dispatch(self, request, *args, **kwargs):
+        # Whatever initial() routes to stays with this request
+        return copy_context().run(super().dispatch, request, *args, **kwargs)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if sharding_enabled() and request.user.is_authenticated:
+            # The queryset and every query made for the request go to the
+            # user's shard (main.sharding)
+            use_user_shard(request.user.pk, request.user.shard)
+
     # CRUD operations
+    @use_replica
     def list(self, request):
         if "list" not in self.allowed_methods:
             return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
         self.initialize_queryset(request)
         try:
             filters, excludes = self.parse_query_params(request)
+            count_mode = self.get_count_mode(filters)
             top, bottom, order_by = self.get_pagination_params(filters)
-
-            cached_data = None
-            if self.cache_key_prefix:
-                cache_key = self.get_list_cache_key(filters, excludes, top, bottom)
-                cached_data = cache.get(cache_key)
-            if cached_data:
-                return Response(cached_data, status=status.HTTP_200_OK)
-
-            return self.filter(request, filters, excludes, top, bottom, order_by)
+            layout = self.get_layout(filters)
+            return self.filter(
+                request, filters, excludes, top, bottom, order_by, count_mode, layout
+            )
         except ValidationError as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+    @use_replica
     def retrieve(self, request, pk=None):
         if "retrieve" not in self.allowed_methods:
             return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
 
         self.initialize_queryset(request)
 
-        cached_object = None
         if self.cache_key_prefix:
-            cache_key = self.get_object_cache_key(pk)
-            cached_object = cache.get(cache_key)
-        if cached_object:
-            return Response(cached_object, status=status.HTTP_200_OK)
-
+            return self.get_cached_response(
+                self.get_object_cache_key(pk, request),
+                request,
+                lambda: self.get_serialized_object(pk),
+            )
         object = self.get_serialized_object(pk)
-        self.cache_object(object, pk)
         return Response(object, status=status.HTTP_200_OK)
 
-    @transaction.atomic
+    @atomic_write
     def create(self, request):
         if "create" not in self.allowed_methods:
             return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
 
         self.initialize_queryset(request)
 
+        self.save_kwargs = {}
         self.pre_create(request)
 
-        serializer = self.serializer_class(data=request.data)
+        serializer = self.serializer_class(
+            data=request.data, context={"request": request}
+        )
         if serializer.is_valid():
-            instance = serializer.save()
-            self.cache_object(serializer.data, instance.pk)
-            self.invalidate_list_cache()
+            instance = serializer.save(**self.save_kwargs)
+            with time_serialization():
+                data = serializer.data
+            self.invalidate_cache(request)
+            self.cache_object(data, instance.pk, request)
 
             self.post_create(request, instance)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+            return Response(data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-    @transaction.atomic
+    @atomic_write
     def update(self, request, pk=None):
         if "update" not in self.allowed_methods:
             return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
-        
+
         self.initialize_queryset(request)
 
         instance = get_object_or_404(self.queryset, pk=pk)
+        self.save_kwargs = {}
         self.pre_update(request, instance)
 
         if "*" not in self.allowed_update_fields:
@@ -131,17 +217,21 @@ class GenericView(viewsets.ViewSet):
                         status=status.HTTP_400_BAD_REQUEST,
                     )
 
-        serializer = self.serializer_class(instance, data=request.data)
+        serializer = self.serializer_class(
+            instance, data=request.data, context={"request": request}
+        )
         if serializer.is_valid():
-            serializer.save()
-            self.cache_object(serializer.data, pk)
-            self.invalidate_list_cache()
+            serializer.save(**self.save_kwargs)
+            with time_serialization():
+                data = serializer.data
+            self.invalidate_cache(request)
+            self.cache_object(data, pk, request)
 
             self.post_update(request, instance)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            return Response(data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-    @transaction.atomic
+    @atomic_write
     def destroy(self, request, pk=None):
         if "delete" not in self.allowed_methods:
             return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
@@ -149,8 +239,7 @@ class GenericView(viewsets.ViewSet):
         self.initialize_queryset(request)
 
         instance = get_object_or_404(self.queryset, pk=pk)
-        self.delete_cache(pk)
-        self.invalidate_list_cache()
+        self.invalidate_cache(request)
         self.pre_destroy(instance)
         if hasattr(instance, "removed"):
             instance.removed = True
@@ -161,7 +250,55 @@ class GenericView(viewsets.ViewSet):
         self.post_destroy(instance)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
-    # Middleware methods
+    @atomic_write
+    def bulk_update(self, request):
+        if "bulk_update" not in self.allowed_methods:
+            return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
+
+        self.initialize_queryset(request)
+        try:
+            queryset = self.get_bulk_queryset(request)
+            values = self.get_bulk_update_values(request)
+            self.validate_bulk_update(request, values)
+        except ValidationError as e:
+            return Response({"error": e.detail}, status=status.HTTP_400_BAD_REQUEST)
+
+        # auto_now fields aren't touched by queryset.update()
+        now = timezone.now()
+        for field in queryset.model._meta.concrete_fields:
+            if getattr(field, "auto_now", False):
+                values.setdefault(field.attname, now)
+        updated = queryset.update(**values)
+
+        self.invalidate_cache(request)
+        self.post_bulk_update(request, values, updated)
+        return Response({"updated": updated}, status=status.HTTP_200_OK)
+
+    @atomic_write
+    def bulk_destroy(self, request):
+        if "bulk_delete" not in self.allowed_methods:
+            return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
+
+        self.initialize_queryset(request)
+        try:
+            queryset = self.get_bulk_queryset(request)
+        except ValidationError as e:
+            return Response({"error": e.detail}, status=status.HTTP_400_BAD_REQUEST)
+
+        pks = list(queryset.values_list("pk", flat=True))
+        if hasattr(queryset.model, "removed"):
+            deleted = queryset.model._base_manager.filter(pk__in=pks).update(
+                removed=True
+            )
+        else:
+            deleted = self.perform_bulk_destroy(queryset, pks)
+
+        self.invalidate_cache(request)
+        self.post_bulk_destroy(request, pks)
+        return Response({"deleted": deleted}, status=status.HTTP_200_OK)
+
+    # Middleware methods; pre_create and pre_update may set fields the client
+    # can't (e.g. the owner) in self.save_kwargs, passed to serializer.save()
     def pre_create(self, request):
         pass
 
@@ -180,63 +317,187 @@ class GenericView(viewsets.ViewSet):
     def post_destroy(self, instance):
         pass
 
+    def validate_bulk_update(self, request, values):
+        pass  # raise ValidationError to refuse, e.g. foreign keys of other users
+
+    def perform_bulk_destroy(self, queryset, pks):
+        return queryset.model._base_manager.filter(pk__in=pks).delete()[0]
+
+    def post_bulk_update(self, request, values, updated):
+        pass
+
+    def post_bulk_destroy(self, request, pks):
+        pass
+
     # Cache operations
-    def delete_cache(self, pk):
+    # Entries live in the two-tier cache (main.cache), in the requesting
+    # user's scope: any write by the user makes all of them stale at once
+    def get_cached_or_compute(self, cache_key, request, compute, timeout=None):
+        """
+        The cached value of `cache_key`, or `compute()`'s, cached; concurrent
+        misses compute it once (see TwoTierCache.get_or_compute).
+        """
+        computed = []
+
+        def tracked_compute():
+            computed.append(True)
+            return compute()
+
+        value = get_two_tier_cache().get_or_compute(
+            cache_key,
+            self.get_cache_scope(request),
+            tracked_compute,
+            timeout or self.cache_duration,
+            self.cache_early_expiration,
+        )
+        record_cache_lookup(not computed)
+        return value
+
+    def get_cached_response(self, cache_key, request, compute):
+        """
+        200 response with `compute()`'s data, through the cache. With
+        cache_rendered, JSON and MessagePack responses are cached rendered: a
+        hit sends the stored bytes without serializing or encoding anything.
+        """
+        renderer_format = getattr(
+            getattr(request, "accepted_renderer", None), "format", None
+        )
+        if not self.cache_rendered or renderer_format not in ("json", "msgpack"):
+            data = self.get_cached_or_compute(cache_key, request, compute)
+            return Response(data, status=status.HTTP_200_OK)
+        rendered = self.get_cached_or_compute(
+            f"{cache_key}_{renderer_format}",
+            request,
+            lambda: self.render_for_cache(request, compute()),
+        )
+        return self.get_rendered_response(request, rendered)
+
+    def render_for_cache(self, request, data):
+        """
+        The body of `data` as Response would render it, its ETag, and the
+        body pre-compressed in each encoding CompressionMiddleware offers.
+        """
+        renderer = request.accepted_renderer
+        body = renderer.render(
+            data, request.accepted_media_type, self.get_renderer_context()
+        )
+        content_type = request.accepted_media_type
+        if renderer.charset:
+            content_type = f"{content_type}; charset={renderer.charset}"
+        rendered = {
+            "content_type": content_type,
+            "etag": f'"{hashlib.md5(body).hexdigest()}"',
+            "bodies": {"identity": body},
+        }
+        config = compression_config()
+        if config["ENABLED"] and len(body) >= config["MIN_LENGTH"]:
+            for encoding in supported_encodings(config):
+                compressed = compress_bytes(encoding, body, config)
+                if len(compressed) < len(body):
+                    rendered["bodies"][encoding] = compressed
+        return rendered
+
+    def get_rendered_response(self, request, rendered):
+        etag = rendered["etag"]
+        if_none_match = request.META.get("HTTP_IF_NONE_MATCH")
+        # Weak comparison, as for GET in RFC 9110
+        if if_none_match and {etag, "*"} & {
+            tag.removeprefix("W/") for tag in parse_etags(if_none_match)
+        }:
+            response = HttpResponseNotModified()
+            response["ETag"] = etag
+            return response
+
+        encodings = [
+            encoding for encoding in rendered["bodies"] if encoding != "identity"
+        ]
+        encoding = negotiate_encoding(
+            request.META.get("HTTP_ACCEPT_ENCODING", ""), encodings
+        )
+        response = HttpResponse(
+            rendered["bodies"][encoding or "identity"],
+            content_type=rendered["content_type"],
+        )
+        response["ETag"] = etag
+        if encodings:
+            patch_vary_headers(response, ("Accept-Encoding",))
+        if encoding:
+            # Same weak ETag CompressionMiddleware would send
+            response["ETag"] = "W/" + etag
+            response["Content-Encoding"] = encoding
+        return response
+
+    def invalidate_cache(self, request):
+        invalidate_scope(self.get_cache_scope(request))
+
+    def cache_object(self, object_data, pk, request):
         if not self.cache_key_prefix:
             return
-        cache_key = self.get_object_cache_key(pk)
-        cache.delete(cache_key)
+        cache_key = self.get_object_cache_key(pk, request)
+        get_two_tier_cache().set(
+            cache_key, object_data, self.get_cache_scope(request), self.cache_duration
+        )
 
-    def invalidate_list_cache(self):
-        if not self.cache_key_prefix:
-            return
-        cache.delete_pattern(f"{self.cache_key_prefix}_list_*")
+    def get_object_cache_key(self, pk, request):
+        return f"{self.cache_key_prefix}_{self.get_cache_scope(request)}_object_{pk}"
+
+    def get_list_cache_key(
+        self,
+        request,
+        filters,
+        excludes,
+        top,
+        bottom,
+        order_by=None,
+        count_mode="exact",
+        layout="rows",
+    ):
+        return (
+            f"{self.cache_key_prefix}_{self.get_cache_scope(request)}_list_"
+            f"{self.get_filter_digest(filters, excludes)}_"
+            f"{top}_{bottom}_{order_by}_{count_mode}_{layout}"
+        )
 
-    def cache_object(self, object_data, pk):
-        if not self.cache_key_prefix:
-            return
-        cache_key = self.get_object_cache_key(pk)
-        cache.set(cache_key, object_data, self.cache_duration)
+    def get_filter_digest(self, filters, excludes):
+        # Stable across processes, unlike hash(), and works for list values
+        payload = json.dumps([filters, excludes], sort_keys=True, default=str)
+        return hashlib.md5(payload.encode()).hexdigest()
 
-    def get_object_cache_key(self, pk):
-        return f"{self.cache_key_prefix}_object_{pk}"
+    def get_cache_scope(self, request):
+        user = getattr(request, "user", None)
+        pk = getattr(user, "pk", None)
+        return user_cache_scope(pk) if pk else "anon"
 
-    def get_list_cache_key(self, filters, excludes, top, bottom):
-        return (
-            f"{self.cache_key_prefix}_list_{hash(frozenset(filters.items()))}_"
-            f"{hash(frozenset(excludes.items()))}_{top}_{bottom}"
+    def estimate_count(self, request, queryset, digest):
+        namespace = self.cache_key_prefix or self.queryset.model._meta.label_lower
+        count_key = f"{namespace}_{self.get_cache_scope(request)}_count_{digest}"
+
+        def count():
+            if connections[queryset.db].vendor == "postgresql":
+                return planner_row_estimate(queryset)
+            return queryset.count()
+
+        return self.get_cached_or_compute(
+            count_key, request, count, self.count_cache_duration
         )
 
     # Helper methods
     def parse_query_params(self, request):
-        filters = {}
-        excludes = {}
-
-        def parse_list_parameter(value):
-            values = [v.strip() for v in value.rstrip(",").split(",") if v.strip()]
-            return values if len(values) > 1 else values[0] if values else None
-
-        def parse_value(value):
-            if "," in value:
-                return parse_list_parameter(value)
-            try:
-                return json.loads(value)
-            except json.JSONDecodeError:
-                return value  # Return as plain string if not valid JSON
-
-        for key, value in request.query_params.items():
-            if key.startswith("exclude__"):
-                parsed_value = parse_value(value)
-                excludes[key[9:]] = parsed_value
-            else:
-                if (
-                    key in self.allowed_filter_fields
-                    or "*" in self.allowed_filter_fields
-                ):
-                    parsed_value = parse_value(value)
-                    filters[key] = parsed_value
-
-        return filters, excludes
+        return compile_filter_schema(type(self)).parse(request.query_params)
+
+    def get_count_mode(self, filters):
+        count_mode = filters.pop("count", self.default_count_mode)
+        if count_mode not in self.count_modes:
+            raise ValidationError(
+                f"count must be one of: {', '.join(self.count_modes)}"
+            )
+        return count_mode
+
+    def get_layout(self, filters):
+        layout = filters.pop("layout", "rows")
+        if layout not in LAYOUTS:
+            raise ValidationError(f"layout must be one of: {', '.join(LAYOUTS)}")
+        return layout
 
     def get_pagination_params(self, filters):
         page = filters.pop("page", None)
@@ -252,37 +513,150 @@ class GenericView(viewsets.ViewSet):
             bottom = top + self.size_per_request
         return top, bottom, order_by
 
+    def get_bulk_queryset(self, request):
+        """
+        Objects a bulk request targets: `ids` from the body, or the list
+        filters from the query string. Targeting everything takes a filter.
+        """
+        ids = request.data.get("ids") if isinstance(request.data, dict) else None
+        filters, excludes = self.parse_query_params(request)
+        for param in ("page", "top", "bottom", "order_by", "count", "layout"):
+            filters.pop(param, None)
+        if ids is not None:
+            if not isinstance(ids, list) or not ids or len(ids) > self.max_bulk_ids:
+                raise ValidationError(
+                    f"ids must be a list of 1 to {self.max_bulk_ids} ids"
+                )
+            try:
+                ids = [int(pk) for pk in ids]
+            except (TypeError, ValueError):
+                raise ValidationError("ids must be integers")
+            filters["pk__in"] = ids
+        elif not filters and not excludes:
+            raise ValidationError("Give ids or at least one filter")
+        return self.filter_queryset(filters, excludes)
+
+    def get_bulk_update_values(self, request):
+        values = request.data.get("set") if isinstance(request.data, dict) else None
+        if not isinstance(values, dict) or not values:
+            raise ValidationError("set must be an object of fields to update")
+        cleaned = {}
+        for name, value in values.items():
+            if name not in self.bulk_update_fields:
+                raise ValidationError(f"Field {name} is not allowed to bulk update")
+            field = self.queryset.model._meta.get_field(name)
+            try:
+                cleaned[field.attname] = field.clean(value, None)
+            except DjangoValidationError as e:
+                raise ValidationError({name: e.messages})
+        return cleaned
+
     def filter_queryset(self, filters, excludes):
         filter_q = Q(**filters)
         exclude_q = Q(**excludes)
         return self.queryset.filter(filter_q).exclude(exclude_q)
 
-    def filter(self, request, filters, excludes, top, bottom, order_by=None):
+    def filter(
+        self,
+        request,
+        filters,
+        excludes,
+        top,
+        bottom,
+        order_by=None,
+        count_mode="exact",
+        layout="rows",
+    ):
+        if not self.cache_key_prefix:
+            data = self.get_list_data(
+                request, filters, excludes, top, bottom, order_by, count_mode, layout
+            )
+            return Response(data, status=status.HTTP_200_OK)
+
+        cache_key = self.get_list_cache_key(
+            request, filters, excludes, top, bottom, order_by, count_mode, layout
+        )
+        return self.get_cached_response(
+            cache_key,
+            request,
+            lambda: self.get_list_data(
+                request, filters, excludes, top, bottom, order_by, count_mode, layout
+            ),
+        )
+
+    def get_list_data(
+        self,
+        request,
+        filters,
+        excludes,
+        top,
+        bottom,
+        order_by=None,
+        count_mode="exact",
+        layout="rows",
+    ):
+        # Computed before filter_queryset(), which may pop view-specific params
+        digest = self.get_filter_digest(filters, excludes)
+
         queryset = self.filter_queryset(filters, excludes)
 
         if order_by:
-            queryset = queryset.order_by(order_by)
+            queryset = self.order_queryset(queryset, order_by)
 
-        paginator = Paginator(queryset, self.size_per_request)
         page_number = (top // self.size_per_request) + 1
-        page = paginator.get_page(page_number)
-
-        serializer = self.serializer_class(page, many=True)
-        data = {
-            "objects": serializer.data,
-            "total_count": paginator.count,
-            "num_pages": paginator.num_pages,
-            "current_page": page.number,
+        if count_mode == "exact":
+            paginator = Paginator(queryset, self.size_per_request)
+            page = paginator.get_page(page_number)
+
+            with time_serialization():
+                objects = self.serializer_class(page, many=True).data
+            data = {
+                "objects": objects,
+                "total_count": paginator.count,
+                "num_pages": paginator.num_pages,
+                "current_page": page.number,
+                "has_next": page.has_next(),
+            }
+        else:
+            data = self.paginate_without_count(queryset, page_number)
+            if count_mode == "estimate":
+                total_count = self.estimate_count(request, queryset, digest)
+                data["total_count"] = total_count
+                data["num_pages"] = max(
+                    1, math.ceil(total_count / self.size_per_request)
+                )
+
+        if layout == "columnar":
+            data["objects"], data["related"] = columnar(data["objects"])
+        return data
+
+    def order_queryset(self, queryset, order_by):
+        return queryset.order_by(order_by)
+
+    def paginate_without_count(self, queryset, page_number):
+        # One extra row tells whether there is a next page without a COUNT(*)
+        offset = (max(page_number, 1) - 1) * self.size_per_request
+        rows = list(queryset[offset : offset + self.size_per_request + 1])
+        with time_serialization():
+            objects = self.serializer_class(
+                rows[: self.size_per_request], many=True
+            ).data
+        return {
+            "objects": objects,
+            "current_page": page_number,
+            "has_next": len(rows) > self.size_per_request,
         }
 
-        cache_key = self.get_list_cache_key(filters, excludes, top, bottom)
-        cache.set(cache_key, data, self.cache_duration)
-
-        return Response(data, status=status.HTTP_200_OK)
-
     def get_serialized_object(self, pk):
         instance = get_object_or_404(self.queryset, pk=pk)
-        return self.serializer_class(instance).data
+        with time_serialization():
+            return self.serializer_class(instance).data
 
     def initialize_queryset(self, request):
         pass
+
+
+def planner_row_estimate(queryset):
+    """Row estimate from the Postgres query planner, without running the query."""
+    plan = json.loads(queryset.explain(format="json"))
+    return int(plan[0]["Plan"]["Plan Rows"])
@@ -0,0 +1,150 @@
+import io
+import json
+from contextlib import ExitStack
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.http import HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from main.cache import batched_cache_invalidation, flush_cache_invalidations, invalidate
+from main.permissions import IsAuthenticated
+from main.routers import primary_reads
+from main.sharding import sharding_enabled
+
+API_PREFIX = "/api/v1/"
+MAX_OPERATIONS = 25
+METHODS = {"GET", "POST", "PUT", "PATCH", "DELETE"}
+SKIPPED = 424  # Failed Dependency: not run because an earlier atomic operation failed
+
+
+class BatchView(APIView):
+    """
+    POST /batch/: run several API calls in one round trip.
+
+        {
+            "atomic": true,
+            "operations": [
+                {"method": "POST", "path": "budgethink/transactions/", "body": {...}},
+                {"method": "PUT", "path": "budgethink/budgets/3/", "body": {...}},
+                {"method": "GET", "path": "budgethink/transactions/dashboard/", "params": {"months_span": 6}}
+            ]
+        }
+
+    Operations run in order through the same views as their own URLs
+    (paths may omit the /api/v1/ prefix), as the user authenticated once for
+    the batch. The response lists {"status", "body"} per operation. With
+    `atomic`, all operations share one database transaction (on the user's
+    shard and on default): the first failure rolls everything back and the
+    rest are answered with 424.
+    List and count caches are invalidated once per run of writes: before the
+    next GET, so that it reads them, and after the last operation.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        operations = request.data.get("operations")
+        if not isinstance(operations, list) or not operations:
+            return Response(
+                {"error": "operations must be a non-empty list"}, status=400
+            )
+        if len(operations) > MAX_OPERATIONS:
+            return Response(
+                {"error": f"At most {MAX_OPERATIONS} operations per batch"}, status=400
+            )
+        try:
+            calls = [self.resolve_operation(operation) for operation in operations]
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
+
+        atomic = bool(request.data.get("atomic", False))
+        databases = self.databases(request) if atomic else []
+        results, flushed, rolled_back = [], {}, False
+        # Reads after writes in the same batch must see them, so no replica
+        with batched_cache_invalidation(), primary_reads():
+            with ExitStack() as stack:
+                for database in databases:
+                    stack.enter_context(transaction.atomic(using=database))
+                for view, args, kwargs, operation in calls:
+                    if operation["method"] == "GET":
+                        flushed.update(flush_cache_invalidations())
+                    response = view(
+                        self.sub_request(request, operation), *args, **kwargs
+                    )
+                    results.append(
+                        {
+                            "status": response.status_code,
+                            "body": getattr(response, "data", None),
+                        }
+                    )
+                    if atomic and response.status_code >= 400:
+                        for database in databases:
+                            transaction.set_rollback(True, using=database)
+                        rolled_back = True
+                        break
+            if rolled_back:
+                # Reads may have cached rows that no longer exist: again at exit
+                for key, function in flushed.items():
+                    invalidate(key, function)
+
+        results += [{"status": SKIPPED, "body": None}] * (len(calls) - len(results))
+        return Response(
+            {"atomic": atomic, "rolled_back": rolled_back, "results": results}
+        )
+
+    def databases(self, request):
+        """The databases an atomic batch spans: the user's shard, and default."""
+        if sharding_enabled() and request.user.shard != DEFAULT_DB_ALIAS:
+            return [request.user.shard, DEFAULT_DB_ALIAS]
+        return [DEFAULT_DB_ALIAS]
+
+    def resolve_operation(self, operation):
+        if not isinstance(operation, dict):
+            raise ValueError("Each operation must be an object")
+        method = str(operation.get("method", "GET")).upper()
+        if method not in METHODS:
+            raise ValueError(f"Unsupported method: {method}")
+        path = str(operation.get("path", ""))
+        if not path.startswith("/"):
+            path = API_PREFIX + path
+        try:
+            match = resolve(path)
+        except Resolver404:
+            raise ValueError(f"Unknown path: {path}")
+        view_class = getattr(match.func, "cls", None)
+        if view_class is None or view_class is type(self):
+            raise ValueError(f"Path cannot be batched: {path}")
+        return (
+            match.func,
+            match.args,
+            match.kwargs,
+            {**operation, "method": method, "path": path},
+        )
+
+    def sub_request(self, request, operation):
+        """A plain HttpRequest for the operation, carrying the batch's user."""
+        sub_request = HttpRequest()
+        sub_request.method = operation["method"]
+        sub_request.path = sub_request.path_info = operation["path"]
+        sub_request.META = {
+            key: value
+            for key, value in request._request.META.items()
+            if key not in ("CONTENT_LENGTH", "CONTENT_TYPE", "QUERY_STRING")
+        }
+        query = QueryDict(mutable=True)
+        for key, value in (operation.get("params") or {}).items():
+            query.setlist(key, value if isinstance(value, list) else [value])
+        sub_request.GET = query
+        sub_request.META["QUERY_STRING"] = query.urlencode()
+        body = json.dumps(operation["body"]).encode() if "body" in operation else b""
+        sub_request._stream = io.BytesIO(body)
+        sub_request._read_started = False
+        sub_request.META["CONTENT_TYPE"] = "application/json"
+        sub_request.META["CONTENT_LENGTH"] = str(len(body))
+        sub_request.user = request.user
+        # DRF skips its authenticators for forced users: one JWT check per batch
+        sub_request._force_auth_user = request.user
+        sub_request._force_auth_token = request.auth
+        return sub_request
@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "main.settings")
 
 application = get_wsgi_application()
+
+from main.cache import log_unshared_l2  # noqa: E402 (needs the apps loaded)
+
+log_unshared_l2()